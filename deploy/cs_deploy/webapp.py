@@ -221,6 +221,28 @@ class Manager:
 
         self.write_config(job_obj, filename="deployment-cleanup-job.yaml")
 
+        # Maintenance commands run in the same environment once a day.
+        daily_jobs = [
+            ("reconcile-sim-counts", "reconcile_sim_counts", "0 7 * * *"),
+            ("collect-blobs", "collect_blobs", "30 7 * * *"),
+        ]
+        for name, command, schedule in daily_jobs:
+            daily_obj = copy.deepcopy(job_obj)
+            daily_obj["metadata"]["name"] = f"web-{name}"
+            daily_obj["spec"]["schedule"] = schedule
+            container = daily_obj["spec"]["jobTemplate"]["spec"]["template"]["spec"][
+                "containers"
+            ][0]
+            container["name"] = f"web-{name}"
+            # Same wrapper as the cleanup job so that the proxy sidecar
+            # exits once the command is done.
+            container["args"] = [
+                'trap "touch /tmp/pod/main-terminated" EXIT;\n'
+                "sleep 10;\n"
+                f"python manage.py {command}\n"
+            ]
+            self.write_config(daily_obj, filename=f"{name}-job.yaml")
+
     def write_secret(self):
         secret_obj = copy.deepcopy(self.secret_template)
         secrets = cs_secrets.Secrets(self.project)
@@ -3,6 +3,7 @@ import asyncio
 
 import cs_storage
 from cs_jobs.task_wrapper import task_wrapper
+import cs_jobs.serve
 
 try:
     from cs_config import functions
@@ -31,15 +32,62 @@ def sim(meta_param_dict, adjustment):
 routes = {"version": version, "defaults": defaults, "parse": parse, "sim": sim}
 
 
+def run_task(callback_url, route_name, task_timeout=None):
+    """
+    Entry point for tasks that are pulled from a worker pool's queue.
+    """
+    asyncio.run(
+        task_wrapper(callback_url, route_name, routes[route_name], timeout=task_timeout)
+    )
+
+
 def main(args: argparse.Namespace):
     asyncio.run(
         task_wrapper(args.callback_url, args.route_name, routes[args.route_name])
     )
 
 
+def serve(args: argparse.Namespace):
+    max_memory = args.max_memory * 1024 ** 2 if args.max_memory else None
+    cs_jobs.serve.serve(
+        args.queue,
+        max_memory=max_memory,
+        max_tasks=args.max_tasks,
+        task_timeout=args.task_timeout,
+    )
+
+
 def cli():
     parser = argparse.ArgumentParser(description="CLI for C/S jobs.")
-    parser.add_argument("--callback-url", required=True)
-    parser.add_argument("--route-name", required=True)
+    parser.add_argument("--callback-url")
+    parser.add_argument("--route-name")
+    parser.set_defaults(func=main)
+
+    subparsers = parser.add_subparsers()
+    serve_parser = subparsers.add_parser(
+        "serve",
+        description=(
+            "Run tasks from a worker pool's queue in a single process so that "
+            "the project's functions are only imported once."
+        ),
+    )
+    serve_parser.add_argument("--queue", required=True)
+    serve_parser.add_argument(
+        "--max-memory",
+        type=int,
+        default=None,
+        help=(
+            "Exit after a task leaves the process above this many MB. Defaults "
+            "to a share of the container's memory limit."
+        ),
+    )
+    serve_parser.add_argument("--max-tasks", type=int, default=None)
+    serve_parser.add_argument(
+        "--task-timeout", type=int, default=cs_jobs.serve.TASK_TIMEOUT
+    )
+    serve_parser.set_defaults(func=serve)
+
     args = parser.parse_args()
-    main(args)
+    if args.func is main and not (args.callback_url and args.route_name):
+        parser.error("--callback-url and --route-name are required.")
+    args.func(args)
@@ -0,0 +1,9 @@
+import os
+
+host = os.environ.get("REDIS_HOST")
+port = os.environ.get("REDIS_PORT")
+password = os.environ.get("REDIS_PASSWORD", None)
+if password:
+    REDIS_URL = f"redis://:{password}@{host}:{port}/"
+else:
+    REDIS_URL = f"redis://{host}:{port}/"
@@ -0,0 +1,78 @@
+import os
+import resource
+
+import redis
+from rq import Queue, SimpleWorker
+
+from cs_jobs import rq_settings
+
+# Max number of seconds that a task may run if it was queued without a timeout.
+TASK_TIMEOUT = int(os.environ.get("TASK_TIMEOUT", 10 * 60))
+# Share of the container's memory limit that the server may use before it
+# exits so that it is restarted with a fresh process.
+MAX_MEMORY_FRACTION = float(os.environ.get("MAX_MEMORY_FRACTION", 0.8))
+
+CGROUP_MEMORY_LIMITS = (
+    "/sys/fs/cgroup/memory.max",
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+)
+
+
+def memory_usage():
+    """
+    Resident memory of this process in bytes.
+    """
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def memory_limit():
+    """
+    Memory limit of the container in bytes or None if it is not limited.
+    """
+    for path in CGROUP_MEMORY_LIMITS:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            return int(value)
+    return None
+
+
+class TaskWorker(SimpleWorker):
+    """
+    Runs tasks in the worker's process so that the model's modules are only
+    imported once. The worker stops after a task leaves it above the memory
+    watermark, and the container is restarted by its deployment.
+    """
+
+    def __init__(self, *args, max_memory=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_memory = max_memory
+
+    def execute_job(self, job, queue):
+        result = super().execute_job(job, queue)
+        if self.max_memory is not None:
+            usage = memory_usage()
+            if usage > self.max_memory:
+                print(
+                    f"Memory usage of {usage} bytes is above the watermark "
+                    f"of {self.max_memory} bytes. Stopping."
+                )
+                self.request_stop(None, None)
+        return result
+
+
+def serve(queue_name, max_memory=None, max_tasks=None, task_timeout=TASK_TIMEOUT):
+    if max_memory is None:
+        limit = memory_limit()
+        if limit is not None:
+            max_memory = int(limit * MAX_MEMORY_FRACTION)
+
+    connection = redis.Redis.from_url(rq_settings.REDIS_URL)
+    queue = Queue(queue_name, connection=connection, default_timeout=task_timeout)
+    worker = TaskWorker([queue], connection=connection, max_memory=max_memory)
+    print(f"Serving tasks from {queue_name} with memory watermark {max_memory}")
+    worker.work(max_jobs=max_tasks)
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import time
+import uuid
+import zipfile
+
+import cs_storage
+import fsspec as fs
+
+BUCKET = os.environ.get("BUCKET")
+
+# Root URL of the object storage for the outputs, e.g. gcs://bucket. A local
+# directory like file:///tmp/cs-storage may be used in tests. Outputs are
+# sent through the callback url if it is not set.
+STORAGE_URL = os.environ.get("STORAGE_URL") or (BUCKET and f"gcs://{BUCKET}")
+
+# Size of the parts that are uploaded to the object storage.
+CHUNK_SIZE = int(os.environ.get("STORAGE_CHUNK_SIZE", 8 * 1024 * 1024))
+
+
+def storage_path(location, storage_url=None):
+    storage_url = storage_url or STORAGE_URL
+    return f"{storage_url.rstrip('/')}/{location.lstrip('/')}"
+
+
+class HashingWriter:
+    """
+    Write-only file wrapper that keeps track of the size and checksum of
+    the bytes that are written to the underlying file.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.size = 0
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        self.hash.update(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+    @property
+    def checksum(self):
+        return f"sha256:{self.hash.hexdigest()}"
+
+
+def write(task_id, outputs, storage_url=None):
+    """
+    Stream the outputs to the object storage as one compressed zip file
+    per category. The file is uploaded in parts, so only the output that
+    is being compressed needs to be held in memory twice.
+
+    Returns the same remote result as cs_storage.write and a manifest with
+    the location, size, and checksum of each file.
+    """
+    s = time.time()
+    storage_url = storage_url or STORAGE_URL
+    rem_result = {}
+    files = []
+    for category in ["renderable", "downloadable"]:
+        ziplocation = f"{task_id}_{category}.zip"
+        rem_result[category] = {"ziplocation": ziplocation, "outputs": []}
+        with fs.open(
+            storage_path(ziplocation, storage_url), "wb", block_size=CHUNK_SIZE
+        ) as f:
+            writer = HashingWriter(f)
+            with zipfile.ZipFile(
+                writer, mode="w", compression=zipfile.ZIP_DEFLATED
+            ) as zipfileobj:
+                for output in outputs[category]:
+                    serializer = cs_storage.get_serializer(output["media_type"])
+                    output_id = str(uuid.uuid4())
+                    filename = output["title"]
+                    if not filename.endswith(f".{serializer.ext}"):
+                        filename += f".{serializer.ext}"
+                    zipfileobj.writestr(filename, serializer.serialize(output["data"]))
+                    rem_result[category]["outputs"].append(
+                        {
+                            "id": output_id,
+                            "title": output["title"],
+                            "media_type": output["media_type"],
+                            "filename": filename,
+                        }
+                    )
+        files.append(
+            {"location": ziplocation, "size": writer.size, "checksum": writer.checksum}
+        )
+    f = time.time()
+    print(f"Write finished in {f-s}s")
+    return rem_result, {"storage_url": storage_url, "files": files}
@@ -1,15 +1,22 @@
+import asyncio
 import os
 import time
 import traceback
+import uuid
 
 import httpx
 
+from cs_jobs import storage
+
 
 try:
     from cs_config import functions
 except ImportError as ie:
     pass
 
+# Number of seconds between heartbeats while the model function runs.
+HEARTBEAT_INTERVAL = int(os.environ.get("HEARTBEAT_INTERVAL", 30))
+
 
 async def get_task_kwargs(callback_url, retries=5):
     """
@@ -38,23 +45,89 @@ async def get_task_kwargs(callback_url, retries=5):
                 raise e
             wait_time = 2 ** retry
             print(f"Trying again in {wait_time} seconds.")
-            time.sleep(wait_time)
+            await asyncio.sleep(wait_time)
+
+
+async def heartbeat(callback_url, task_name, start, interval=HEARTBEAT_INTERVAL):
+    """
+    Let the workers api know that the task is still running. Failed
+    heartbeats are logged and do not stop the task.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with httpx.AsyncClient() as client:
+                resp = await client.post(
+                    f"{callback_url}heartbeat/",
+                    json={"task_name": task_name, "elapsed": time.time() - start},
+                    timeout=10,
+                )
+            resp.raise_for_status()
+        except Exception as e:
+            print(f"Exception when sending heartbeat to: {callback_url}")
+            print(f"Exception: {e}")
+
+
+async def run_in_executor(callback_url, task_name, func, task_kwargs, start):
+    """
+    Run the model function in a thread so that the event loop can send
+    heartbeats while it runs.
+    """
+    loop = asyncio.get_running_loop()
+    heartbeat_task = asyncio.create_task(heartbeat(callback_url, task_name, start))
+    try:
+        return await loop.run_in_executor(None, lambda: func(**task_kwargs))
+    finally:
+        heartbeat_task.cancel()
+
 
+async def post_result(callback_url, res):
+    print("saving results...")
+    async with httpx.AsyncClient() as client:
+        resp = await client.post(callback_url, json=res, timeout=120)
 
-async def task_wrapper(callback_url, task_name, func, task_kwargs=None):
+    print("resp", resp.status_code, resp.url)
+    assert resp.status_code in (200, 201), f"Got code: {resp.status_code} ({resp.text})"
+
+
+async def task_wrapper(callback_url, task_name, func, task_kwargs=None, timeout=None):
+    """
+    Run the task and post its result to callback_url. If the task runs for
+    more than timeout seconds, a FAIL result is posted and the process
+    exits, since the thread running the model function cannot be stopped.
+    """
     print("async task", callback_url, func, task_kwargs)
     start = time.time()
     traceback_str = None
+    timed_out = False
     res = {
         "task_name": task_name,
     }
+    task_id = None
     try:
         if task_kwargs is None:
             print("getting task_kwargs")
             resp = await get_task_kwargs(callback_url)
             task_kwargs = resp.json()["inputs"]
+            task_id = resp.json().get("id")
         print("got task_kwargs", task_kwargs)
-        outputs = func(**(task_kwargs or {}))
+        try:
+            outputs = await asyncio.wait_for(
+                run_in_executor(
+                    callback_url, task_name, func, task_kwargs or {}, start
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            timed_out = True
+            raise Exception(f"Task timed out after {timeout} seconds.")
+        if task_name == "sim" and storage.STORAGE_URL:
+            # Upload the outputs directly and only send the manifest
+            # through the callback url.
+            loop = asyncio.get_running_loop()
+            outputs, res["manifest"] = await loop.run_in_executor(
+                None, storage.write, task_id or str(uuid.uuid4()), outputs
+            )
         res.update(
             {
                 "model_version": functions.get_version(),
@@ -77,11 +150,13 @@ async def task_wrapper(callback_url, task_name, func, task_kwargs=None):
         res["status"] = "FAIL"
         res["traceback"] = traceback_str
 
-    print("saving results...")
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(callback_url, json=res, timeout=120)
-
-    print("resp", resp.status_code, resp.url)
-    assert resp.status_code in (200, 201), f"Got code: {resp.status_code} ({resp.text})"
+    try:
+        await post_result(callback_url, res)
+    finally:
+        if timed_out:
+            # Exit without waiting for the model function's thread. Pool
+            # workers are restarted by their deployment.
+            print("Exiting after timeout.", flush=True)
+            os._exit(1)
 
     return res
@@ -0,0 +1,47 @@
+import hashlib
+import json
+import zipfile
+
+from cs_jobs import storage
+
+
+def test_write(tmp_path):
+    outputs = {
+        "renderable": [
+            {"media_type": "table", "title": "Table", "data": "<table></table>"},
+            {"media_type": "bokeh", "title": "Plot", "data": {"a": [1, 2, 3]}},
+        ],
+        "downloadable": [
+            {"media_type": "CSV", "title": "data.csv", "data": "a,b\n1,2\n"}
+        ],
+    }
+    storage_url = f"file://{tmp_path}"
+
+    rem_result, manifest = storage.write("abc", outputs, storage_url=storage_url)
+
+    assert manifest["storage_url"] == storage_url
+    assert [f["location"] for f in manifest["files"]] == [
+        "abc_renderable.zip",
+        "abc_downloadable.zip",
+    ]
+    for file in manifest["files"]:
+        data = (tmp_path / file["location"]).read_bytes()
+        assert file["size"] == len(data)
+        assert file["checksum"] == f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+    assert rem_result["renderable"]["ziplocation"] == "abc_renderable.zip"
+    assert [o["filename"] for o in rem_result["renderable"]["outputs"]] == [
+        "Table.html",
+        "Plot.json",
+    ]
+    assert [o["filename"] for o in rem_result["downloadable"]["outputs"]] == [
+        "data.csv"
+    ]
+
+    with zipfile.ZipFile(tmp_path / "abc_renderable.zip") as z:
+        assert z.namelist() == ["Table.html", "Plot.json"]
+        assert z.read("Table.html") == b"<table></table>"
+        assert json.loads(z.read("Plot.json")) == {"a": [1, 2, 3]}
+        assert all(i.compress_type == zipfile.ZIP_DEFLATED for i in z.infolist())
+    with zipfile.ZipFile(tmp_path / "abc_downloadable.zip") as z:
+        assert z.read("data.csv") == b"a,b\n1,2\n"
@@ -18,7 +18,7 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/compute-tooling/compute-studio",
     packages=setuptools.find_packages(),
-    install_requires=["httpx", "cs-storage"],
+    install_requires=["httpx", "cs-storage", "fsspec", "redis", "rq"],
     include_package_data=True,
     entry_points={"console_scripts": ["cs-jobs=cs_jobs.job:cli"]},
     classifiers=[
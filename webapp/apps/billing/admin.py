@@ -1,6 +1,14 @@
 from django.contrib import admin
 
-from .models import Customer, Product, Plan, Subscription, SubscriptionItem, Event
+from .models import (
+    Customer,
+    Product,
+    Plan,
+    Subscription,
+    SubscriptionItem,
+    Event,
+    InvoiceProgress,
+)
 
 # Register your models here.
 admin.site.register(Customer)
@@ -9,3 +17,4 @@ admin.site.register(Plan)
 admin.site.register(Subscription)
 admin.site.register(SubscriptionItem)
 admin.site.register(Event)
+admin.site.register(InvoiceProgress)
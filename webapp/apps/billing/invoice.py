@@ -2,20 +2,27 @@
 Create invoices for previous month's usage.
 
 - For each customer:
-  - Loop over all simulations that they own or sponsored.
+  - Group the simulations that they own or sponsored by project and tag.
     - Sum time * price / sec
   - Loop over all deployments where they own the embed approval or are owners.
     - Sum length of deployment * price / sec
+
+Stripe requests are made with idempotency keys and each customer's progress
+is recorded in InvoiceProgress, so a failed run can be retried without
+billing customers twice.
 """
+import hashlib
 import math
 import os
 from collections import defaultdict
 from datetime import datetime
 from pprint import pprint
 
+from django.db.models import Count, Sum
 from django.utils import timezone
 
-from webapp.apps.billing.models import Customer
+from webapp.apps.billing.models import Customer, InvoiceProgress
+from webapp.apps.users.models import get_server_cost
 
 import stripe
 
@@ -23,30 +30,44 @@ import stripe
 
 
 def process_simulations(simulations):
+    """
+    Group the simulations by project and tag with a single aggregate query.
+    Each group records the number of simulations, the tag's server cost, and
+    their total run time. Projects that have been deleted or that are not
+    doing pay per sim are handled elsewhere.
+    """
+    groups = (
+        simulations.filter(
+            project__isnull=False, project__pay_per_sim=True, run_time__gt=0
+        )
+        .order_by()
+        .values(
+            "project__owner__user__username",
+            "project__title",
+            "project__cpu",
+            "project__memory",
+            "tag",
+            "tag__image_tag",
+            "tag__cpu",
+            "tag__memory",
+        )
+        .annotate(n=Count("pk"), total_run_time=Sum("run_time"))
+    )
     results = defaultdict(list)
-    for simulation in simulations.all():
-        project = simulation.project
-        # Project is deleted.
-        if project is None:
-            continue
-        # Projects not doing pay per sim are handled elsewhere.
-        if not project.pay_per_sim:
-            continue
-
-        if getattr(simulation, "tag"):
-            server_cost = simulation.tag.server_cost
+    for group in groups:
+        project = f"{group['project__owner__user__username']}/{group['project__title']}"
+        if group["tag"] is not None:
+            server_cost = get_server_cost(group["tag__cpu"], group["tag__memory"])
         else:
-            server_cost = project.server_cost
-        run_time = simulation.run_time
-
-        if run_time <= 0:
-            continue
-
-        results[str(project)].append(
+            server_cost = get_server_cost(
+                group["project__cpu"], group["project__memory"]
+            )
+        results[project].append(
             {
-                "model_pk": simulation.model_pk,
+                "tag": group["tag__image_tag"],
+                "n": group["n"],
                 "server_cost": server_cost,
-                "run_time": run_time,
+                "run_time": group["total_run_time"],
             }
         )
 
@@ -83,10 +104,14 @@ def process_deployments(deployments):
 
 
 def aggregate_metrics(grouped):
+    """
+    Totals for each project. Metrics are either single deployments or
+    groups of simulations with a count of "n".
+    """
     results = {}
     for project, metrics in grouped.items():
         results[project] = {
-            "n": len(metrics),
+            "n": sum(metric.get("n", 1) for metric in metrics),
             "total_cost": round(
                 sum(
                     metric["server_cost"] * metric["run_time"] / 3600
@@ -99,8 +124,64 @@ def aggregate_metrics(grouped):
     return results
 
 
-def create_invoice_items(customer, aggregated_metrics, description, period):
+def idempotency_key(customer, period, *parts):
+    """
+    Stripe idempotency key for a request made while invoicing the customer
+    for the period. Retrying a request with the same key returns the result
+    of the first request instead of creating a duplicate object.
+    """
+    key = ":".join(
+        [customer.stripe_id, str(period["start"]), str(period["end"])]
+        + [str(part) for part in parts]
+    )
+    return f"invoice-{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def period_metadata(period):
+    return {"period_start": str(period["start"]), "period_end": str(period["end"])}
+
+
+def in_period(obj, period):
+    metadata = obj.metadata.to_dict()
+    return all(metadata.get(k) == v for k, v in period_metadata(period).items())
+
+
+def find_invoice(customer, period, invoice_id=None):
+    """
+    The customer's invoice for the period if it was created by a previous
+    run. Idempotency keys expire after 24 hours, so runs that are resumed
+    look for the invoice instead of relying on them.
+    """
+    if invoice_id is not None:
+        return stripe.Invoice.retrieve(invoice_id)
+    invoices = stripe.Invoice.list(
+        customer=customer.stripe_id, created={"gte": period["start"]}
+    )
+    for invoice in invoices.auto_paging_iter():
+        if in_period(invoice, period):
+            return invoice
+    return None
+
+
+def pending_invoice_items(customer, period):
+    """
+    Project and description of the customer's invoice items for the period
+    that were created by a previous run and are not on an invoice yet.
+    """
+    items = stripe.InvoiceItem.list(customer=customer.stripe_id, pending=True)
+    return {
+        (item.metadata["project"], item.metadata["description"])
+        for item in items.auto_paging_iter()
+        if in_period(item, period)
+    }
+
+
+def create_invoice_items(
+    customer, aggregated_metrics, description, period, existing=()
+):
     for project, metrics in aggregated_metrics.items():
+        if (project, description) in existing:
+            continue
         n, total_cost, total_time = (
             metrics["n"],
             metrics["total_cost"],
@@ -116,11 +197,16 @@ def create_invoice_items(customer, aggregated_metrics, description, period):
             description=f"{project} ({n} {description} totalling {time_msg})",
             period=period,
             currency="usd",
-            metadata={"project": project, "description": description},
+            metadata={
+                "project": project,
+                "description": description,
+                **period_metadata(period),
+            },
+            idempotency_key=idempotency_key(customer, period, project, description),
         )
 
 
-def invoice_customer(customer, start, end, send_invoice=True):
+def summarize_customer(customer, start, end):
     profile = customer.user.profile
     owner_sims = process_simulations(
         profile.sims.filter(
@@ -180,38 +266,100 @@ def invoice_customer(customer, start, end, send_invoice=True):
     print("Customer username:", profile)
     pprint(summary["summary"])
 
-    create_invoice = (
-        bool(owner_sim_costs)
-        or bool(sponsor_sim_costs)
-        or bool(ea_deployment_costs)
-        or bool(owner_deployment_costs)
+    return summary
+
+
+def has_usage(summary):
+    return any(
+        bool(costs)
+        for resource in summary["summary"].values()
+        for costs in resource.values()
     )
 
-    if not create_invoice:
-        return summary
 
-    start_ts = math.floor(start.timestamp())
-    end_ts = math.floor(end.timestamp())
+def billing_period(start, end):
+    return {"start": math.floor(start.timestamp()), "end": math.floor(end.timestamp())}
 
-    period = {"start": start_ts, "end": end_ts}
 
-    if send_invoice:
-        create_invoice_items(customer, owner_sim_costs, "simulations", period)
-        create_invoice_items(
-            customer, sponsor_sim_costs, "sponsored simulations", period
-        )
-        create_invoice_items(
-            customer, ea_deployment_costs, "embedded deployments", period
-        )
-        create_invoice_items(
-            customer, owner_deployment_costs, "sponsored deployments", period
-        )
+def start_invoice(customer, start, end):
+    """
+    Returns the customer's progress for the period and whether a previous
+    run already started invoicing them.
+    """
+    progress, created = InvoiceProgress.objects.get_or_create(
+        customer=customer, period_start=start, period_end=end
+    )
+    return progress, not created
+
+
+def finish_invoice(progress, invoice):
+    progress.status = InvoiceProgress.INVOICED
+    progress.invoice_id = invoice.id if invoice is not None else None
+    progress.save()
+
+
+def send_customer_invoice(customer, summary, period, resume=False, invoice_id=None):
+    """
+    Create the invoice items and the invoice for the customer's usage. Only
+    Stripe is called here so that this can run in a separate thread. If a
+    previous run was interrupted, the invoice and invoice items that it
+    created are reused.
+    """
+    existing = set()
+    if resume:
+        invoice = find_invoice(customer, period, invoice_id)
+        if invoice is not None:
+            print("found invoice for ", customer, invoice.id)
+            return invoice
+        existing = pending_invoice_items(customer, period)
+
+    simulations = summary["summary"]["simulations"]
+    deployments = summary["summary"]["deployments"]
+    create_invoice_items(
+        customer, simulations["owner"], "simulations", period, existing
+    )
+    create_invoice_items(
+        customer, simulations["sponsor"], "sponsored simulations", period, existing
+    )
+    create_invoice_items(
+        customer,
+        deployments["embed_approval"],
+        "embedded deployments",
+        period,
+        existing,
+    )
+    create_invoice_items(
+        customer, deployments["owner"], "sponsored deployments", period, existing
+    )
 
-        print("creating invoice for ", customer, customer.user.profile)
-        invoice = stripe.Invoice.create(
-            customer=customer.stripe_id,
-            description="Compute Studio Usage Subscription",
+    print("creating invoice for ", customer, customer.user.profile)
+    return stripe.Invoice.create(
+        customer=customer.stripe_id,
+        description="Compute Studio Usage Subscription",
+        metadata=period_metadata(period),
+        idempotency_key=idempotency_key(customer, period),
+    )
+
+
+def invoice_customer(customer, start, end, send_invoice=True):
+    summary = summarize_customer(customer, start, end)
+
+    if not has_usage(summary):
+        if send_invoice:
+            progress, _ = start_invoice(customer, start, end)
+            finish_invoice(progress, None)
+        return summary
+
+    if send_invoice:
+        progress, resume = start_invoice(customer, start, end)
+        invoice = send_customer_invoice(
+            customer,
+            summary,
+            billing_period(start, end),
+            resume=resume,
+            invoice_id=progress.invoice_id,
         )
+        finish_invoice(progress, invoice)
     else:
         invoice = None
 
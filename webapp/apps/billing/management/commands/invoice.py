@@ -2,19 +2,32 @@
 Create invoices for previous month's usage.
 
 - For each customer:
-  - Loop over all simulations that they own or sponsored.
+  - Group the simulations that they own or sponsored by project and tag.
     - Sum time * price / sec
   - Loop over all deployments where they own the embed approval or are owners.
     - Sum length of deployment * price / sec
+- Record the customer's progress so that the run can be resumed.
 """
 import calendar
+from concurrent import futures
 from datetime import datetime
 
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
-from webapp.apps.billing.models import Customer
-from webapp.apps.billing.invoice import invoice_customer
+from webapp.apps.billing.models import Customer, InvoiceProgress
+from webapp.apps.billing.invoice import (
+    billing_period,
+    finish_invoice,
+    has_usage,
+    send_customer_invoice,
+    start_invoice,
+    summarize_customer,
+)
+
+
+# Number of customers that are loaded from the database at a time.
+CHUNK_SIZE = 500
 
 
 def parse_date(date_str):
@@ -22,12 +35,24 @@ def parse_date(date_str):
 
 
 class Command(BaseCommand):
-    help = "Closes the specified poll for voting"
+    help = (
+        "Invoices customers for their usage during the billing period. "
+        "Customers that were already invoiced for the period are skipped, so "
+        "a failed run can be resumed by running it again. The invoices and "
+        "invoice items that a failed run created are looked up in Stripe, "
+        "since Stripe only keeps idempotency keys for 24 hours."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument("--start")
         parser.add_argument("--end")
         parser.add_argument("--dryrun", action="store_true")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of customers whose Stripe requests are made concurrently.",
+        )
 
     def handle(self, *args, **options):
         print(options)
@@ -43,8 +68,70 @@ class Command(BaseCommand):
             _, end_day = calendar.monthrange(start.year, start.month)
             end = start.replace(day=end_day)
         print(f"Billing period: {str(start.date())} to {str(end.date())}")
-        for customer in Customer.objects.all():
-            if not customer.user:
-                # print("customer", customer)
-                continue
-            invoice_customer(customer, start, end, send_invoice=not options["dryrun"])
+        send_invoice = not options["dryrun"]
+        customers = (
+            Customer.objects.filter(user__isnull=False)
+            .select_related("user__profile")
+            .order_by("pk")
+        )
+        if send_invoice:
+            customers = customers.exclude(
+                pk__in=InvoiceProgress.objects.filter(
+                    period_start=start, period_end=end, status=InvoiceProgress.INVOICED,
+                ).values("customer")
+            )
+            self.invoice_customers(customers, start, end, options["workers"])
+        else:
+            for customer in customers.iterator(chunk_size=CHUNK_SIZE):
+                summarize_customer(customer, start, end)
+
+    def invoice_customers(self, customers, start, end, workers):
+        """
+        Usage is summarized and progress is recorded in this thread while
+        the Stripe requests for up to `workers` customers are made in a
+        thread pool. At most two customers per worker are queued at a time so
+        that customers are still loaded from the database in chunks.
+        """
+        period = billing_period(start, end)
+        pending = {}
+        failed = []
+
+        def wait(return_when):
+            done, _ = futures.wait(pending, return_when=return_when)
+            for future in done:
+                customer, progress = pending.pop(future)
+                try:
+                    invoice = future.result()
+                # The customer's progress stays started so that they are
+                # retried by the next run.
+                except Exception as e:
+                    print("unable to invoice customer", customer.stripe_id, e)
+                    failed.append(customer)
+                else:
+                    finish_invoice(progress, invoice)
+
+        with futures.ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for customer in customers.iterator(chunk_size=CHUNK_SIZE):
+                summary = summarize_customer(customer, start, end)
+                progress, resume = start_invoice(customer, start, end)
+                if not has_usage(summary):
+                    finish_invoice(progress, None)
+                    continue
+                future = executor.submit(
+                    send_customer_invoice,
+                    customer,
+                    summary,
+                    period,
+                    resume=resume,
+                    invoice_id=progress.invoice_id,
+                )
+                pending[future] = (customer, progress)
+                if len(pending) >= 2 * workers:
+                    wait(futures.FIRST_COMPLETED)
+            wait(futures.ALL_COMPLETED)
+
+        if failed:
+            raise CommandError(
+                f"Unable to invoice {len(failed)} customers. Run the command "
+                f"again to retry them."
+            )
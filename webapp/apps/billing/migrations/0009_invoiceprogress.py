@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("billing", "0008_auto_20211012_1327"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InvoiceProgress",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period_start", models.DateTimeField()),
+                ("period_end", models.DateTimeField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("started", "Started"), ("invoiced", "Invoiced")],
+                        default="started",
+                        max_length=16,
+                    ),
+                ),
+                ("invoice_id", models.CharField(blank=True, max_length=255, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "customer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="invoice_progress",
+                        to="billing.customer",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="invoiceprogress",
+            constraint=models.UniqueConstraint(
+                fields=("customer", "period_start", "period_end"),
+                name="unique_customer_invoice_period",
+            ),
+        ),
+    ]
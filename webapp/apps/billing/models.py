@@ -594,6 +594,37 @@ class Event(models.Model):
         return event
 
 
+class InvoiceProgress(models.Model):
+    """
+    Tracks a customer's usage invoice for a billing period so that an
+    interrupted invoice run resumes with the customers that have not been
+    invoiced yet.
+    """
+
+    STARTED = "started"
+    INVOICED = "invoiced"
+    STATUS_CHOICES = ((STARTED, "Started"), (INVOICED, "Invoiced"))
+
+    customer = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, related_name="invoice_progress"
+    )
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STARTED)
+    # Null if there was no usage to invoice.
+    invoice_id = models.CharField(max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["customer", "period_start", "period_end"],
+                name="unique_customer_invoice_period",
+            )
+        ]
+
+
 def create_pro_billing_objects():
     if Product.objects.filter(name="Compute Studio Subscription").count() == 0:
         stripe_obj = Product.create_stripe_object("Compute Studio Subscription")
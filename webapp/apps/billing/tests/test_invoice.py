@@ -1,15 +1,26 @@
 from datetime import timedelta
 
 import pytest
+import stripe
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.utils import timezone
 from django.db.models import F, Sum
 
 from webapp.settings import USE_STRIPE
 from webapp.apps.billing import invoice
+from webapp.apps.billing.models import InvoiceProgress
+from webapp.apps.billing.tests.utils import StubStripeServer
 
 from webapp.apps.comp.models import Simulation
-from webapp.apps.users.models import Deployment, Project, Profile, EmbedApproval
+from webapp.apps.users.models import (
+    Deployment,
+    EmbedApproval,
+    Profile,
+    Project,
+    Tag,
+)
 
 
 def round4(val):
@@ -314,3 +325,148 @@ class TestInvoice:
                 assert line.amount == int(100 * other_profiles_sims_cost)
             else:
                 raise ValueError(f"{line.name} {line.metadata}")
+
+
+def test_process_simulations(db, profile, owner_sims, django_assert_num_queries):
+    """
+    Simulations are grouped by project and tag and each group is charged
+    at its tag's server cost.
+    """
+    project = owner_sims.first().project
+    tag = Tag.objects.create(project=project, image_tag="v1", cpu=4, memory=12)
+    Simulation.objects.filter(
+        pk__in=list(owner_sims.values_list("pk", flat=True)[:4])
+    ).update(tag=tag)
+
+    with django_assert_num_queries(1):
+        grouped = invoice.process_simulations(profile.sims.all())
+
+    groups = sorted(grouped[str(project)], key=lambda group: group["n"])
+    assert [(group["tag"], group["n"]) for group in groups] == [("v1", 4), (None, 6)]
+    assert groups[0]["server_cost"] == tag.server_cost
+    assert groups[1]["server_cost"] == project.server_cost
+    assert invoice.aggregate_metrics(grouped)[str(project)] == {
+        "n": 10,
+        "total_cost": round4(
+            (4 * tag.server_cost + 6 * project.server_cost) * 60 / 3600
+        ),
+        "total_time": 10.0,
+    }
+
+
+@pytest.fixture
+def stub_stripe(monkeypatch):
+    with StubStripeServer() as server:
+        monkeypatch.setattr(stripe, "api_key", "sk_test_stub")
+        monkeypatch.setattr(stripe, "api_base", server.url)
+        yield server
+
+
+def test_resume_invoice_run(db, profile_w_mockcustomer, stub_stripe):
+    """
+    A failed invoice run is resumed without invoicing customers twice.
+    """
+    project = Project.objects.get(title="Used-for-testing")
+    gen_simulations(
+        owner=profile_w_mockcustomer, sponsor=None, project=project, run_times=[60]
+    )
+    today = timezone.now().date()
+    start = (today - timedelta(days=7)).isoformat()
+    end = (today + timedelta(days=1)).isoformat()
+    args = ["--start", start, "--end", end, "--workers", "2"]
+
+    stub_stripe.fail["/v1/invoices"] = 1
+    with pytest.raises(CommandError):
+        call_command("invoice", *args)
+    progress = InvoiceProgress.objects.get(
+        customer=profile_w_mockcustomer.user.customer
+    )
+    assert progress.status == InvoiceProgress.STARTED
+
+    call_command("invoice", *args)
+    progress.refresh_from_db()
+    assert progress.status == InvoiceProgress.INVOICED
+    assert [progress.invoice_id] == list(stub_stripe.created("/v1/invoices"))
+    assert len(stub_stripe.created("/v1/invoiceitems")) == 1
+    # The pending invoice item from the failed run is reused.
+    item_requests = [
+        request
+        for request in stub_stripe.requests
+        if request["method"] == "POST" and request["path"] == "/v1/invoiceitems"
+    ]
+    assert len(item_requests) == 1
+
+    n_requests = len(stub_stripe.requests)
+    call_command("invoice", *args)
+    assert len(stub_stripe.requests) == n_requests
+
+
+def test_resume_invoice_run_after_keys_expire(
+    db, profile_w_mockcustomer, stub_stripe, monkeypatch
+):
+    """
+    An invoice created by an interrupted run is found by its metadata once
+    Stripe has forgotten the idempotency keys.
+    """
+    project = Project.objects.get(title="Used-for-testing")
+    gen_simulations(
+        owner=profile_w_mockcustomer, sponsor=None, project=project, run_times=[60]
+    )
+    today = timezone.now().date()
+    start = (today - timedelta(days=7)).isoformat()
+    end = (today + timedelta(days=1)).isoformat()
+    args = ["--start", start, "--end", end]
+
+    interrupted = []
+
+    def finish_invoice(progress, stripe_invoice):
+        if stripe_invoice is not None and not interrupted:
+            interrupted.append(progress)
+            raise KeyboardInterrupt()
+        invoice.finish_invoice(progress, stripe_invoice)
+
+    monkeypatch.setattr(
+        "webapp.apps.billing.management.commands.invoice.finish_invoice",
+        finish_invoice,
+    )
+    with pytest.raises(KeyboardInterrupt):
+        call_command("invoice", *args)
+    assert len(stub_stripe.created("/v1/invoices")) == 1
+
+    stub_stripe.expire_idempotency_keys()
+    call_command("invoice", *args)
+    progress = InvoiceProgress.objects.get(
+        customer=profile_w_mockcustomer.user.customer
+    )
+    assert progress.status == InvoiceProgress.INVOICED
+    assert {progress.invoice_id} == stub_stripe.created("/v1/invoices")
+    assert len(stub_stripe.created("/v1/invoiceitems")) == 1
+
+
+def test_invoice_run_unexpected_error(
+    db, profile_w_mockcustomer, stub_stripe, monkeypatch
+):
+    """
+    Customers whose invoice fails with any error are retried by the next run.
+    """
+    project = Project.objects.get(title="Used-for-testing")
+    gen_simulations(
+        owner=profile_w_mockcustomer, sponsor=None, project=project, run_times=[60]
+    )
+    today = timezone.now().date()
+    start = (today - timedelta(days=7)).isoformat()
+    end = (today + timedelta(days=1)).isoformat()
+
+    def send_customer_invoice(*args, **kwargs):
+        raise ValueError("unexpected")
+
+    monkeypatch.setattr(
+        "webapp.apps.billing.management.commands.invoice.send_customer_invoice",
+        send_customer_invoice,
+    )
+    with pytest.raises(CommandError):
+        call_command("invoice", "--start", start, "--end", end)
+    progress = InvoiceProgress.objects.get(
+        customer=profile_w_mockcustomer.user.customer
+    )
+    assert progress.status == InvoiceProgress.STARTED
@@ -1,3 +1,8 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
 from django.contrib import auth
 from rest_framework.authtoken.models import Token
 
@@ -14,3 +19,121 @@ def gen_blank_customer(username, email, password):
     stripe_customer = stripe.Customer.create(email=email, source="tok_bypassPending")
     customer, _ = Customer.get_or_construct(stripe_customer.id, user)
     return Profile.objects.create(user=customer.user, is_active=True)
+
+
+class StubStripeServer:
+    """
+    Minimal local stand-in for the Stripe API. Requests are recorded, and
+    requests with an idempotency key that was already used get the same
+    response as the first request, like they do with Stripe. Set
+    fail[path] to the number of requests to path that should fail.
+    """
+
+    OBJECTS = {
+        "/v1/invoiceitems": ("ii", "invoiceitem"),
+        "/v1/invoices": ("in", "invoice"),
+    }
+
+    def __init__(self):
+        self.requests = []
+        self.responses = {}
+        self.objects = {path: [] for path in self.OBJECTS}
+        self.fail = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def created(self, path):
+        """Objects that were created by requests to path."""
+        return {obj["id"] for obj in self.objects[path]}
+
+    def expire_idempotency_keys(self):
+        """Forget idempotency keys, like Stripe does after 24 hours."""
+        self.responses = {}
+
+    def respond(self, path, key, data):
+        with self.lock:
+            self.requests.append(
+                {"method": "POST", "path": path, "idempotency_key": key, "data": data}
+            )
+            if self.fail.get(path, 0) > 0:
+                self.fail[path] -= 1
+                return (
+                    400,
+                    {"error": {"type": "invalid_request_error", "message": "stub"}},
+                )
+            if key is not None and (path, key) in self.responses:
+                return 200, self.responses[(path, key)]
+            prefix, object_name = self.OBJECTS[path]
+            response = {
+                "id": f"{prefix}_{len(self.requests)}",
+                "object": object_name,
+                "customer": data.get("customer", [None])[0],
+                "metadata": {
+                    name[len("metadata[") : -1]: value[0]
+                    for name, value in data.items()
+                    if name.startswith("metadata[")
+                },
+            }
+            if path == "/v1/invoiceitems":
+                response["invoice"] = None
+            else:
+                # Pending invoice items are added to the customer's invoice.
+                for item in self.objects["/v1/invoiceitems"]:
+                    if item["customer"] == response["customer"] and not item["invoice"]:
+                        item["invoice"] = response["id"]
+            self.objects[path].append(response)
+            self.responses[(path, key)] = response
+            return 200, response
+
+    def list(self, path, query):
+        with self.lock:
+            self.requests.append(
+                {"method": "GET", "path": path, "idempotency_key": None, "data": query}
+            )
+            data = [
+                obj
+                for obj in self.objects[path]
+                if obj["customer"] == query["customer"][0]
+                and not (query.get("pending") == ["true"] and obj["invoice"])
+            ]
+            return 200, {"object": "list", "data": data, "has_more": False, "url": path}
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                self.send(*stub.list(url.path, parse_qs(url.query)))
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                data = parse_qs(self.rfile.read(length).decode())
+                self.send(
+                    *stub.respond(self.path, self.headers.get("Idempotency-Key"), data)
+                )
+
+            def send(self, status, response):
+                body = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,9 +1,11 @@
 import datetime
+import json
 from collections import namedtuple
 
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse, HttpRequest
+from django.http import Http404, HttpResponse, HttpRequest
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
@@ -13,11 +15,15 @@ import paramtools as pt
 from webapp.apps.users.models import Project
 
 from webapp.apps.comp import actions
-from webapp.apps.comp.constants import OUT_OF_RANGE_ERROR_MSG, WEBAPP_VERSION
-from webapp.apps.comp.compute import Compute
+from webapp.apps.comp.constants import (
+    MAX_BATCH_SIZE,
+    OUT_OF_RANGE_ERROR_MSG,
+    WEBAPP_VERSION,
+)
+from webapp.apps.comp.compute import Compute, DeferredCompute
 from webapp.apps.comp.exceptions import ValidationError, BadPostException
 from webapp.apps.comp.ioutils import IOClasses
-from webapp.apps.comp.models import Inputs, Simulation
+from webapp.apps.comp.models import Inputs, JSONBlob, Simulation
 from webapp.apps.comp.serializers import InputsSerializer
 
 
@@ -113,6 +119,163 @@ class SubmitInputs:
         return self.inputs
 
 
+class SubmitInputsBatch:
+    """
+    Create a batch of simulations from a list of inputs. The simulations are
+    created in one transaction and their parse jobs are submitted to the
+    cluster with a single request.
+    """
+
+    webapp_version = WEBAPP_VERSION
+
+    def __init__(
+        self,
+        request: HttpRequest,
+        project: Project,
+        ioutils: IOClasses,
+        compute: DeferredCompute,
+    ):
+        self.request = request
+        self.user = self.request.user
+        self.project = project
+        self.ioutils = ioutils
+        self.compute = compute
+        self.valid_meta_params = {}
+
+    def validate_meta_parameters(self, meta_parameters):
+        """
+        Validate meta parameters once for each distinct set in the batch.
+        """
+        key = json.dumps(meta_parameters, sort_keys=True)
+        if key not in self.valid_meta_params:
+            parser = self.ioutils.model_parameters.meta_parameters_parser()
+            parser.adjust(meta_parameters)
+            self.valid_meta_params[key] = parser.specification(
+                meta_data=False, serializable=True
+            )
+        return self.valid_meta_params[key]
+
+    def get_parent_sims(self, validated_data):
+        parent_model_pks = {
+            data["parent_model_pk"]
+            for data in validated_data
+            if data.get("parent_model_pk") is not None
+        }
+        if not parent_model_pks:
+            return {}
+        parent_sims = {
+            sim.model_pk: sim
+            for sim in Simulation.objects.filter(
+                project=self.project, model_pk__in=parent_model_pks
+            )
+        }
+        if len(parent_sims) < len(parent_model_pks):
+            raise Http404("Parent simulation not found.")
+        return parent_sims
+
+    def submit(self):
+        if not isinstance(self.request.data, list) or not self.request.data:
+            raise BadPostException({"detail": "Expected a list of simulations."})
+        if len(self.request.data) > MAX_BATCH_SIZE:
+            raise BadPostException(
+                {
+                    "detail": (
+                        f"At most {MAX_BATCH_SIZE} simulations may be "
+                        f"submitted at once."
+                    )
+                }
+            )
+
+        self.ser = InputsSerializer(data=self.request.data, many=True)
+        is_valid = self.ser.is_valid()
+        if not is_valid:
+            raise BadPostException(self.ser.errors)
+
+        validated_data = self.ser.validated_data
+        parent_sims = self.get_parent_sims(validated_data)
+
+        errors = []
+        positions = []
+        inputs_kwargs = []
+        sims_kwargs = []
+        for data in validated_data:
+            try:
+                valid_meta_params = self.validate_meta_parameters(
+                    data.get("meta_parameters", {})
+                )
+            except pt.ValidationError as ve:
+                errors.append({"meta_parameters": str(ve)})
+                continue
+            errors.append({})
+
+            parser = self.ioutils.Parser(
+                self.project,
+                self.ioutils.model_parameters,
+                data.get("adjustment", {}),
+                compute=self.compute,
+                **valid_meta_params,
+            )
+            result = parser.parse_parameters()
+            positions.append(result["job_id"])
+
+            parent_sim = parent_sims.get(data.get("parent_model_pk"))
+            inputs_kwargs.append(
+                dict(
+                    meta_parameters=valid_meta_params,
+                    adjustment=result["adjustment"],
+                    errors_warnings=result["errors_warnings"],
+                    custom_adjustment=result["custom_adjustment"],
+                    status="PENDING",
+                    parent_sim=parent_sim,
+                    model_config=self.ioutils.model_parameters.config,
+                    client=data.get("client", "rest-api"),
+                )
+            )
+            sim_kwargs = {}
+            if parent_sim is not None:
+                sim_kwargs.update(
+                    parent_sim=parent_sim,
+                    title=parent_sim.title,
+                    readme=parent_sim.readme,
+                )
+            if data.get("notify_on_completion") is not None:
+                sim_kwargs["notify_on_completion"] = data["notify_on_completion"]
+            sims_kwargs.append(sim_kwargs)
+
+        if any(errors):
+            raise BadPostException(errors)
+
+        with transaction.atomic():
+            sims = Simulation.objects.new_sims(
+                self.user, self.project, inputs_kwargs, sims_kwargs
+            )
+            for sim, data in zip(sims, validated_data):
+                if data.get("is_public") is False:
+                    sim.make_private_test()
+                    sim.is_public = False
+                    sim.save()
+
+        # The jobs are submitted after the sims are committed so that the
+        # project's model_pk counter is not locked during the request to
+        # the workers.
+        try:
+            job_ids = self.compute.flush()
+        except Exception:
+            Inputs.objects.filter(sim__in=sims).update(status="FAIL")
+            raise
+        with transaction.atomic():
+            for sim, position in zip(sims, positions):
+                sim.inputs.job_id = job_ids[position]
+            Inputs.objects.bulk_update([sim.inputs for sim in sims], ["job_id"])
+
+        self.inputs = (
+            Inputs.objects.filter(sim__in=sims)
+            .select_related("sim", "project", "model_config")
+            .order_by("sim__model_pk")
+        )
+        return self.inputs
+
+
 class SubmitSim:
     def __init__(self, sim: Simulation, compute: Compute):
         self.compute = compute
@@ -127,6 +290,15 @@ class SubmitSim:
         print("submit", data)
         project = self.sim.project
         tag = str(project.latest_tag)
+        self.sim.result_key = Simulation.objects.result_key(
+            project, tag, inputs.meta_parameters, inputs.adjustment
+        )
+        cached = Simulation.objects.cached_result(project, self.sim.result_key)
+        if cached is not None:
+            print(f"using cached result from {cached}")
+            self.sim = self.save_cached(cached)
+            return self.sim
+
         self.submitted_id = self.compute.submit_job(
             project=inputs.project,
             task_name=actions.SIM,
@@ -154,3 +326,22 @@ class SubmitSim:
         sim.creation_date = cur_dt
         sim.save()
         return sim
+
+    def save_cached(self, cached):
+        sim = self.sim
+        sim.status = "SUCCESS"
+        sim.is_cached = True
+        sim.cached_from = cached
+        sim.sponsor = sim.project.sponsor
+        sim.tag = cached.tag
+        sim.model_version = cached.model_version
+        sim.meta_data = JSONBlob.objects.share(cached.meta_data)
+        sim.outputs = JSONBlob.objects.share(cached.outputs)
+        sim.run_time = 0
+        sim.run_cost = 0
+
+        cur_dt = timezone.now()
+        sim.creation_date = cur_dt
+        sim.exp_comp_datetime = cur_dt
+        sim.save()
+        return sim
@@ -1,14 +1,35 @@
+import asyncio
 import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
 import requests
 import json
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, Timeout
 import requests_mock
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
 requests_mock.Mocker.TEST_PREFIX = "test"
 
 TIMEOUT_IN_SECONDS = 3.5
+BATCH_TIMEOUT_IN_SECONDS = 30
 MAX_ATTEMPTS_SUBMIT_JOB = 4
 
+# Exponential backoff with "full jitter" between failed submissions.
+BACKOFF_BASE_IN_SECONDS = 0.25
+BACKOFF_MAX_IN_SECONDS = 8
+
+# Connection pool settings for the keep-alive session of each cluster.
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = int(os.environ.get("COMPUTE_POOL_MAXSIZE", 16))
+
 
 class JobFailError(Exception):
     """An Exception to raise when a remote jobs has failed"""
@@ -21,98 +42,262 @@ class WorkersUnreachableError(Exception):
     """
 
 
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def session_key(url):
+    """
+    Sessions are shared by all requests to the same cluster, i.e. the
+    same scheme, host, and port.
+    """
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url):
+    """
+    Get the pooled, keep-alive session for the cluster at url. This
+    avoids a new TCP and TLS handshake for every submission.
+    """
+    key = session_key(url)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        if key not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
+
+def backoff_delay(attempts):
+    """
+    Number of seconds to wait before retrying after the n-th failed attempt.
+    Jitter spreads retries out so that a worker outage does not turn into a
+    retry storm.
+    """
+    cap = min(BACKOFF_MAX_IN_SECONDS, BACKOFF_BASE_IN_SECONDS * 2 ** attempts)
+    return random.uniform(0, cap)
+
+
 class Compute(object):
     def remote_submit_job(
         self, url: str, data: dict, timeout: int = TIMEOUT_IN_SECONDS, headers=None
     ):
-        response = requests.post(url, json=data, timeout=timeout, headers=headers)
+        response = get_session(url).post(
+            url, json=data, timeout=timeout, headers=headers
+        )
+        return response
+
+    async def async_remote_submit_job(
+        self,
+        client: "httpx.AsyncClient",
+        url: str,
+        data: dict,
+        timeout: int = TIMEOUT_IN_SECONDS,
+        headers=None,
+    ):
+        response = await client.post(url, json=data, timeout=timeout, headers=headers)
         return response
 
+    def job_url(self, project, path_prefix=""):
+        cluster = project.cluster
+        return f"{cluster.url}{path_prefix}/{project.owner}/{project.title}/"
+
     def submit_job(self, project, task_name, task_kwargs, path_prefix="", tag=None):
         print(
             "submitting", task_name,
         )
-        cluster = project.cluster
         tag = tag or str(project.latest_tag)
-        url = f"{cluster.url}{path_prefix}/{project.owner}/{project.title}/"
+        url = self.job_url(project, path_prefix)
         print(url)
         return self.submit(
             tasks=dict(task_name=task_name, tag=tag, task_kwargs=task_kwargs),
             url=url,
-            headers=cluster.headers(),
+            headers=project.cluster.headers(),
         )
 
-    def submit(self, tasks, url, headers):
-        submitted = False
+    def submit_jobs(self, project, task_name, tasks_kwargs, path_prefix="", tag=None):
+        """
+        Submit a batch of jobs for the same task with a single request and
+        return their ids in order. v0 clusters do not have a batch endpoint,
+        so the jobs are submitted one at a time.
+        """
+        print("submitting batch", task_name, len(tasks_kwargs))
+        if project.cluster.version == "v0":
+            return [
+                self.submit_job(project, task_name, task_kwargs, path_prefix, tag)
+                for task_kwargs in tasks_kwargs
+            ]
+        tag = tag or str(project.latest_tag)
+        url = f"{self.job_url(project, path_prefix)}batch/"
+        print(url)
+        return self.submit(
+            tasks=[
+                dict(task_name=task_name, tag=tag, task_kwargs=task_kwargs)
+                for task_kwargs in tasks_kwargs
+            ],
+            url=url,
+            headers=project.cluster.headers(),
+            timeout=BATCH_TIMEOUT_IN_SECONDS,
+        )
+
+    async def async_submit_job(
+        self, project, task_name, task_kwargs, path_prefix="", tag=None, client=None
+    ):
+        print(
+            "submitting async", task_name,
+        )
+        tag = tag or str(project.latest_tag)
+        url = self.job_url(project, path_prefix)
+        print(url)
+        return await self.async_submit(
+            tasks=dict(task_name=task_name, tag=tag, task_kwargs=task_kwargs),
+            url=url,
+            headers=project.cluster.headers(),
+            client=client,
+        )
+
+    def handle_response(self, url, response):
+        """
+        Returns a tuple of whether the tasks were submitted and the
+        result to return from submit.
+        """
+        if response.status_code in (200, 201):
+            print("submitted: ", url)
+            data = response.json()
+            if isinstance(data, list):
+                return True, [job.get("task_id") or job.get("id") for job in data]
+            return True, data.get("task_id") or data.get("id")
+        else:
+            print("FAILED: ", url, response.status_code, response.json())
+            return False, None
+
+    def submit(self, tasks, url, headers, timeout=TIMEOUT_IN_SECONDS):
         attempts = 0
-        while not submitted:
+        while True:
             try:
                 print(tasks)
                 response = self.remote_submit_job(
-                    url, data=tasks, timeout=TIMEOUT_IN_SECONDS, headers=headers
+                    url, data=tasks, timeout=timeout, headers=headers
                 )
-                if response.status_code in (200, 201):
-                    print("submitted: ", url)
-                    submitted = True
-                    data = response.json()
-                    job_id = data.get("task_id") or data.get("id")
-                else:
-                    print("FAILED: ", url, response.status_code, response.json())
-                    attempts += 1
+                submitted, result = self.handle_response(url, response)
+                if submitted:
+                    return result
             except Timeout:
                 print("Couldn't submit to: ", url)
-                attempts += 1
             except RequestException as re:
                 print("Something unexpected happened: ", re)
-                attempts += 1
+            attempts += 1
             if attempts > MAX_ATTEMPTS_SUBMIT_JOB:
                 print("Exceeded max attempts. Bailing out.")
                 raise WorkersUnreachableError()
+            time.sleep(backoff_delay(attempts))
 
-        return job_id
-
+    async def async_submit(self, tasks, url, headers, client=None):
+        """
+        Same as submit but does not block the event loop. Pass an
+        httpx.AsyncClient to share its connection pool across submissions.
+        """
+        if httpx is None:
+            raise ImportError("httpx must be installed to submit jobs asynchronously.")
+        if client is None:
+            async with httpx.AsyncClient() as client:
+                return await self.async_submit(tasks, url, headers, client=client)
 
-class SyncCompute(Compute):
-    def submit(self, tasks, url, headers):
-        submitted = False
         attempts = 0
-        while not submitted:
+        while True:
             try:
-                response = self.remote_submit_job(
-                    url, data=tasks, timeout=TIMEOUT_IN_SECONDS, headers=headers
+                response = await self.async_remote_submit_job(
+                    client, url, data=tasks, timeout=TIMEOUT_IN_SECONDS, headers=headers
                 )
-                if response.status_code == 200:
-                    print("submitted: ", url)
-                    submitted = True
-                    if not response.text:
-                        return
-                    data = response.json()
-                else:
-                    print("FAILED: ", url, response.status_code, response.text)
-                    attempts += 1
-            except Timeout:
+                submitted, result = self.handle_response(url, response)
+                if submitted:
+                    return result
+            except httpx.TimeoutException:
                 print("Couldn't submit to: ", url)
-                attempts += 1
-            except RequestException as re:
-                print("Something unexpected happened: ", re)
-                attempts += 1
+            except httpx.HTTPError as he:
+                print("Something unexpected happened: ", he)
+            attempts += 1
             if attempts > MAX_ATTEMPTS_SUBMIT_JOB:
                 print("Exceeded max attempts. Bailing out.")
                 raise WorkersUnreachableError()
+            await asyncio.sleep(backoff_delay(attempts))
+
+
+class DeferredCompute(Compute):
+    """
+    Collects the jobs passed to submit_job instead of submitting them. The
+    collected jobs are sent to the cluster in a single request with flush.
+    submit_job returns the position of the job in the batch, which flush
+    maps to the job ids returned by the cluster.
+    """
+
+    def __init__(self, compute=None):
+        self.compute = compute or Compute()
+        self.pending = []
+        self.job = None
+
+    def submit_job(self, project, task_name, task_kwargs, path_prefix="", tag=None):
+        job = (project, task_name, path_prefix, tag)
+        if self.job is not None and self.job != job:
+            raise ValueError("All jobs in a batch must be for the same task.")
+        self.job = job
+        self.pending.append(task_kwargs)
+        return len(self.pending) - 1
+
+    def flush(self):
+        if not self.pending:
+            return []
+        project, task_name, path_prefix, tag = self.job
+        job_ids = self.compute.submit_jobs(
+            project, task_name, self.pending, path_prefix=path_prefix, tag=tag
+        )
+        self.pending = []
+        self.job = None
+        return job_ids
+
+
+class SyncCompute(Compute):
+    def handle_response(self, url, response):
+        if response.status_code == 200:
+            print("submitted: ", url)
+            if not response.text:
+                return True, None
+            data = response.json()
+        else:
+            print("FAILED: ", url, response.status_code, response.text)
+            return False, None
 
         if isinstance(data, list):
             success = True
         else:
             success = data["status"] == "SUCCESS"
 
-        return success, data
+        return True, (success, data)
 
 
 class SyncProjects(SyncCompute):
-    def submit_job(self, project, cluster):
+    def sync_url(self, cluster):
         if cluster.version == "v0":
-            url = f"{cluster.url}/sync/"
+            return f"{cluster.url}/sync/"
         else:
-            url = f"{cluster.url}/api/v1/projects/sync/"
+            return f"{cluster.url}/api/v1/projects/sync/"
+
+    def submit_job(self, project, cluster):
+        url = self.sync_url(cluster)
         headers = cluster.headers()
         return self.submit(tasks=[project], url=url, headers=headers)
+
+    async def async_submit_job(self, project, cluster, client=None):
+        url = self.sync_url(cluster)
+        headers = cluster.headers()
+        return await self.async_submit(
+            tasks=[project], url=url, headers=headers, client=client
+        )
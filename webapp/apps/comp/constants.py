@@ -11,3 +11,6 @@ OUT_OF_RANGE_ERROR_MSG = mark_safe(
 
 
 WEBAPP_VERSION = settings.WEBAPP_VERSION
+
+# Max number of simulations that may be created with one batch request.
+MAX_BATCH_SIZE = 500
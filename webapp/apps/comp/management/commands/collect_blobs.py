@@ -0,0 +1,66 @@
+"""
+Recount the references to each JSONBlob and delete the unreferenced ones.
+
+- The references in each shared column are counted with a grouped aggregate.
+- Blobs that were shared recently are skipped, since the rows that refer
+  to them may not be committed yet.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.db.models.fields.json import KeyTextTransform
+from django.utils import timezone
+
+from webapp.apps.comp.models import BLOB_KEY, JSONBlob
+
+
+# Blobs that were shared within this period are not recounted.
+GRACE_PERIOD = timedelta(hours=1)
+
+
+class Command(BaseCommand):
+    help = "Recounts the references to shared JSON blobs and deletes unused blobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        blobs = JSONBlob.objects.filter(shared_at__lt=timezone.now() - GRACE_PERIOD)
+        ref_counts = dict(blobs.values_list("digest", "ref_count"))
+
+        counts = Counter()
+        for model_name, field in JSONBlob.SHARED_FIELDS:
+            model = apps.get_model("comp", model_name)
+            rows = (
+                model.objects.filter(**{f"{field}__has_key": BLOB_KEY})
+                .order_by()
+                .values(digest=KeyTextTransform(BLOB_KEY, field))
+                .annotate(n=models.Count("pk"))
+            )
+            for row in rows:
+                counts[row["digest"]] += row["n"]
+
+        drifted = {
+            digest: counts[digest]
+            for digest, ref_count in ref_counts.items()
+            if ref_count != counts[digest]
+        }
+        unused = [digest for digest in ref_counts if counts[digest] == 0]
+        print(
+            f"Found {len(drifted)} blobs with stale counts and "
+            f"{len(unused)} unused blobs."
+        )
+        if options["dry_run"]:
+            return
+
+        for digest, count in drifted.items():
+            # Blobs that were shared since they were counted keep their
+            # count and are left for the next run.
+            blobs.filter(digest=digest, ref_count=ref_counts[digest]).update(
+                ref_count=count
+            )
+        deleted, _ = blobs.filter(digest__in=unused, ref_count=0).delete()
+        print(f"Deleted {deleted} blobs.")
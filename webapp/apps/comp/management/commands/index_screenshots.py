@@ -0,0 +1,24 @@
+"""
+Add the renderable outputs of simulations that are missing from the
+screenshot index. Outputs are indexed when they are recorded, so this
+only needs to run once for simulations saved before the index existed.
+"""
+from django.core.management.base import BaseCommand
+
+from webapp.apps.comp.models import Simulation, SimulationScreenshot
+
+
+class Command(BaseCommand):
+    help = "Indexes the renderable outputs of simulations for screenshot lookups"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        sims = Simulation.objects.filter(
+            outputs__version="v1", screenshots__isnull=True
+        ).only("outputs")
+        indexed = 0
+        for sim in sims.iterator(chunk_size=options["chunk_size"]):
+            indexed += len(SimulationScreenshot.objects.index(sim))
+        print(f"Indexed {indexed} outputs.")
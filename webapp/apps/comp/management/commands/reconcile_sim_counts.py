@@ -0,0 +1,55 @@
+"""
+Repair the denormalized simulation counts on ModelPkCounter.
+
+- The counts are compared with a single grouped aggregate.
+- Projects whose counts drifted are recounted while their counter is locked.
+"""
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from webapp.apps.comp.models import ModelPkCounter, Simulation
+from webapp.apps.users.models import Project
+
+
+class Command(BaseCommand):
+    help = "Reconciles the sim and user counts of each project"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        counts = {
+            row["project"]: row
+            for row in Simulation.objects.filter(project__isnull=False)
+            .values("project")
+            .annotate(
+                sim_count=models.Count("pk"),
+                user_count=models.Count("owner__user", distinct=True),
+            )
+        }
+        counters = {
+            counter.project_id: counter
+            for counter in ModelPkCounter.objects.only(
+                "project_id", "sim_count", "user_count"
+            )
+        }
+        drifted = [
+            project_id
+            for project_id in set(counts) | set(counters)
+            if project_id not in counters
+            or project_id not in counts
+            or counters[project_id].sim_count != counts[project_id]["sim_count"]
+            or counters[project_id].user_count != counts[project_id]["user_count"]
+        ]
+        print(f"Found {len(drifted)} projects with stale counts.")
+        if options["dry_run"]:
+            return
+
+        for project in Project.objects.filter(pk__in=drifted):
+            with transaction.atomic():
+                # Lock the counter so that sims created in the meantime are
+                # either included in the recount or counted afterwards.
+                Simulation.objects.reserve_model_pks(project, 0)
+                sim_counts = Simulation.objects.sim_counts(project)
+                ModelPkCounter.objects.filter(project=project).update(**sim_counts)
+            print(f"Updated {project}: {sim_counts}")
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_counters(apps, schema_editor):
+    Simulation = apps.get_model("comp", "Simulation")
+    ModelPkCounter = apps.get_model("comp", "ModelPkCounter")
+    last_model_pks = (
+        Simulation.objects.filter(project__isnull=False)
+        .values("project")
+        .annotate(last_model_pk=models.Max("model_pk"))
+    )
+    ModelPkCounter.objects.bulk_create(
+        [
+            ModelPkCounter(
+                project_id=row["project"], last_model_pk=max(row["last_model_pk"], 0)
+            )
+            for row in last_model_pks
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0032_auto_20211012_1335"),
+        ("comp", "0030_auto_20211012_1327"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ModelPkCounter",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_model_pk", models.IntegerField(default=0)),
+                (
+                    "project",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="model_pk_counter",
+                        to="users.project",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_counters, migrations.RunPython.noop),
+    ]
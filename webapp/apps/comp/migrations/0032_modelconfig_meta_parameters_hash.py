@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:40
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def set_meta_parameters_hash(apps, schema_editor):
+    ModelConfig = apps.get_model("comp", "ModelConfig")
+    configs = ModelConfig.objects.only("meta_parameters_values")
+    for config in configs.iterator():
+        serialized = json.dumps(
+            config.meta_parameters_values or {}, sort_keys=True, separators=(",", ":")
+        )
+        config.meta_parameters_hash = hashlib.sha256(serialized.encode()).hexdigest()
+        config.save(update_fields=["meta_parameters_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0032_auto_20211012_1335"),
+        ("comp", "0031_modelpkcounter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="modelconfig",
+            name="meta_parameters_hash",
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(set_meta_parameters_hash, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="modelconfig", name="unique_model_config",
+        ),
+        migrations.AddConstraint(
+            model_name="modelconfig",
+            constraint=models.UniqueConstraint(
+                fields=("project", "model_version", "meta_parameters_hash"),
+                name="unique_model_config_hash",
+            ),
+        ),
+    ]
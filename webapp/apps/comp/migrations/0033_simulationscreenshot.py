@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def index_screenshots(apps, schema_editor):
+    Simulation = apps.get_model("comp", "Simulation")
+    SimulationScreenshot = apps.get_model("comp", "SimulationScreenshot")
+    sims = Simulation.objects.filter(outputs__version="v1").only("outputs")
+    for sim in sims.iterator():
+        SimulationScreenshot.objects.bulk_create(
+            [
+                SimulationScreenshot(output_id=output["id"], simulation=sim)
+                for output in sim.outputs["outputs"]["renderable"]["outputs"]
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comp", "0032_modelconfig_meta_parameters_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimulationScreenshot",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("output_id", models.CharField(max_length=64, unique=True)),
+                (
+                    "creation_date",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "simulation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="screenshots",
+                        to="comp.simulation",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(index_screenshots, migrations.RunPython.noop),
+    ]
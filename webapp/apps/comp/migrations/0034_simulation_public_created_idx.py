@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comp", "0033_simulationscreenshot"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="simulation",
+            index=models.Index(
+                fields=["is_public", "creation_date"], name="sim_public_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:35
+
+from django.db import migrations, models
+
+
+def set_sim_counts(apps, schema_editor):
+    Simulation = apps.get_model("comp", "Simulation")
+    ModelPkCounter = apps.get_model("comp", "ModelPkCounter")
+    counts = (
+        Simulation.objects.filter(project__isnull=False)
+        .values("project")
+        .annotate(
+            sim_count=models.Count("pk"),
+            user_count=models.Count("owner__user", distinct=True),
+        )
+    )
+    for row in counts.iterator():
+        ModelPkCounter.objects.filter(project_id=row["project"]).update(
+            sim_count=row["sim_count"], user_count=row["user_count"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comp", "0034_simulation_public_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="modelpkcounter",
+            name="sim_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="modelpkcounter",
+            name="user_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_sim_counts, migrations.RunPython.noop),
+    ]
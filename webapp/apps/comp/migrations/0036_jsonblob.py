@@ -0,0 +1,62 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:45
+
+from django.db import migrations, models
+import django.utils.timezone
+import webapp.apps.comp.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comp", "0035_modelpkcounter_sim_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JSONBlob",
+            fields=[
+                (
+                    "digest",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("data", models.JSONField()),
+                ("ref_count", models.IntegerField(default=0)),
+                ("shared_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="inputs",
+            name="adjustment",
+            field=webapp.apps.comp.models.BlobJSONField(
+                blank=True, default=dict, null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="inputs",
+            name="custom_adjustment",
+            field=webapp.apps.comp.models.BlobJSONField(
+                blank=True, default=dict, null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="inputs",
+            name="errors_warnings",
+            field=webapp.apps.comp.models.BlobJSONField(
+                blank=True, default=None, null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="simulation",
+            name="meta_data",
+            field=webapp.apps.comp.models.BlobJSONField(
+                blank=True, default=None, null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="simulation",
+            name="outputs",
+            field=webapp.apps.comp.models.BlobJSONField(
+                blank=True, default=None, null=True
+            ),
+        ),
+    ]
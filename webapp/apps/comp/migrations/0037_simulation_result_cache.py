@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comp", "0036_jsonblob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="simulation",
+            name="cached_from",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="cache_hits",
+                to="comp.simulation",
+            ),
+        ),
+        migrations.AddField(
+            model_name="simulation",
+            name="is_cached",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="simulation",
+            name="result_key",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="simulation",
+            index=models.Index(
+                fields=["project", "result_key"], name="sim_project_result_key_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-17 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comp", "0037_simulation_result_cache"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="simulationscreenshot",
+            name="output_id",
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name="simulationscreenshot",
+            constraint=models.UniqueConstraint(
+                fields=("output_id", "simulation"), name="unique_screenshot_simulation"
+            ),
+        ),
+    ]
@@ -1,9 +1,14 @@
 from typing import Union
+import copy
+import uuid
+
+from django.core.cache import cache
 from django.db.models.base import Model
 
 
 import paramtools as pt
 
+from webapp.apps.comp.cache import LRUCache, canonical_hash
 from webapp.apps.comp.models import ModelConfig
 from webapp.apps.comp.compute import Compute, SyncCompute, JobFailError
 from webapp.apps.comp import actions
@@ -15,11 +20,77 @@ import json
 
 INPUTS = os.path.join(os.path.abspath(os.path.dirname(__file__)), "inputs.json")
 
+# Model configs are cached in two tiers: a small LRU cache in each process
+# and the shared Django cache (Redis in production). The configs for large
+# models are several megabytes, so the local tier is kept small.
+INPUTS_CACHE_SIZE = int(os.environ.get("INPUTS_CACHE_SIZE", 8))
+INPUTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+local_inputs_cache = LRUCache(INPUTS_CACHE_SIZE)
+
+
+def inputs_cache_generation(project):
+    """
+    Token that is part of the key of all cached model configs for the
+    project. Changing it invalidates the entries in both tiers, including
+    the local tiers of other processes.
+    """
+    key = f"inputs-generation:{project.pk}"
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def inputs_cache_key(project, meta_parameters_values):
+    return ":".join(
+        [
+            "inputs",
+            str(project.pk),
+            inputs_cache_generation(project),
+            str(project.latest_tag),
+            canonical_hash(meta_parameters_values),
+        ]
+    )
+
+
+def invalidate_inputs_cache(project):
+    """
+    Invalidate the cached model configs for a project. This should be
+    called when a new tag is promoted or a model config is updated.
+    """
+    cache.set(f"inputs-generation:{project.pk}", uuid.uuid4().hex, None)
+
+
+# Number of compiled Parameters instances kept in each process.
+PARAMETERS_CACHE_SIZE = int(os.environ.get("PARAMETERS_CACHE_SIZE", 32))
+
+compiled_parameters = LRUCache(PARAMETERS_CACHE_SIZE)
+
 
 def pt_factory(classname, defaults):
     return type(classname, (pt.Parameters,), {"defaults": defaults})
 
 
+def compile_parameters(classname, defaults, key=None):
+    """
+    Get a new Parameters instance for the defaults. ParamTools compiles the
+    defaults schema when a Parameters object is created, so a compiled
+    instance is memoized for each class name and key. Callers get a deep
+    copy of it to keep state from adjust() out of the memoized instance.
+    The key defaults to a hash of the defaults.
+    """
+    if key is None:
+        key = canonical_hash(defaults)
+    cache_key = (classname, key)
+    params = compiled_parameters.get(cache_key)
+    if params is None:
+        params = pt_factory(classname, defaults)()
+        compiled_parameters.set(cache_key, params)
+    return copy.deepcopy(params)
+
+
 class ModelParameters:
     """
     Handles logic for getting cached model parameters and updating the cache.
@@ -51,7 +122,21 @@ class ModelParameters:
 
     def meta_parameters_parser(self) -> pt.Parameters:
         res = self.get_inputs()
-        params = pt_factory("MetaParametersParser", res["meta_parameters"])()
+        if self.config is not None and self.config.pk is not None:
+            # The meta parameters of a config may be updated after it is
+            # created, so they are part of the key.
+            key = ":".join(
+                [
+                    str(self.config.pk),
+                    self.config.meta_parameters_hash,
+                    canonical_hash(res["meta_parameters"]),
+                ]
+            )
+        else:
+            key = None
+        params = compile_parameters(
+            "MetaParametersParser", res["meta_parameters"], key=key
+        )
         # params._defer_validation = True
         return params
 
@@ -71,7 +156,7 @@ class ModelParameters:
         if not meta_parameters_values:
             return {}
 
-        mp = pt_factory("MP", meta_parameters)()
+        mp = compile_parameters("MP", meta_parameters)
         mp.adjust(meta_parameters_values)
         return mp.specification(meta_data=False, serializable=True)
 
@@ -81,6 +166,20 @@ class ModelParameters:
         """
         meta_parameters_values = meta_parameters_values or {}
         self.config = None
+
+        cache_key = inputs_cache_key(self.project, meta_parameters_values)
+        config = local_inputs_cache.get(cache_key)
+        if config is None:
+            config = cache.get(cache_key)
+            if config is not None:
+                local_inputs_cache.set(cache_key, config)
+        if config is not None:
+            self.config = config
+            return {
+                "meta_parameters": self.config.meta_parameters,
+                "model_parameters": self.config.model_parameters,
+            }
+
         try:
             self.config = ModelConfig.objects.get(
                 project=self.project,
@@ -132,12 +231,16 @@ class ModelParameters:
                 project=self.project,
                 model_version=str(self.project.latest_tag),
                 meta_parameters_values=save_vals,
+                meta_parameters_hash=canonical_hash(meta_parameters_values),
                 meta_parameters=result["meta_parameters"],
                 model_parameters=result["model_parameters"],
                 inputs_version="v1",
                 status="SUCCESS",
             )
 
+        cache.set(cache_key, self.config, INPUTS_CACHE_TIMEOUT)
+        local_inputs_cache.set(cache_key, self.config)
+
         return {
             "meta_parameters": self.config.meta_parameters,
             "model_parameters": self.config.model_parameters,
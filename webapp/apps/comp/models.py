@@ -1,3 +1,4 @@
+import copy
 import datetime
 import uuid
 import json
@@ -8,12 +9,16 @@ from dataclasses import dataclass, field
 from typing import List, Union
 
 from django.core.exceptions import PermissionDenied
-from django.db import models
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connections, models
+from django.db import transaction
 from django.http import Http404
 from django.utils.functional import cached_property
 from django.utils import timezone
 from django.db.models import JSONField as JSONBField
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.query import ModelIterable
+from django.db.models.query_utils import DeferredAttribute
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
 from django.urls import reverse
 from django.utils import timezone
 from django.db import transaction
@@ -23,6 +28,7 @@ from guardian.shortcuts import assign_perm, remove_perm, get_perms
 from webapp.settings import HAS_USAGE_RESTRICTIONS, USE_STRIPE, FREE_PRIVATE_SIMS
 
 from webapp.apps.comp import utils
+from webapp.apps.comp.cache import canonical_hash
 from webapp.apps.comp.exceptions import (
     ForkObjectException,
     PermissionExpiredException,
@@ -37,6 +43,10 @@ utc_tz = pytz.timezone("America/Sao_Paulo")
 
 ANON_BEFORE = timezone.make_aware(datetime.datetime(2020, 1, 16, 23, 59, 59), utc_tz)
 
+# Repeated requests for a new simulation within this period return the
+# simulation that was created by the first request.
+NEW_SIM_DEDUPE_WINDOW = datetime.timedelta(seconds=10)
+
 
 class JSONField(JSONBField):
     def db_type(self, connection):
@@ -49,17 +59,221 @@ class JSONField(JSONBField):
             return super().from_db_value(value, *args)
 
 
+# JSON values that serialize to fewer bytes than this are copied when
+# a simulation is forked instead of being shared as a blob.
+BLOB_MIN_SIZE = int(os.environ.get("BLOB_MIN_SIZE", 4096))
+
+# Key of the object that a blob JSON column stores in place of shared data.
+BLOB_KEY = "__blob__"
+
+
+def is_blob_reference(value):
+    return isinstance(value, dict) and BLOB_KEY in value
+
+
+class SharedJSON(dict):
+    """
+    JSON object loaded from a blob. It is saved as a reference to the
+    blob unless its keys are set or deleted. Changes to nested values are
+    not tracked, so nested values must be replaced instead of modified.
+    """
+
+    def __init__(self, data, digest):
+        super().__init__(data)
+        self.digest = digest
+        self.changed = False
+
+    def __setitem__(self, key, value):
+        self.changed = True
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.changed = True
+        super().__delitem__(key)
+
+    def clear(self):
+        self.changed = True
+        super().clear()
+
+    def pop(self, *args):
+        self.changed = True
+        return super().pop(*args)
+
+    def popitem(self):
+        self.changed = True
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.changed = True
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self.changed = True
+        super().update(*args, **kwargs)
+
+    def reference(self):
+        reference = {BLOB_KEY: self.digest}
+        # Simulation lists read the outputs version in SQL.
+        if "version" in self:
+            reference["version"] = self["version"]
+        return reference
+
+
+def load_blobs(instances, field):
+    """
+    Replace the blob references in field of each instance with the
+    blob's data. The blobs are loaded with one query.
+    """
+    attname = field.attname
+    instances = [
+        obj for obj in instances if is_blob_reference(obj.__dict__.get(attname))
+    ]
+    digests = {obj.__dict__[attname][BLOB_KEY] for obj in instances}
+    data = dict(
+        JSONBlob.objects.filter(digest__in=digests).values_list("digest", "data")
+    )
+    loaded = set()
+    for obj in instances:
+        digest = obj.__dict__[attname][BLOB_KEY]
+        if digest not in data:
+            continue
+        value = data[digest]
+        # Rows that share a blob do not share the loaded object.
+        if digest in loaded:
+            value = copy.deepcopy(value)
+        loaded.add(digest)
+        obj.__dict__[attname] = SharedJSON(value, digest)
+
+
+class BlobAttribute(DeferredAttribute):
+    """
+    Loads the blob that a BlobJSONField refers to the first time the
+    field is used. The blobs of the other rows that were fetched in the
+    same batch are loaded with it.
+    """
+
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if instance is None or not is_blob_reference(value):
+            return value
+        load_blobs(getattr(instance, "_blob_batch", [instance]), self.field)
+        value = instance.__dict__[self.field.attname]
+        if is_blob_reference(value):
+            raise JSONBlob.DoesNotExist(f"JSONBlob {value[BLOB_KEY]} does not exist.")
+        return value
+
+
+class BlobJSONField(JSONBField):
+    """
+    JSON field whose value may be stored in a JSONBlob and shared with
+    other rows. Shared values are loaded when they are used as SharedJSON
+    objects. They are copied into the column if they are changed before
+    they are saved.
+    """
+
+    descriptor_class = BlobAttribute
+
+    def pre_save(self, model_instance, add):
+        # Blobs that have not been loaded are saved as they are.
+        value = model_instance.__dict__.get(self.attname)
+        if is_blob_reference(value):
+            return value
+        return super().pre_save(model_instance, add)
+
+    def get_prep_value(self, value):
+        if isinstance(value, SharedJSON) and not value.changed:
+            value = value.reference()
+        return super().get_prep_value(value)
+
+
+class BlobModelIterable(ModelIterable):
+    """
+    Yields model instances in batches whose blobs are loaded together.
+    """
+
+    def __iter__(self):
+        batch = []
+        for obj in super().__iter__():
+            obj._blob_batch = batch
+            batch.append(obj)
+            if len(batch) == GET_ITERATOR_CHUNK_SIZE:
+                yield from batch
+                batch = []
+        yield from batch
+
+
+class BlobQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._iterable_class = BlobModelIterable
+
+
+class JSONBlobManager(models.Manager):
+    def share(self, value):
+        """
+        Add a reference to the blob for value and return the value as a
+        SharedJSON, so that it is saved as a reference to the blob. Values
+        that are not JSON objects or are small are returned as they are.
+        """
+        if isinstance(value, SharedJSON) and not value.changed:
+            digest = value.digest
+        elif (
+            not isinstance(value, dict)
+            or len(json.dumps(value, separators=(",", ":"))) < BLOB_MIN_SIZE
+        ):
+            return value
+        else:
+            digest = canonical_hash(value)
+
+        if not self.add_reference(digest):
+            try:
+                with transaction.atomic():
+                    self.create(digest=digest, data=value, ref_count=1)
+            except IntegrityError:
+                self.add_reference(digest)
+        return SharedJSON(value, digest)
+
+    def add_reference(self, digest):
+        return self.filter(digest=digest).update(
+            ref_count=models.F("ref_count") + 1, shared_at=timezone.now()
+        )
+
+
+class JSONBlob(models.Model):
+    """
+    Content addressed JSON that is shared by reference by a simulation's
+    forks. ref_count is incremented when a blob is shared and is recounted
+    by the collect_blobs command, which deletes unreferenced blobs. Blobs
+    that were shared recently are skipped since the rows that refer to them
+    may not be committed yet.
+    """
+
+    # Columns that may store references to blobs.
+    SHARED_FIELDS = (
+        ("Inputs", "adjustment"),
+        ("Inputs", "custom_adjustment"),
+        ("Inputs", "errors_warnings"),
+        ("Simulation", "meta_data"),
+        ("Simulation", "outputs"),
+    )
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    data = JSONBField()
+    ref_count = models.IntegerField(default=0)
+    shared_at = models.DateTimeField(default=timezone.now)
+
+    objects = JSONBlobManager()
+
+
 class ModelConfigManager(models.Manager):
     def get(self, project, model_version, meta_parameters_values, **kwargs):
-        if meta_parameters_values:
-            mp_search_kwargs = {
-                f"meta_parameters_values__{name}": val
-                for name, val in meta_parameters_values.items()
-            }
-        else:
-            mp_search_kwargs = {"meta_parameters_values": {}}
-        kwargs.update(mp_search_kwargs)
-        return super().get(model_version=model_version, project=project, **kwargs)
+        return super().get(
+            model_version=model_version,
+            project=project,
+            meta_parameters_hash=canonical_hash(meta_parameters_values or {}),
+            **kwargs,
+        )
 
 
 class ModelConfig(models.Model):
@@ -76,6 +290,10 @@ class ModelConfig(models.Model):
     creation_date = models.DateTimeField(default=timezone.now)
 
     meta_parameters_values = JSONBField(null=True)
+    # Canonical hash of the meta parameter values that the config was
+    # requested with. It is used for exact, indexed lookups and is not
+    # changed when meta_parameters_values is replaced by its cleaned form.
+    meta_parameters_hash = models.CharField(max_length=64, null=True)
     meta_parameters = JSONField(default=dict)
     model_parameters = JSONField(default=dict)
 
@@ -97,11 +315,18 @@ class ModelConfig(models.Model):
     class Meta:
         constraints = [
             models.UniqueConstraint(
-                fields=["project", "model_version", "meta_parameters_values"],
-                name="unique_model_config",
+                fields=["project", "model_version", "meta_parameters_hash"],
+                name="unique_model_config_hash",
             )
         ]
 
+    def save(self, *args, **kwargs):
+        if self.meta_parameters_hash is None:
+            self.meta_parameters_hash = canonical_hash(
+                self.meta_parameters_values or {}
+            )
+        super().save(*args, **kwargs)
+
     def is_stale(self, timeout=180):
         return (
             self.status != "SUCCESS"
@@ -110,7 +335,7 @@ class ModelConfig(models.Model):
 
 
 class Inputs(models.Model):
-    objects: models.Manager
+    objects = BlobQuerySet.as_manager()
 
     parent_sim = models.ForeignKey(
         "Simulation", null=True, related_name="child_inputs", on_delete=models.SET_NULL
@@ -127,12 +352,12 @@ class Inputs(models.Model):
 
     # Validated GUI input that has been parsed to have the correct data types,
     # or JSON reform uploaded as file
-    custom_adjustment = JSONBField(default=dict, blank=True, null=True)
+    custom_adjustment = BlobJSONField(default=dict, blank=True, null=True)
 
-    errors_warnings = JSONBField(default=None, blank=True, null=True)
+    errors_warnings = BlobJSONField(default=None, blank=True, null=True)
 
     # The parameters that will be used to run the model
-    adjustment = JSONBField(default=dict, blank=True, null=True)
+    adjustment = BlobJSONField(default=dict, blank=True, null=True)
 
     # If project changes input type, we still want to know the type of the
     # previous model runs' inputs.
@@ -230,12 +455,64 @@ class Inputs(models.Model):
         return self.sim.role(user)
 
 
-class SimulationManager(models.Manager):
-    def get_object_from_screenshot(self, output_id, http_404_on_fail=False):
-        res = self.filter(
-            outputs__outputs__renderable__outputs__contains=[{"id": output_id}],
-        ).first()
+class SimulationQuerySet(BlobQuerySet):
+    def for_list(self):
+        """
+        Query plan for listing sims with MiniSimulationSerializer. The
+        related objects used to build names and urls are joined or
+        prefetched, and the large JSON columns are not loaded. The
+        outputs version is read from the outputs column in SQL.
+        """
+        return (
+            self.select_related("owner__user", "project__owner__user")
+            .prefetch_related("authors__user")
+            .defer("outputs", "meta_data", "aggr_outputs")
+            .annotate(outputs_version_annotation=KeyTextTransform("version", "outputs"))
+        )
+
+
+class SimulationManager(models.Manager.from_queryset(SimulationQuerySet)):
+    def ancestor_pks(self, sim):
+        """
+        Primary keys of the sim's parent, its parent's parent, and so on up
+        to the original simulation, loaded with one recursive query.
+        """
+        if sim.parent_sim_id is None:
+            return []
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH RECURSIVE lineage (id, depth) AS (
+                    SELECT parent_sim_id, 1 FROM {table} WHERE id = %s
+                    UNION ALL
+                    SELECT sim.parent_sim_id, lineage.depth + 1
+                    FROM {table} sim JOIN lineage ON sim.id = lineage.id
+                )
+                SELECT id FROM lineage WHERE id IS NOT NULL ORDER BY depth
+                """,
+                [sim.pk],
+            )
+            return [pk for (pk,) in cursor.fetchall()]
 
+    def get_object_from_screenshot(self, output_id, user=None, http_404_on_fail=False):
+        """
+        Get a simulation that has the output. Cached simulations share
+        the outputs of the simulation that they were created from, so an
+        output may belong to several simulations. If user is given, a
+        simulation that the user can read is returned if there is one.
+        """
+        # Outputs are indexed by sim_finished. Sims saved before the index
+        # existed are added by the index_screenshots command.
+        sims = (
+            self.filter(screenshots__output_id=output_id)
+            .defer("outputs", "meta_data", "aggr_outputs")
+            .order_by("-is_public", "pk")
+        )
+        res = sims.first()
+        if res is not None and user is not None:
+            readable = (sim for sim in sims if sim.has_read_access(user))
+            res = next(readable, res)
         if res is None and http_404_on_fail:
             raise Http404(f"Unable to find Simulation with id {output_id}.")
         elif res is None:
@@ -245,73 +522,191 @@ class SimulationManager(models.Manager):
         else:
             return res
 
-    def next_model_pk(self, project):
+    def max_model_pk(self, project):
         curr_max = Simulation.objects.filter(project=project).aggregate(
             models.Max("model_pk")
         )["model_pk__max"]
         if curr_max == -1 or curr_max is None:
-            return 1
+            return 0
         else:
-            return curr_max + 1
+            return curr_max
 
-    def new_sim(self, user, project, inputs_status=None):
+    def lock_model_pk_counter(self, project):
+        """
+        Get the project's ModelPkCounter row and lock it with SELECT ... FOR
+        UPDATE until the surrounding transaction is committed.
         """
-        Create a new simulation for the user and project. If multiple
-        requests are made to the /new/ endpoint at once there may be
-        a race condition where multiple simulations are created with
-        the same model specific primary key (model_pk) causing an
-        IntegrityError. The strategy for handling this is to check
-        the Simulation with the model_pk that caused the IntegrityError:
+        try:
+            return ModelPkCounter.objects.select_for_update().get(project=project)
+        except ModelPkCounter.DoesNotExist:
+            # Counters are created lazily for projects that did not
+            # have any simulations when the counters were added.
+            ModelPkCounter.objects.get_or_create(
+                project=project,
+                defaults={
+                    "last_model_pk": self.max_model_pk(project),
+                    **self.sim_counts(project),
+                },
+            )
+            return ModelPkCounter.objects.select_for_update().get(project=project)
+
+    def reserve_model_pks(self, project, n=1):
+        """
+        Reserve a contiguous block of n model_pks for the project. The
+        project's ModelPkCounter row is locked until the surrounding
+        transaction is committed. Concurrent requests wait on the lock
+        instead of racing for the same model_pk, so this takes constant
+        time and never needs to be retried.
+        """
+        with transaction.atomic():
+            counter = self.lock_model_pk_counter(project)
+            start = counter.last_model_pk + 1
+            counter.last_model_pk += n
+            counter.save(update_fields=["last_model_pk"])
+        return range(start, start + n)
+
+    def next_model_pk(self, project):
+        """
+        The model_pk that the project's next simulation will get. This does
+        not reserve it. Use reserve_model_pks to allocate model_pks.
+        """
+        last_model_pk = (
+            ModelPkCounter.objects.filter(project=project)
+            .values_list("last_model_pk", flat=True)
+            .first()
+        )
+        return max(last_model_pk or 0, self.max_model_pk(project)) + 1
 
-        - Case 1: `user` is the owner of the other simulation. We assume
-        that this was caused by a double click or similar and return
-        the existing simulation with the same model_pk.
+    def sim_counts(self, project):
+        """
+        Count the project's sims and the users who created them. These
+        are full scans of the project's sims. Use Project.sim_count and
+        Project.user_count to read the denormalized counts instead.
+        """
+        return self.filter(project=project).aggregate(
+            sim_count=models.Count("pk"),
+            user_count=models.Count("owner__user", distinct=True),
+        )
 
-        - Case 2: Multiple new simulations were created at once. In this
-        case we try to create a new simulation again.
+    def count_new_sims(self, project, owner, n=1):
+        """
+        Add n new sims created by owner to the project's denormalized
+        counts. This must be called after reserve_model_pks and before the
+        sims are created in the same transaction. The counter row is locked
+        by then, so concurrent requests cannot both count the same new user.
+        """
+        is_new_user = not self.filter(project=project, owner=owner).exists()
+        ModelPkCounter.objects.filter(project=project).update(
+            sim_count=models.F("sim_count") + n,
+            user_count=models.F("user_count") + int(is_new_user),
+        )
 
-        Methods submitting a batch of simulations at once, should set
-        inputs_status="PENDING". This creates inputs objects that are
-        PENDING by default and thus force new Simulation objects to be
-        created on each request even if they arrive at the same time.
+    @transaction.atomic
+    def new_sim(self, user, project, inputs_status=None):
+        """
+        Create a new simulation for the user and project. The model
+        specific primary key (model_pk) is reserved from the project's
+        counter so that simulations created at the same time never
+        get the same model_pk.
+
+        If the user's last request created the project's most recent
+        simulation within NEW_SIM_DEDUPE_WINDOW and it has not been used
+        yet, we assume that this request was caused by a double click or
+        similar and return that simulation. The counter is locked first so
+        that concurrent requests see each other's simulations.
+
+        Methods submitting a batch of simulations at once should set
+        inputs_status="PENDING" or use new_sims to always create new
+        simulations.
         """
         if not project.has_read_access(user):
             raise PermissionDenied()
-        model_pk = None
-        try:
-            # transaction.atomic will roll back any changes
-            # if there is an integrity error.
-            with transaction.atomic():
-                inputs = Inputs.objects.create(
-                    owner=user.profile,
-                    project=project,
-                    status=inputs_status or "STARTED",
-                    adjustment={},
-                    meta_parameters={},
-                    errors_warnings={},
-                )
-                model_pk = self.next_model_pk(project)
-                sim = self.create(
-                    owner=user.profile,
-                    project=project,
-                    tag=project.latest_tag,
-                    model_pk=model_pk,
-                    inputs=inputs,
-                    status="STARTED",
-                    is_public=True,
-                    title="Untitled Simulation",
-                )
-                sim.authors.set([user.profile])
-                sim.grant_admin_permissions(user)
+        counter = self.lock_model_pk_counter(project)
+        if inputs_status in (None, "STARTED"):
+            sim = self.filter(
+                project=project,
+                model_pk=counter.last_model_pk,
+                owner=user.profile,
+                status="STARTED",
+                inputs__status="STARTED",
+                creation_date__gte=timezone.now() - NEW_SIM_DEDUPE_WINDOW,
+            ).first()
+            if sim is not None:
                 return sim
-        except IntegrityError:
-            # Case 1:
-            if model_pk is not None:
-                sim = Simulation.objects.get(project=project, model_pk=model_pk)
-                if sim.owner.user == user and sim.inputs.status == "STARTED":
-                    return sim
-            # Case 2:
-            return self.new_sim(user, project, inputs_status)
+        inputs = Inputs.objects.create(
+            owner=user.profile,
+            project=project,
+            status=inputs_status or "STARTED",
+            adjustment={},
+            meta_parameters={},
+            errors_warnings={},
+        )
+        model_pk = self.reserve_model_pks(project)[0]
+        self.count_new_sims(project, user.profile)
+        sim = self.create(
+            owner=user.profile,
+            project=project,
+            tag=project.latest_tag,
+            model_pk=model_pk,
+            inputs=inputs,
+            status="STARTED",
+            is_public=True,
+            title="Untitled Simulation",
+        )
+        sim.authors.set([user.profile])
+        sim.grant_admin_permissions(user)
+        return sim
+
+    @transaction.atomic
+    def new_sims(self, user, project, inputs_kwargs, sims_kwargs=None):
+        """
+        Create a batch of new simulations for the user and project with
+        a constant number of queries. inputs_kwargs and sims_kwargs are
+        lists with the fields for each Inputs and Simulation object. The
+        simulations are given a contiguous block of model_pks.
+        """
+        if not project.has_read_access(user):
+            raise PermissionDenied()
+        if not inputs_kwargs:
+            return []
+        if sims_kwargs is None:
+            sims_kwargs = [{} for _ in inputs_kwargs]
+        inputs = Inputs.objects.bulk_create(
+            [
+                Inputs(owner=user.profile, project=project, **kwargs)
+                for kwargs in inputs_kwargs
+            ]
+        )
+        model_pks = self.reserve_model_pks(project, len(inputs))
+        self.count_new_sims(project, user.profile, len(inputs))
+        sims = []
+        for model_pk, inp, kwargs in zip(model_pks, inputs, sims_kwargs):
+            fields = dict(
+                owner=user.profile,
+                project=project,
+                tag=project.latest_tag,
+                model_pk=model_pk,
+                inputs=inp,
+                status="STARTED",
+                is_public=True,
+                title="Untitled Simulation",
+            )
+            fields.update(kwargs)
+            sims.append(Simulation(**fields))
+        sims = self.bulk_create(sims)
+        Simulation.authors.through.objects.bulk_create(
+            [
+                Simulation.authors.through(
+                    simulation_id=sim.pk, profile_id=user.profile.pk
+                )
+                for sim in sims
+            ]
+        )
+        sims[0].add_collaborator_test(collaborator=user)
+        assign_perm(
+            Simulation.ADMIN[0], user, self.filter(pk__in=[sim.pk for sim in sims]),
+        )
+        return sims
 
     @transaction.atomic
     def fork(self, sim, user):
@@ -332,14 +727,16 @@ class SimulationManager(models.Manager):
             owner=user.profile,
             project=sim.project,
             status=sim.inputs.status,
-            adjustment=sim.inputs.adjustment,
+            adjustment=JSONBlob.objects.share(sim.inputs.adjustment),
             meta_parameters=sim.inputs.meta_parameters,
-            errors_warnings=sim.inputs.errors_warnings,
-            custom_adjustment=sim.inputs.custom_adjustment,
+            errors_warnings=JSONBlob.objects.share(sim.inputs.errors_warnings),
+            custom_adjustment=JSONBlob.objects.share(sim.inputs.custom_adjustment),
             parent_sim=sim,
             traceback=sim.inputs.traceback,
             client=sim.inputs.client,
         )
+        model_pk = self.reserve_model_pks(sim.project)[0]
+        self.count_new_sims(sim.project, user.profile)
         forked: Simulation = self.create(
             owner=user.profile,
             title=sim.title,
@@ -347,8 +744,8 @@ class SimulationManager(models.Manager):
             last_modified=sim.last_modified,
             parent_sim=sim,
             inputs=inputs,
-            meta_data=sim.meta_data,
-            outputs=sim.outputs,
+            meta_data=JSONBlob.objects.share(sim.meta_data),
+            outputs=JSONBlob.objects.share(sim.outputs),
             traceback=sim.traceback,
             sponsor=sim.sponsor,
             project=sim.project,
@@ -357,7 +754,7 @@ class SimulationManager(models.Manager):
             run_cost=0,
             exp_comp_datetime=sim.exp_comp_datetime,
             model_version=sim.model_version,
-            model_pk=self.next_model_pk(sim.project),
+            model_pk=model_pk,
             is_public=sim.is_public,
             status=sim.status,
         )
@@ -372,6 +769,50 @@ class SimulationManager(models.Manager):
     def public_sims(self):
         return self.filter(creation_date__gt=ANON_BEFORE, is_public=True)
 
+    def result_key(self, project, tag, meta_parameters, adjustment):
+        return canonical_hash(
+            {
+                "project": project.pk,
+                "tag": str(tag),
+                "meta_parameters": meta_parameters,
+                "adjustment": adjustment,
+            }
+        )
+
+    def cached_result(self, project, result_key):
+        """
+        The most recent sim that ran successfully with the result key, or
+        None if there is not one or the project does not cache results.
+        """
+        if not project.cache_results:
+            return None
+        return (
+            self.filter(
+                project=project,
+                result_key=result_key,
+                status="SUCCESS",
+                is_cached=False,
+            )
+            .order_by("-pk")
+            .first()
+        )
+
+
+class ModelPkCounter(models.Model):
+    """
+    The last model_pk that was reserved for a project's simulations, and
+    the denormalized number of sims and distinct users for the project.
+    The counts are updated when sims are created. The reconcile_sim_counts
+    command repairs them if they drift, e.g. after sims are deleted.
+    """
+
+    project = models.OneToOneField(
+        "users.Project", on_delete=models.CASCADE, related_name="model_pk_counter"
+    )
+    last_model_pk = models.IntegerField(default=0)
+    sim_count = models.IntegerField(default=0)
+    user_count = models.IntegerField(default=0)
+
 
 class SimulationPermissions:
     READ = (
@@ -402,8 +843,8 @@ class Simulation(models.Model):
         "self", null=True, related_name="child_sims", on_delete=models.SET_NULL
     )
     inputs = models.OneToOneField(Inputs, on_delete=models.CASCADE, related_name="sim")
-    meta_data = JSONBField(default=None, blank=True, null=True)
-    outputs = JSONBField(default=None, blank=True, null=True)
+    meta_data = BlobJSONField(default=None, blank=True, null=True)
+    outputs = BlobJSONField(default=None, blank=True, null=True)
     aggr_outputs = JSONBField(default=None, blank=True, null=True)
     traceback = models.CharField(null=True, blank=True, default=None, max_length=8000)
     owner = models.ForeignKey(
@@ -434,6 +875,19 @@ class Simulation(models.Model):
     webapp_vers = models.CharField(blank=True, default=None, null=True, max_length=50)
     model_pk = models.IntegerField()
 
+    # Hash of the project, tag, and inputs the sim was submitted with.
+    result_key = models.CharField(max_length=64, null=True, blank=True)
+    # Cached sims reuse the outputs of a finished sim with the same result
+    # key instead of running, and they are not billed.
+    is_cached = models.BooleanField(default=False)
+    cached_from = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        related_name="cache_hits",
+        on_delete=models.SET_NULL,
+    )
+
     is_public = models.BooleanField(default=True)
 
     status = models.CharField(
@@ -455,6 +909,16 @@ class Simulation(models.Model):
                 fields=["project", "model_pk"], name="unique_model_pk"
             )
         ]
+        indexes = [
+            # Used by the public and profile feeds' keyset pagination.
+            models.Index(
+                fields=["is_public", "creation_date"], name="sim_public_created_idx"
+            ),
+            # Used to look up cached results.
+            models.Index(
+                fields=["project", "result_key"], name="sim_project_result_key_idx"
+            ),
+        ]
         permissions = (
             SimulationPermissions.READ,
             SimulationPermissions.WRITE,
@@ -547,19 +1011,31 @@ class Simulation(models.Model):
     def effective_cost(self):
         return self.project.run_cost(self.run_time, adjust=True)
 
-    def parent_sims(self, user=None):
+    def parent_sims(self, user=None, permissions=None):
         """
-        Recursively walk back up to the original simulation. All public simulations
+        Walk back up to the original simulation. All public simulations
         are included, and private simulations are only included if the user is
-        provided and has read access.
+        provided and has read access. The ancestors and the user's permissions
+        on them are loaded in a constant number of queries. A PermissionResolver
+        for the user may be passed to share its cached permissions.
         """
-        parent_sims = []
-        sim = self
-        while sim.parent_sim != None:
-            if sim.parent_sim.is_public or sim.parent_sim.has_read_access(user):
-                parent_sims.append(sim.parent_sim)
-            sim = sim.parent_sim
-        return parent_sims
+        from webapp.apps.comp.permissions import PermissionResolver
+
+        pks = Simulation.objects.ancestor_pks(self)
+        if not pks:
+            return []
+        sims = Simulation.objects.for_list().in_bulk(pks)
+        # Skip any ancestors that were deleted since the lineage was loaded.
+        ancestors = [sims[pk] for pk in pks if pk in sims]
+
+        if permissions is None:
+            permissions = PermissionResolver(user)
+        permissions.prefetch([sim for sim in ancestors if not sim.is_public])
+        return [
+            sim
+            for sim in ancestors
+            if sim.is_public or permissions.has_read_access(sim)
+        ]
 
     def is_owner(self, user):
         return user == self.owner.user
@@ -697,6 +1173,9 @@ class Simulation(models.Model):
             return "admin"
 
     def outputs_version(self):
+        # Set by SimulationQuerySet.for_list, which does not load outputs.
+        if hasattr(self, "outputs_version_annotation"):
+            return self.outputs_version_annotation
         if self.outputs:
             return self.outputs["version"]
         else:
@@ -740,6 +1219,46 @@ class Simulation(models.Model):
         return {"owner": self.get_owner(), "title": self.title, "url": url, "pic": pic}
 
 
+class SimulationScreenshotManager(models.Manager):
+    def index(self, sim):
+        """
+        Add the ids of the sim's renderable outputs to the screenshot index.
+        """
+        if not sim.outputs or sim.outputs.get("version") != "v1":
+            return []
+        return self.bulk_create(
+            [
+                SimulationScreenshot(output_id=output["id"], simulation=sim)
+                for output in sim.outputs["outputs"]["renderable"]["outputs"]
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class SimulationScreenshot(models.Model):
+    """
+    Index from the id of a renderable output to the simulations that have
+    it. Screenshots are stored under the output id, so this is used to
+    check permissions before serving them. Cached simulations share the
+    output ids of the simulation that they were created from.
+    """
+
+    output_id = models.CharField(max_length=64, db_index=True)
+    simulation = models.ForeignKey(
+        Simulation, on_delete=models.CASCADE, related_name="screenshots"
+    )
+    creation_date = models.DateTimeField(default=timezone.now)
+
+    objects = SimulationScreenshotManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["output_id", "simulation"], name="unique_screenshot_simulation"
+            )
+        ]
+
+
 def two_days_from_now():
     return timezone.now() + datetime.timedelta(days=2)
 
@@ -0,0 +1,64 @@
+from guardian.core import ObjectPermissionChecker
+
+from webapp.apps.users.models import project_ids_with_perms
+from webapp.apps.comp.models import Simulation
+
+
+class PermissionResolver:
+    """
+    Answers the same access and role checks as Simulation and Project for
+    a single user. The user's guardian permissions for a page of sims are
+    loaded by prefetch, so checks on those sims do not hit the database.
+    Resolvers cache permissions and should only be used for the duration
+    of a request.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        if user is not None and user.is_authenticated:
+            self.checker = ObjectPermissionChecker(user)
+        else:
+            self.checker = None
+
+    def prefetch(self, sims):
+        sims = list(sims)
+        if self.checker is None or not sims:
+            return
+        self.checker.prefetch_perms(sims)
+
+    def get_perms(self, obj):
+        if self.checker is None:
+            return []
+        return self.checker.get_perms(obj)
+
+    def has_project_read_access(self, project):
+        return project.is_public or project.pk in project_ids_with_perms(self.user)
+
+    def has_admin_access(self, sim):
+        return Simulation.ADMIN[0] in self.get_perms(sim)
+
+    def has_write_access(self, sim):
+        perms = self.get_perms(sim)
+        return Simulation.WRITE[0] in perms or Simulation.ADMIN[0] in perms
+
+    def has_read_access(self, sim):
+        has_project_access = self.has_project_read_access(sim.project)
+        if sim.is_public and has_project_access:
+            return True
+
+        perms = self.get_perms(sim)
+        return has_project_access and any(
+            perm in perms
+            for perm in (Simulation.READ[0], Simulation.WRITE[0], Simulation.ADMIN[0])
+        )
+
+    def role(self, sim):
+        perms = self.get_perms(sim)
+        if not perms:
+            return None
+        elif perms == [Simulation.READ[0]]:
+            return "read"
+        elif perms == [Simulation.WRITE[0]]:
+            return "write"
+        elif perms == [Simulation.ADMIN[0]]:
+            return "admin"
@@ -0,0 +1,166 @@
+import json
+from collections import Counter
+from concurrent import futures
+
+from django.db import connection, transaction
+
+from webapp.apps.comp import actions
+from webapp.apps.comp.cache import canonical_hash
+from webapp.apps.comp.compute import Compute, WorkersUnreachableError
+from webapp.apps.comp.model_parameters import compile_parameters
+from webapp.apps.comp.models import Inputs, ModelConfig
+
+# Number of recent inputs that are checked for commonly used meta parameters.
+RECENT_INPUTS = 500
+# Max number of defaults jobs that are submitted when a tag is promoted.
+MAX_PREWARM_CONFIGS = 50
+
+# Prewarm jobs are submitted from this thread so that requests do not wait
+# on the cluster.
+executor = futures.ThreadPoolExecutor(max_workers=1)
+
+
+def recent_meta_parameters(project, limit=RECENT_INPUTS):
+    """
+    Meta parameter values from the project's most recent inputs, from most
+    to least commonly used.
+    """
+    recent = (
+        Inputs.objects.filter(project=project, meta_parameters__isnull=False)
+        .order_by("-pk")
+        .values_list("meta_parameters", flat=True)[:limit]
+    )
+    counts = Counter(
+        json.dumps(meta_parameters, sort_keys=True) for meta_parameters in recent
+    )
+    return [json.loads(meta_parameters) for meta_parameters, _ in counts.most_common()]
+
+
+def year_range_meta_parameters(meta_parameters):
+    """
+    Meta parameter values for the defaults and for each year in the range
+    of the "year" meta parameter, if there is one. Values are in the same
+    format that ModelParameters.defaults uses to look up model configs.
+    """
+    parser = compile_parameters("MetaParametersParser", meta_parameters)
+    values = [parser.specification(meta_data=False, serializable=True)]
+
+    year_range = meta_parameters.get("year", {}).get("validators", {}).get("range", {})
+    start, end = year_range.get("min"), year_range.get("max")
+    if not isinstance(start, int) or not isinstance(end, int):
+        return values
+
+    for year in range(start, end + 1):
+        year_parser = compile_parameters("MetaParametersParser", meta_parameters)
+        year_parser.adjust({"year": year})
+        values.append(year_parser.specification(meta_data=False, serializable=True))
+    return values
+
+
+def prewarm_model_configs(project, meta_parameters_values, compute=None):
+    """
+    Submit defaults jobs for each of the meta parameter values that do not
+    have a model config for the project's latest tag yet. The jobs are
+    submitted with a single request and the model configs are created as
+    PENDING so that ModelConfigAPIView.put saves their results.
+    """
+    if (
+        project.latest_tag is None
+        or project.tech != "python-paramtools"
+        or project.cluster.version != "v1"
+    ):
+        return []
+
+    model_version = str(project.latest_tag)
+    missing = {}
+    for values in meta_parameters_values:
+        missing.setdefault(canonical_hash(values), values)
+    existing = ModelConfig.objects.filter(
+        project=project,
+        model_version=model_version,
+        meta_parameters_hash__in=list(missing),
+    ).values_list("meta_parameters_hash", flat=True)
+    for meta_parameters_hash in existing:
+        missing.pop(meta_parameters_hash)
+    missing = list(missing.items())[:MAX_PREWARM_CONFIGS]
+    if not missing:
+        return []
+
+    compute = compute or Compute()
+    try:
+        job_ids = compute.submit_jobs(
+            project,
+            actions.INPUTS,
+            [{"meta_param_dict": values} for _, values in missing],
+            path_prefix="/api/v1/jobs",
+        )
+    except WorkersUnreachableError:
+        print("Unable to prewarm model configs for", project)
+        return []
+
+    print(f"prewarming {len(missing)} model configs for {project}")
+    return ModelConfig.objects.bulk_create(
+        [
+            ModelConfig(
+                project=project,
+                model_version=model_version,
+                meta_parameters_values=values,
+                meta_parameters_hash=meta_parameters_hash,
+                inputs_version="v1",
+                job_id=job_id,
+                status="PENDING",
+            )
+            for (meta_parameters_hash, values), job_id in zip(missing, job_ids)
+        ],
+        # A request may have created one of these model configs already.
+        ignore_conflicts=True,
+    )
+
+
+def prewarm_on_promote(project, compute=None):
+    """
+    Warm up the model configs for a newly promoted tag with the meta
+    parameters used by recent simulations. The config without any meta
+    parameters is needed to enumerate the year range. Those configs are
+    warmed up by prewarm_on_defaults once it is ready.
+    """
+    return prewarm_model_configs(
+        project, [{}] + recent_meta_parameters(project), compute=compute
+    )
+
+
+def prewarm_on_defaults(model_config, compute=None):
+    """
+    Warm up the model configs for the defaults and the year range once
+    the meta parameters for the project's latest tag are available.
+    """
+    project = model_config.project
+    if (
+        model_config.status != "SUCCESS"
+        or model_config.meta_parameters_values
+        or model_config.model_version != str(project.latest_tag)
+    ):
+        return []
+    return prewarm_model_configs(
+        project,
+        year_range_meta_parameters(model_config.meta_parameters),
+        compute=compute,
+    )
+
+
+def run_prewarm(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        print("Exception when prewarming model configs", e)
+    finally:
+        # The thread's connection is not closed by the request cycle.
+        connection.close()
+
+
+def prewarm_later(func, *args):
+    """
+    Run one of the prewarm functions in the background once the current
+    transaction is committed.
+    """
+    transaction.on_commit(lambda: executor.submit(run_prewarm, func, *args))
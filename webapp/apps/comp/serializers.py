@@ -66,7 +66,12 @@ class MiniSimulationSerializer(serializers.ModelSerializer):
             user = self.context["request"].user
         else:
             user = None
-        rep["role"] = obj.role(user)
+        # List views pass a PermissionResolver with prefetched permissions.
+        permissions = self.context.get("permissions")
+        if permissions is not None:
+            rep["role"] = permissions.role(obj)
+        else:
+            rep["role"] = obj.role(user)
         rep["authors"] = sorted(rep["authors"])
         return rep
 
@@ -82,6 +87,7 @@ class MiniSimulationSerializer(serializers.ModelSerializer):
             "authors",
             "creation_date",
             "gui_url",
+            "is_cached",
             "is_public",
             "model_pk",
             "model_version",
@@ -289,12 +295,20 @@ class SimulationSerializer(serializers.ModelSerializer):
             user = self.context["request"].user
         else:
             user = None
+        # The detail view passes a PermissionResolver so that the user's
+        # permissions on the sim and its parents are only loaded once.
+        permissions = self.context.get("permissions")
         rep["parent_sims"] = MiniSimulationSerializer(
-            obj.parent_sims(user=user), many=True
+            obj.parent_sims(user=user, permissions=permissions), many=True
         ).data
-        rep["role"] = obj.role(user)
+        if permissions is not None:
+            rep["role"] = permissions.role(obj)
+            has_admin_access = permissions.has_admin_access(obj)
+        else:
+            rep["role"] = obj.role(user)
+            has_admin_access = obj.has_admin_access(user)
         rep["authors"] = sorted(rep["authors"])
-        if obj.has_admin_access(user):
+        if has_admin_access:
             rep["pending_permissions"] = PendingPermissionSerializer(
                 instance=obj.pending_permissions.all(), many=True
             ).data
@@ -345,6 +359,7 @@ class SimulationSerializer(serializers.ModelSerializer):
             "eta",
             "exp_comp_datetime",
             "gui_url",
+            "is_cached",
             "model_pk",
             "model_version",
             "original_eta",
@@ -0,0 +1,103 @@
+import os
+from zipfile import ZipFile
+
+import fsspec as fs
+from django.core.cache import cache
+from fsspec.core import url_to_fs
+
+from webapp.apps.comp.cache import LRUCache
+
+BUCKET = os.environ.get("BUCKET")
+
+# Root URL of the object storage with the simulation outputs. A local
+# directory, e.g. file:///tmp/cs-storage, may be used in development and
+# in tests.
+STORAGE_URL = os.environ.get("STORAGE_URL") or f"gcs://{BUCKET}"
+
+# Number of screenshots that are kept in memory. Screenshots are stored
+# under the id of their output and never change, so they do not need to
+# be invalidated.
+SCREENSHOT_CACHE_SIZE = int(os.environ.get("SCREENSHOT_CACHE_SIZE", 128))
+screenshots = LRUCache(SCREENSHOT_CACHE_SIZE)
+
+# Outputs up to this many bytes are kept in the shared cache. Larger
+# outputs are streamed from the object storage on every request.
+OUTPUT_CACHE_MAX_SIZE = int(os.environ.get("OUTPUT_CACHE_MAX_SIZE", 1024 * 1024))
+OUTPUT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def storage_path(location):
+    return f"{STORAGE_URL.rstrip('/')}/{location.lstrip('/')}"
+
+
+def open_file(location, mode="rb"):
+    return fs.open(storage_path(location), mode)
+
+
+def file_info(location):
+    """
+    Size and ETag of a stored file. The ETag is the one from the object
+    storage if it provides one.
+    """
+    filesystem, path = url_to_fs(storage_path(location))
+    info = filesystem.info(path)
+    etag = info.get("etag") or info.get("md5Hash") or info.get("ETag")
+    if etag is None:
+        etag = f"{info['size']}-{info.get('mtime', info.get('updated', ''))}"
+    return info["size"], f'"{etag.strip(chr(34))}"'
+
+
+def iter_file(location, start=0, end=None, chunk_size=64 * 1024):
+    """
+    Iterate over the bytes from start to end (inclusive) of a stored file.
+    """
+    with open_file(location) as f:
+        f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def read_screenshot(output_id):
+    """
+    PNG bytes of the screenshot for the output with id output_id.
+    """
+    pic = screenshots.get(output_id)
+    if pic is None:
+        with open_file(f"{output_id}.png") as f:
+            pic = f.read()
+        screenshots.set(output_id, pic)
+    return pic
+
+
+def iter_output(output_id, ziplocation, filename, chunk_size=64 * 1024):
+    """
+    Iterate over the bytes of a single output in an outputs zip file.
+    ZipFile only reads the zip file's directory and the output itself, so
+    the other outputs in the zip file are not downloaded.
+    """
+    key = f"outputs:{output_id}"
+    data = cache.get(key)
+    if data is not None:
+        yield data
+        return
+
+    with open_file(ziplocation) as f, ZipFile(f) as z:
+        info = z.getinfo(filename)
+        with z.open(info) as member:
+            if info.file_size <= OUTPUT_CACHE_MAX_SIZE:
+                data = member.read()
+                cache.set(key, data, OUTPUT_CACHE_TIMEOUT)
+                yield data
+                return
+            while True:
+                chunk = member.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
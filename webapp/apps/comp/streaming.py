@@ -0,0 +1,191 @@
+import base64
+import codecs
+import json
+import re
+from zipfile import ZipFile, ZipInfo
+
+import cs_storage
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Zip entries are written with a fixed timestamp so that the same files
+# always produce the same bytes. This keeps ETags and byte ranges valid
+# across requests.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _ChunkWriter:
+    """
+    Unseekable file object that collects the bytes written by ZipFile.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def zip_stream(files):
+    """
+    Build a zip file from an iterable of (filename, text) pairs and yield
+    its bytes as each entry is written.
+    """
+    writer = _ChunkWriter()
+    with ZipFile(writer, mode="w") as z:
+        for filename, text in files:
+            info = ZipInfo(filename, date_time=ZIP_DATE_TIME)
+            info.external_attr = 0o600 << 16
+            z.writestr(info, text)
+            yield writer.pop()
+    yield writer.pop()
+
+
+def slice_stream(chunks, start=0, end=None):
+    """
+    Yield the bytes from start to end (inclusive) of a stream of chunks.
+    """
+    pos = 0
+    for chunk in chunks:
+        chunk_start, pos = pos, pos + len(chunk)
+        if pos <= start:
+            continue
+        if end is not None and chunk_start > end:
+            break
+        lo = max(start - chunk_start, 0)
+        hi = len(chunk) if end is None else min(end - chunk_start + 1, len(chunk))
+        yield chunk[lo:hi]
+
+
+def parse_range(header, size):
+    """
+    Parse a Range header with a single byte range. Returns (start, end) with
+    end inclusive or None if the header should be ignored. Raises ValueError
+    if the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        suffix = int(end)
+        if suffix == 0:
+            raise ValueError("Range not satisfiable.")
+        return max(size - suffix, 0), size - 1
+    start = int(start)
+    end = size - 1 if not end else min(int(end), size - 1)
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable.")
+    return start, end
+
+
+def streaming_download(
+    request, stream, etag, filename, size=None, content_type="application/zip"
+):
+    """
+    Streaming response for a download that supports ETags and single byte
+    ranges. stream(start, end) returns an iterator over the bytes from start
+    to end (inclusive, None for the end of the file). size is the length of
+    the download or a function that computes it. If it is a function, it is
+    only called for range requests.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+
+    byte_range = None
+    range_header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if range_header and (if_range is None or if_range == etag):
+        if callable(size):
+            size = size()
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        response = StreamingHttpResponse(stream(0, None), content_type=content_type)
+        if size is not None and not callable(size):
+            response["Content-Length"] = str(size)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            stream(start, end), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+def _json_string_stream(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    yield b'"'
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield json.dumps(text)[1:-1].encode()
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield json.dumps(text)[1:-1].encode()
+    yield b'"'
+
+
+def _base64_stream(chunks):
+    yield b'"'
+    remainder = b""
+    for chunk in chunks:
+        chunk = remainder + chunk
+        # Encode multiples of 3 bytes so that there is no padding until
+        # the end of the data.
+        cutoff = len(chunk) - len(chunk) % 3
+        remainder = chunk[cutoff:]
+        if cutoff:
+            yield base64.b64encode(chunk[:cutoff])
+    if remainder:
+        yield base64.b64encode(remainder)
+    yield b'"'
+
+
+def output_stream(output, chunks):
+    """
+    Encode a remote output and the serialized bytes of its data as the
+    same JSON object that cs_storage.read creates for the output. The
+    data is encoded as it is read, so large outputs are never held in
+    memory.
+    """
+    meta = json.dumps(
+        {
+            "id": output.get("id"),
+            "title": output["title"],
+            "media_type": output["media_type"],
+        }
+    )
+    yield meta[:-1].encode() + b', "data": '
+    serializer = cs_storage.get_serializer(output["media_type"])
+    if isinstance(serializer, cs_storage.JSONSerializer):
+        yield from chunks
+    elif isinstance(serializer, cs_storage.TextSerializer):
+        yield from _json_string_stream(chunks)
+    else:
+        yield from _base64_stream(chunks)
+    yield b"}"
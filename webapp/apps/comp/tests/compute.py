@@ -25,7 +25,10 @@ class MockCompute(Compute):
     def remote_submit_job(self, url, data, timeout, headers=None):
         print("mocking:", url)
         with requests_mock.Mocker() as mock:
-            resp = {"task_id": str(uuid.uuid4())}
+            if isinstance(data, list):
+                resp = [{"task_id": str(uuid.uuid4())} for _ in data]
+            else:
+                resp = {"task_id": str(uuid.uuid4())}
             resp = json.dumps(resp)
             print("mocking", url)
             mock.register_uri("POST", url, text=resp)
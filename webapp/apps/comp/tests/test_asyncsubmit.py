@@ -3,8 +3,10 @@ import json
 import pytest
 
 
+from webapp.apps.comp.compute import WorkersUnreachableError
+from webapp.apps.comp.exceptions import BadPostException
 from webapp.apps.comp.models import Inputs, Simulation
-from .utils import _submit_inputs, _submit_sim
+from .utils import _submit_inputs, _submit_inputs_batch, _submit_sim
 
 
 @pytest.fixture(params=["Used-for-testing", "Used-for-testing-sponsored-apps"])
@@ -86,3 +88,66 @@ def test_set_notification_on_completion(
 
     sim = Simulation.objects.get(pk=inputs.sim.pk)
     assert sim.notify_on_completion is notify_on_completion
+
+
+def test_submit_inputs_batch(db, get_inputs, profile):
+    data = [
+        {
+            "meta_parameters": {"metaparam": 3},
+            "adjustment": {"majorsection1": {"intparam": i}},
+            "notify_on_completion": i % 2 == 0,
+        }
+        for i in range(3)
+    ]
+    submit_inputs = _submit_inputs_batch("Used-for-testing", get_inputs, profile, data)
+    result = list(submit_inputs.submit())
+
+    assert len(result) == 3
+    # All parse jobs are sent to the cluster with one request.
+    assert len(submit_inputs.compute.compute.last_posted) == 3
+
+    model_pks = [inputs.sim.model_pk for inputs in result]
+    assert model_pks == list(range(model_pks[0], model_pks[0] + 3))
+    assert len({inputs.job_id for inputs in result}) == 3
+    for i, inputs in enumerate(result):
+        assert inputs.status == "PENDING"
+        assert inputs.adjustment["majorsection1"] == {"intparam": i}
+        assert inputs.sim.status == "STARTED"
+        assert inputs.sim.notify_on_completion is (i % 2 == 0)
+        assert inputs.sim.owner == profile
+        assert list(inputs.sim.authors.all()) == [profile]
+        assert inputs.sim.role(profile.user) == "admin"
+
+
+def test_submit_inputs_batch_errors(db, get_inputs, profile):
+    data = [
+        {"meta_parameters": {"metaparam": 3}, "adjustment": {}},
+        {"meta_parameters": {"metaparam": "not a number"}, "adjustment": {}},
+    ]
+    submit_inputs = _submit_inputs_batch("Used-for-testing", get_inputs, profile, data)
+    num_sims = Simulation.objects.count()
+    with pytest.raises(BadPostException) as excinfo:
+        submit_inputs.submit()
+
+    assert excinfo.value.errors[0] == {}
+    assert "meta_parameters" in excinfo.value.errors[1]
+    assert Simulation.objects.count() == num_sims
+
+
+def test_submit_inputs_batch_flush_fails(db, get_inputs, profile, monkeypatch):
+    data = [{"meta_parameters": {"metaparam": 3}, "adjustment": {}}] * 2
+    submit_inputs = _submit_inputs_batch("Used-for-testing", get_inputs, profile, data)
+
+    def flush():
+        raise WorkersUnreachableError()
+
+    monkeypatch.setattr(submit_inputs.compute, "flush", flush)
+    num_sims = Simulation.objects.count()
+    with pytest.raises(WorkersUnreachableError):
+        submit_inputs.submit()
+
+    # The sims were committed before the jobs were submitted.
+    sims = Simulation.objects.order_by("-pk")[:2]
+    assert Simulation.objects.count() == num_sims + 2
+    assert all(sim.inputs.status == "FAIL" for sim in sims)
+    assert all(sim.inputs.job_id is None for sim in sims)
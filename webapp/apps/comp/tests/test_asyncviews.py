@@ -8,6 +8,8 @@ import pytest
 import requests_mock
 
 from django.contrib import auth
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.test import Client
 from rest_framework.authtoken.models import Token
@@ -29,9 +31,11 @@ from webapp.apps.comp.models import (
     Inputs,
     Simulation,
     PendingPermission,
+    SimulationScreenshot,
     ANON_BEFORE,
 )
 from webapp.apps.comp.ioutils import get_ioutils
+from webapp.apps.comp.views.api import SimsKeysetPagination
 from webapp.apps.comp.exceptions import PrivateSimException
 from .compute import MockCompute
 from .utils import (
@@ -1538,6 +1542,197 @@ def test_list_sim_api(db, api_client, get_inputs, meta_param_dict):
     assert resp.data["results"][0]["model_pk"] == tester_sims[1].model_pk
 
 
+def test_sims_keyset_pagination(
+    db, api_client, get_inputs, meta_param_dict, monkeypatch
+):
+    (user,) = gen_collabs(1, plan="pro")
+    sims, _, _ = _shuffled_sims(user, get_inputs, meta_param_dict)
+    # Sims with the same creation date are ordered by pk.
+    Simulation.objects.filter(pk__in=[sim.pk for sim in sims[:4]]).update(
+        creation_date=sims[0].creation_date
+    )
+    monkeypatch.setattr(SimsKeysetPagination, "page_size", 3)
+    exp = list(
+        Simulation.objects.filter(owner=user)
+        .order_by("-creation_date", "-pk")
+        .values_list("pk", flat=True)
+    )
+
+    pages = []
+    url = f"/api/v1/sims/{user}"
+    while url:
+        resp = api_client.get(url)
+        assert_status(200, resp, "keyset_page")
+        assert "count" not in resp.data
+        pages.append(resp.data)
+        url = resp.data["next"]
+    assert pages[0]["previous"] is None
+    assert [
+        sim.pk
+        for page in pages
+        for sim in Simulation.objects.filter(
+            owner=user, model_pk__in=[r["model_pk"] for r in page["results"]]
+        ).order_by("-creation_date", "-pk")
+    ] == exp
+
+    # Walk back from the last page.
+    resp = api_client.get(pages[-1]["previous"])
+    assert_status(200, resp, "keyset_previous")
+    assert resp.data["results"] == pages[-2]["results"]
+
+    # Custom orderings use page numbers.
+    resp = api_client.get(f"/api/v1/sims/{user}?ordering=project__title")
+    assert_status(200, resp, "ordered_page")
+    assert resp.data["count"] == len(exp)
+
+    resp = api_client.get(f"/api/v1/sims/{user}?cursor=abc")
+    assert_status(404, resp, "invalid_cursor")
+
+
+def test_list_sim_api_queries(db, api_client, get_inputs, meta_param_dict):
+    (user,) = gen_collabs(1, plan="pro")
+    _shuffled_sims(user, get_inputs, meta_param_dict)
+    api_client.force_login(user.user)
+
+    def count_queries(path):
+        with CaptureQueriesContext(connection) as queries:
+            resp = api_client.get(path)
+        assert_status(200, resp, path)
+        return len(queries), resp.data["results"]
+
+    for path in ("/api/v1/sims", f"/api/v1/sims/{user}", "/api/v1/log"):
+        num_queries, results = count_queries(path)
+        _shuffled_sims(user, get_inputs, meta_param_dict)
+        more_queries, more_results = count_queries(path)
+        # The number of queries does not depend on the number of sims.
+        assert len(more_results) > len(results)
+        assert more_queries == num_queries
+
+
+def test_outputs_api(db, api_client, get_inputs, meta_param_dict, monkeypatch):
+    modeler = User.objects.get(username="modeler").profile
+    inputs = _submit_inputs("Used-for-testing", get_inputs, meta_param_dict, modeler)
+    _, submit_sim = _submit_sim(inputs)
+    sim = submit_sim.submit()
+    sim.status = "SUCCESS"
+    sim.outputs = json.loads(read_outputs("Matchups_v1"))
+    sim.save()
+    base = f"/{sim.project}/api/v1/{sim.model_pk}/outputs/"
+
+    resp = api_client.get(base)
+    assert_status(200, resp, "outputs_manifest")
+    assert resp.data["count"] == 4
+    output = resp.data["results"][0]
+    assert output["category"] == "renderable"
+    assert output["url"] == f"http://testserver{base}{output['id']}/"
+    assert "screenshot" in output
+
+    resp = api_client.get(f"{base}?category=downloadable&limit=1")
+    assert_status(200, resp, "outputs_manifest_page")
+    assert resp.data["count"] == 2
+    assert [o["category"] for o in resp.data["results"]] == ["downloadable"]
+
+    def iter_output(output_id, ziplocation, filename):
+        assert ziplocation == sim.outputs["outputs"]["downloadable"]["ziplocation"]
+        yield b"a,b\n1,2\n"
+
+    monkeypatch.setattr("webapp.apps.comp.storage.iter_output", iter_output)
+    csv_id = sim.outputs["outputs"]["downloadable"]["outputs"][0]["id"]
+    resp = api_client.get(f"{base}{csv_id}/")
+    assert_status(200, resp, "output_data")
+    data = json.loads(b"".join(resp.streaming_content))
+    assert data["id"] == csv_id
+    assert data["data"] == "a,b\n1,2\n"
+
+    resp = api_client.get(f"{base}{csv_id}/", HTTP_IF_NONE_MATCH=resp["ETag"])
+    assert resp.status_code == 304
+
+    resp = api_client.get(f"{base}abc123/")
+    assert_status(404, resp, "output_data_missing")
+
+    sim.is_public = False
+    sim.save()
+    resp = api_client.get(base)
+    assert_status([403, 404], resp, "private_outputs_manifest")
+
+
+def test_cached_result_notifies(
+    db, api_client, get_inputs, meta_param_dict, mailoutbox
+):
+    modeler = User.objects.get(username="modeler").profile
+    inputs = _submit_inputs("Used-for-testing", get_inputs, meta_param_dict, modeler)
+    _, submit_sim = _submit_sim(inputs)
+    sim = submit_sim.submit()
+    sim.status = "SUCCESS"
+    sim.outputs = json.loads(read_outputs("Matchups_v1"))
+    sim.save()
+
+    submit_inputs = _submit_inputs(
+        "Used-for-testing",
+        get_inputs,
+        meta_param_dict,
+        modeler,
+        notify_on_completion=True,
+    )
+    inputs = submit_inputs.submit()
+    resp = api_client.put(
+        "/inputs/api/",
+        data={
+            "status": "SUCCESS",
+            "task_id": inputs.job_id,
+            "errors_warnings": {"majorsection1": {"errors": {}, "warnings": {}}},
+        },
+        format="json",
+        **inputs.project.cluster.headers(),
+    )
+    assert_status(200, resp, "put_cached_adjustment")
+
+    cached = Simulation.objects.get(pk=inputs.sim.pk)
+    assert cached.status == "SUCCESS" and cached.cached_from == sim
+    assert len(mailoutbox) == 1
+    assert mailoutbox[0].subject == f"{cached} has finished!"
+    assert mailoutbox[0].to == [modeler.user.email]
+
+
+def test_cached_result_screenshots(
+    db, client, get_inputs, meta_param_dict, profile, monkeypatch
+):
+    """
+    Screenshots of a public sim are served even if the sim that its outputs
+    were cached from is private.
+    """
+    modeler = User.objects.get(username="modeler").profile
+    inputs = _submit_inputs("Used-for-testing", get_inputs, meta_param_dict, modeler)
+    _, submit_sim = _submit_sim(inputs)
+    source = submit_sim.submit()
+    source.status = "SUCCESS"
+    source.is_public = False
+    source.outputs = json.loads(read_outputs("Matchups_v1"))
+    source.save()
+    SimulationScreenshot.objects.index(source)
+
+    inputs = _submit_inputs("Used-for-testing", get_inputs, meta_param_dict, profile)
+    _, submit_sim = _submit_sim(inputs)
+    cached = submit_sim.submit()
+    assert cached.cached_from == source and cached.is_public
+    SimulationScreenshot.objects.index(cached)
+
+    monkeypatch.setattr(
+        "webapp.apps.comp.storage.read_screenshot", lambda output_id: b"png"
+    )
+    output_id = source.outputs["outputs"]["renderable"]["outputs"][0]["id"]
+    path = f"/storage/screenshots/{output_id}.png"
+    assert_status(200, client.get(path), "anon_cached_screenshot")
+    client.force_login(profile.user)
+    assert_status(200, client.get(path), "owner_cached_screenshot")
+
+    cached.is_public = False
+    cached.save()
+    assert_status(200, client.get(path), "private_cached_screenshot")
+    client.logout()
+    assert_status([403, 404], client.get(path), "anon_private_screenshot")
+
+
 @pytest.fixture(params=[True, False])
 def viz(request, db, viz_project, pro_profile, customer_pro_by_default):
     sponsor = Profile.objects.get(user__username="sponsor")
@@ -0,0 +1,52 @@
+import threading
+
+from webapp.apps.comp.cache import LRUCache, canonical_hash
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # "b" is the least recently used entry.
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+    cache.delete("a")
+    assert cache.get("a", "default") == "default"
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_lru_cache_disabled():
+    cache = LRUCache(0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_lru_cache_threads():
+    cache = LRUCache(10)
+
+    def work(i):
+        for j in range(1000):
+            cache.set((i, j), j)
+            cache.get((i, j - 1))
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 10
+
+
+def test_canonical_hash():
+    assert canonical_hash({"a": 1, "b": [1, 2]}) == canonical_hash(
+        {"b": [1, 2], "a": 1}
+    )
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": 2})
+    assert canonical_hash({}) == canonical_hash({})
@@ -0,0 +1,123 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import requests_mock
+from requests.exceptions import ConnectTimeout
+
+from webapp.apps.comp import compute
+from webapp.apps.comp.compute import (
+    Compute,
+    DeferredCompute,
+    SyncCompute,
+    WorkersUnreachableError,
+    backoff_delay,
+    get_session,
+)
+
+
+URL = "http://scheduler/api/v1/jobs/modeler/Used-for-testing/"
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of sleeping."""
+    delays = []
+    monkeypatch.setattr(compute.time, "sleep", delays.append)
+    return delays
+
+
+def test_get_session():
+    assert get_session(URL) is get_session("http://scheduler/sync/")
+    assert get_session(URL) is not get_session("http://other-scheduler/sync/")
+
+
+def test_backoff_delay():
+    for attempts in range(1, 20):
+        delay = backoff_delay(attempts)
+        assert 0 <= delay <= compute.BACKOFF_MAX_IN_SECONDS
+        assert delay <= compute.BACKOFF_BASE_IN_SECONDS * 2 ** attempts
+
+
+def test_submit_retries(sleeps):
+    with requests_mock.Mocker() as mock:
+        mock.register_uri(
+            "POST",
+            URL,
+            [
+                {"exc": ConnectTimeout},
+                {"status_code": 503, "json": {}},
+                {"status_code": 201, "json": {"id": "abc"}},
+            ],
+        )
+        assert Compute().submit({}, URL, headers={}) == "abc"
+    assert len(sleeps) == 2
+
+
+def test_submit_gives_up(sleeps):
+    with requests_mock.Mocker() as mock:
+        mock.register_uri("POST", URL, status_code=503, json={})
+        with pytest.raises(WorkersUnreachableError):
+            Compute().submit({}, URL, headers={})
+    assert len(sleeps) == compute.MAX_ATTEMPTS_SUBMIT_JOB
+
+
+def test_sync_submit(sleeps):
+    with requests_mock.Mocker() as mock:
+        mock.register_uri("POST", URL, json={"status": "SUCCESS", "value": 1})
+        success, data = SyncCompute().submit({}, URL, headers={})
+    assert success
+    assert data == {"status": "SUCCESS", "value": 1}
+    assert sleeps == []
+
+
+def test_async_submit(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(compute.asyncio, "sleep", sleep)
+
+    responses = iter(
+        [httpx.Response(503, json={}), httpx.Response(201, json={"id": "abc"})]
+    )
+
+    async def run():
+        transport = httpx.MockTransport(lambda request: next(responses))
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await Compute().async_submit({}, URL, headers={}, client=client)
+
+    assert asyncio.run(run()) == "abc"
+    assert len(delays) == 1
+
+
+def test_deferred_compute(sleeps):
+    cluster = SimpleNamespace(url="http://scheduler", version="v1", headers=lambda: {})
+    project = SimpleNamespace(
+        cluster=cluster, owner="modeler", title="Used-for-testing", latest_tag="1"
+    )
+    deferred = DeferredCompute()
+    positions = [
+        deferred.submit_job(project, "parse", {"adjustment": i}, "/api/v1/jobs")
+        for i in range(3)
+    ]
+    assert positions == [0, 1, 2]
+    with pytest.raises(ValueError):
+        deferred.submit_job(project, "sim", {}, "/api/v1/jobs")
+
+    with requests_mock.Mocker() as mock:
+        mock.register_uri(
+            "POST",
+            f"{URL}batch/",
+            status_code=201,
+            json=[{"id": "a"}, {"id": "b"}, {"id": "c"}],
+        )
+        assert deferred.flush() == ["a", "b", "c"]
+        assert mock.call_count == 1
+        assert [task["task_kwargs"] for task in mock.last_request.json()] == [
+            {"adjustment": i} for i in range(3)
+        ]
+    assert deferred.flush() == []
@@ -6,7 +6,13 @@ import paramtools as pt
 
 from webapp.apps.users.models import Project, Profile, Tag
 
-from webapp.apps.comp.model_parameters import ModelParameters
+from webapp.apps.comp.model_parameters import (
+    ModelParameters,
+    compile_parameters,
+    compiled_parameters,
+    invalidate_inputs_cache,
+    local_inputs_cache,
+)
 from webapp.apps.comp.models import ModelConfig
 
 
@@ -143,6 +149,96 @@ def test_model_parameters(mock_project):
     assert ModelConfig.objects.filter(project=project).count() == 2
 
 
+def test_model_config_lookup(mock_project):
+    project = mock_project
+    mc = ModelConfig.objects.create(
+        project=project,
+        model_version="v1",
+        meta_parameters_values={"d0": 1, "d1": "hello"},
+        inputs_version="v1",
+        status="SUCCESS",
+    )
+    assert mc.meta_parameters_hash
+
+    assert (
+        ModelConfig.objects.get(
+            project=project,
+            model_version="v1",
+            meta_parameters_values={"d1": "hello", "d0": 1},
+        )
+        == mc
+    )
+    # A subset of the meta parameters does not match.
+    with pytest.raises(ModelConfig.DoesNotExist):
+        ModelConfig.objects.get(
+            project=project, model_version="v1", meta_parameters_values={"d0": 1}
+        )
+
+
+def test_model_config_partial_values(mock_project):
+    """
+    Configs are found by the meta parameter values that they were requested
+    with, even after the values are replaced by their cleaned form.
+    """
+    project = mock_project
+    mp = ModelParameters(project)
+    mp.get_inputs({"d0": 2})
+    assert mp.config.meta_parameters_values == {
+        "d0": [{"value": 2}],
+        "d1": [{"value": "hello"}],
+    }
+
+    local_inputs_cache.clear()
+    invalidate_inputs_cache(project)
+    mp = ModelParameters(project)
+    mp.get_inputs({"d0": 2})
+    assert ModelConfig.objects.filter(project=project).count() == 1
+
+    # Configs from v1 clusters are cleaned when the job's results are saved.
+    mc = ModelConfig.objects.create(
+        project=project,
+        model_version="v1",
+        meta_parameters_values={"d0": 3},
+        inputs_version="v1",
+        status="PENDING",
+    )
+    mc.meta_parameters_values = {"d0": [{"value": 3}], "d1": [{"value": "hello"}]}
+    mc.status = "SUCCESS"
+    mc.save()
+    assert (
+        ModelConfig.objects.get(
+            project=project, model_version="v1", meta_parameters_values={"d0": 3}
+        )
+        == mc
+    )
+
+
+def test_inputs_cache(mock_project, django_assert_num_queries):
+    project = mock_project
+
+    mp = ModelParameters(project)
+    inputs = mp.get_inputs()
+    config = mp.config
+
+    # Served from the local tier.
+    mp = ModelParameters(project)
+    with django_assert_num_queries(0):
+        assert mp.get_inputs() == inputs
+    assert mp.config == config
+
+    # Served from the shared tier.
+    local_inputs_cache.clear()
+    mp = ModelParameters(project)
+    with django_assert_num_queries(0):
+        assert mp.get_inputs() == inputs
+
+    invalidate_inputs_cache(project)
+    mp = ModelParameters(project)
+    with django_assert_num_queries(1):
+        assert mp.get_inputs() == inputs
+    assert ModelConfig.objects.filter(project=project).count() == 1
+
+
 def test_parameter_order(monkeypatch, mock_project):
     project = mock_project
     new_defaults = copy.deepcopy(Params.defaults)
@@ -161,3 +257,35 @@ def test_parameter_order(monkeypatch, mock_project):
     params = Params()
     for act, exp in zip(mc.model_parameters["section"], params.dump()):
         assert act == exp, f"Expected {act} === {exp}"
+
+
+def test_compile_parameters():
+    compiled_parameters.clear()
+    params0 = compile_parameters("MetaParams", MetaParams.defaults)
+    params1 = compile_parameters("MetaParams", MetaParams.defaults)
+    assert len(compiled_parameters) == 1
+    assert params0 is not params1
+
+    # adjust does not leak state between copies.
+    params0.adjust({"d0": 2})
+    assert params0.d0 == [{"value": 2}]
+    assert params1.d0 == [{"value": 1}]
+    assert compile_parameters("MetaParams", MetaParams.defaults).d0 == [{"value": 1}]
+
+    compile_parameters("MetaParams", MetaParams.defaults, key="config-1")
+    assert len(compiled_parameters) == 2
+
+
+def test_meta_parameters_parser_updated_config():
+    compiled_parameters.clear()
+    meta_parameters = copy.deepcopy(MetaParams.defaults)
+    mp = ModelParameters(project=None, compute=object())
+    mp.config = ModelConfig(pk=1, meta_parameters_hash="abc")
+    mp.get_inputs = lambda meta_parameters_values=None: {
+        "meta_parameters": meta_parameters
+    }
+    assert mp.meta_parameters_parser().d0 == [{"value": 1}]
+
+    # The config's meta parameters are updated without changing its pk.
+    meta_parameters["d0"]["value"] = 2
+    assert mp.meta_parameters_parser().d0 == [{"value": 2}]
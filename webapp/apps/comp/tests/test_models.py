@@ -6,19 +6,28 @@ from hashids import Hashids
 
 from django.http import Http404
 from django.contrib import auth
+from django.core.management import call_command
 from django.forms.models import model_to_dict
+from django.utils import timezone
 from django.http.response import Http404
 from guardian.shortcuts import get_perms
 
 from webapp.settings import FREE_PRIVATE_SIMS
 from webapp.apps.users.models import Project, Profile, create_profile_from_user
 from webapp.apps.users.tests.utils import gen_collabs
+from webapp.apps.comp import models as comp_models
 from webapp.apps.comp.models import (
+    BLOB_KEY,
     Inputs,
+    JSONBlob,
+    ModelPkCounter,
+    SharedJSON,
     Simulation,
     PendingPermission,
     ANON_BEFORE,
+    NEW_SIM_DEDUPE_WINDOW,
 )
+from webapp.apps.comp.permissions import PermissionResolver
 from webapp.apps.comp.exceptions import (
     ForkObjectException,
     VersionMismatchException,
@@ -69,6 +78,69 @@ def test_get_next_model_pk(db):
     assert Simulation.objects.next_model_pk(project) == sim.model_pk + 1
 
 
+def test_reserve_model_pks(db, profile):
+    project = Project.objects.get(title="Used-for-testing")
+    sim = Simulation.objects.new_sim(profile.user, project)
+    assert ModelPkCounter.objects.get(project=project).last_model_pk == sim.model_pk
+
+    model_pks = Simulation.objects.reserve_model_pks(project, 3)
+    assert list(model_pks) == [sim.model_pk + 1, sim.model_pk + 2, sim.model_pk + 3]
+    assert Simulation.objects.new_sim(profile.user, project).model_pk == (
+        sim.model_pk + 4
+    )
+
+    # Counters are created from the existing simulations if missing.
+    ModelPkCounter.objects.filter(project=project).delete()
+    assert Simulation.objects.next_model_pk(project) == sim.model_pk + 5
+
+
+def test_new_sim_double_submit(db, profile):
+    project = Project.objects.get(title="Used-for-testing")
+    sim = Simulation.objects.new_sim(profile.user, project)
+    # A second request right after the first one gets the same sim.
+    assert Simulation.objects.new_sim(profile.user, project) == sim
+    # Batch callers always get a new sim.
+    pending = Simulation.objects.new_sim(profile.user, project, inputs_status="PENDING")
+    assert pending.model_pk == sim.model_pk + 1
+
+    sim = Simulation.objects.new_sim(profile.user, project)
+    assert sim.model_pk == pending.model_pk + 1
+    Simulation.objects.filter(pk=sim.pk).update(
+        creation_date=timezone.now() - NEW_SIM_DEDUPE_WINDOW
+    )
+    assert Simulation.objects.new_sim(profile.user, project).model_pk == (
+        sim.model_pk + 1
+    )
+
+
+def test_sim_counts(db, profile):
+    project = Project.objects.get(title="Used-for-testing")
+    modeler = User.objects.get(username="modeler")
+
+    def assert_counts():
+        project.refresh_from_db()
+        project.model_pk_counter.refresh_from_db()
+        exp = Simulation.objects.sim_counts(project)
+        assert project.sim_count() == exp["sim_count"]
+        assert project.user_count() == exp["user_count"]
+
+    Simulation.objects.new_sim(profile.user, project)
+    assert_counts()
+    Simulation.objects.new_sims(profile.user, project, [{}, {}])
+    assert_counts()
+    sim = Simulation.objects.new_sim(modeler, project)
+    assert_counts()
+    sim.status = "SUCCESS"
+    sim.save()
+    Simulation.objects.fork(sim, profile.user)
+    assert_counts()
+
+    # The reconcile command repairs counts that drifted.
+    Simulation.objects.filter(project=project, owner=profile).delete()
+    call_command("reconcile_sim_counts")
+    assert_counts()
+
+
 def test_parent_sims(db, get_inputs, meta_param_dict, profile):
     modeler = User.objects.get(username="modeler").profile
     inputs = _submit_inputs("Used-for-testing", get_inputs, meta_param_dict, modeler)
@@ -98,7 +170,7 @@ def test_parent_sims(db, get_inputs, meta_param_dict, profile):
         assert middle_sim.parent_sims() == list(reversed(sims[:ix]))
 
 
-def test_private_parent_sims(db, shuffled_sims, profile):
+def test_private_parent_sims(db, shuffled_sims, profile, django_assert_max_num_queries):
     """Test only able to view parent sims that user can access"""
 
     modeler = User.objects.get(username="modeler").profile
@@ -116,9 +188,11 @@ def test_private_parent_sims(db, shuffled_sims, profile):
 
     child_sim.refresh_from_db()
 
-    assert child_sim.parent_sims(user=modeler.user) == list(
-        reversed([sim for sim in modeler_sims if sim != child_sim])
-    )
+    # The lineage and permissions are loaded in batches, not once per parent.
+    with django_assert_max_num_queries(8):
+        assert child_sim.parent_sims(user=modeler.user) == list(
+            reversed([sim for sim in modeler_sims if sim != child_sim])
+        )
     assert child_sim.parent_sims(user=profile.user) == list(
         reversed([sim for sim in tester_sims if sim != child_sim])
     )
@@ -186,6 +260,128 @@ def test_sim_fork(db, get_inputs, meta_param_dict, is_public):
         Simulation.objects.fork(sim, profile.user)
 
 
+def test_fork_shares_blobs(db, get_inputs, meta_param_dict, monkeypatch):
+    monkeypatch.setattr(comp_models, "BLOB_MIN_SIZE", 0)
+    (profile,) = gen_collabs(1, plan="pro")
+    modeler = User.objects.get(username="modeler").profile
+    inputs = _submit_inputs("Used-for-testing", get_inputs, meta_param_dict, modeler)
+    _, submit_sim = _submit_sim(inputs)
+    sim = submit_sim.submit()
+    sim.inputs.status = "SUCCESS"
+    sim.inputs.save()
+    sim.outputs = {"version": "v1", "outputs": {"renderable": {"outputs": []}}}
+    sim.status = "SUCCESS"
+    sim.is_public = True
+    sim.save()
+
+    fork = Simulation.objects.fork(sim, profile.user)
+    fork_of_fork = Simulation.objects.fork(
+        Simulation.objects.get(pk=fork.pk), modeler.user
+    )
+
+    shared = set(Simulation.objects.filter(outputs__has_key=BLOB_KEY))
+    assert shared == {fork, fork_of_fork}
+    assert JSONBlob.objects.get(digest=fork.outputs.digest).ref_count == 2
+    assert Simulation.objects.get(pk=fork_of_fork.pk).outputs == sim.outputs
+    assert Inputs.objects.get(pk=fork.inputs.pk).adjustment == sim.inputs.adjustment
+    assert (
+        Simulation.objects.for_list().get(pk=fork.pk).outputs_version()
+        == sim.outputs_version()
+    )
+
+    # Modified data is copied into the row.
+    fork = Simulation.objects.get(pk=fork.pk)
+    fork.outputs["version"] = "v2"
+    fork.save()
+    shared = set(Simulation.objects.filter(outputs__has_key=BLOB_KEY))
+    assert shared == {fork_of_fork}
+    assert Simulation.objects.get(pk=fork.pk).outputs["version"] == "v2"
+
+    JSONBlob.objects.update(shared_at=ANON_BEFORE)
+    call_command("collect_blobs")
+    assert JSONBlob.objects.get(digest=fork_of_fork.outputs.digest).ref_count == 1
+    fork_of_fork.delete()
+    call_command("collect_blobs")
+    assert not JSONBlob.objects.filter(digest=fork_of_fork.outputs.digest).exists()
+
+
+def test_blobs_load_in_bulk(
+    db, get_inputs, meta_param_dict, monkeypatch, django_assert_num_queries
+):
+    monkeypatch.setattr(comp_models, "BLOB_MIN_SIZE", 0)
+    (profile,) = gen_collabs(1, plan="pro")
+    modeler = User.objects.get(username="modeler").profile
+    inputs = _submit_inputs("Used-for-testing", get_inputs, meta_param_dict, modeler)
+    _, submit_sim = _submit_sim(inputs)
+    sim = submit_sim.submit()
+    sim.inputs.status = "SUCCESS"
+    sim.inputs.save()
+    sim.outputs = {"version": "v1", "outputs": {"renderable": {"outputs": []}}}
+    sim.status = "SUCCESS"
+    sim.is_public = True
+    sim.save()
+    Simulation.objects.fork(sim, profile.user)
+    Simulation.objects.fork(sim, modeler.user)
+
+    with django_assert_num_queries(1):
+        forks = list(Simulation.objects.filter(outputs__has_key=BLOB_KEY))
+    with django_assert_num_queries(1):
+        assert [fork.outputs for fork in forks] == [sim.outputs, sim.outputs]
+    assert forks[0].outputs is not forks[1].outputs
+
+    # Blobs that are not used are not loaded to save the row.
+    fork = Simulation.objects.get(pk=forks[0].pk)
+    fork.title = "New title"
+    fork.save()
+    assert BLOB_KEY in fork.__dict__["outputs"]
+    assert Simulation.objects.filter(pk=fork.pk, outputs__has_key=BLOB_KEY).exists()
+
+
+def test_shared_json_changed():
+    field = Simulation._meta.get_field("outputs")
+    value = SharedJSON({"version": "v1", "outputs": {}}, "abc")
+    value.setdefault("version", "v2")
+    assert not value.changed
+    assert json.loads(field.get_prep_value(value)) == {
+        BLOB_KEY: "abc",
+        "version": "v1",
+    }
+
+    value["version"] = "v2"
+    assert value.changed
+    assert json.loads(field.get_prep_value(value)) == {"version": "v2", "outputs": {}}
+
+
+def test_cached_result(db, get_inputs, meta_param_dict):
+    modeler = User.objects.get(username="modeler").profile
+
+    def submit():
+        inputs = _submit_inputs(
+            "Used-for-testing", get_inputs, meta_param_dict, modeler
+        )
+        _, submit_sim = _submit_sim(inputs)
+        return submit_sim.submit()
+
+    sim = submit()
+    assert sim.status == "PENDING" and not sim.is_cached
+    sim.status = "SUCCESS"
+    sim.run_time = 10
+    sim.outputs = {"version": "v1", "outputs": {"renderable": {"outputs": []}}}
+    sim.save()
+
+    cached = submit()
+    assert cached.status == "SUCCESS"
+    assert cached.is_cached and cached.cached_from == sim
+    assert cached.result_key == sim.result_key
+    assert cached.outputs == sim.outputs
+    assert cached.run_time == 0 and cached.job_id is None
+
+    sim.project.cache_results = False
+    sim.project.save()
+    uncached = submit()
+    assert uncached.status == "PENDING" and not uncached.is_cached
+
+
 def test_outputs_versions(db, get_inputs, meta_param_dict):
     modeler = User.objects.get(username="modeler").profile
     inputs = _submit_inputs("Used-for-testing", get_inputs, meta_param_dict, modeler)
@@ -250,8 +446,19 @@ def test_sim_screenshot_query(db, get_inputs, meta_param_dict):
     sim.outputs = json.loads(read_outputs("Matchups_v1"))
     sim.save()
 
+    # The sim was saved without record_outputs, so it is not found until
+    # the index is backfilled.
+    assert not sim.screenshots.exists()
+    output_id = sim.outputs["outputs"]["renderable"]["outputs"][0]["id"]
+    with pytest.raises(Simulation.DoesNotExist):
+        Simulation.objects.get_object_from_screenshot(output_id)
+
+    call_command("index_screenshots")
     for output in sim.outputs["outputs"]["renderable"]["outputs"]:
         assert sim == Simulation.objects.get_object_from_screenshot(output["id"])
+    assert set(sim.screenshots.values_list("output_id", flat=True)) == {
+        output["id"] for output in sim.outputs["outputs"]["renderable"]["outputs"]
+    }
 
     with pytest.raises(Simulation.DoesNotExist):
         Simulation.objects.get_object_from_screenshot("abc123")
@@ -260,6 +467,61 @@ def test_sim_screenshot_query(db, get_inputs, meta_param_dict):
         Simulation.objects.get_object_from_screenshot("abc123", http_404_on_fail=True)
 
 
+def test_permission_resolver(
+    db, get_inputs, meta_param_dict, django_assert_num_queries
+):
+    (collab,) = gen_collabs(1, plan="pro")
+    modeler = User.objects.get(username="modeler").profile
+    sims, _, _ = _shuffled_sims(collab, get_inputs, meta_param_dict)
+    for i, sim in enumerate(sims):
+        sim.is_public = bool(i % 2)
+        sim.save()
+    sims[0].assign_role("read", modeler.user)
+    sims[2].assign_role("write", modeler.user)
+
+    sims = list(Simulation.objects.filter(pk__in=[sim.pk for sim in sims]))
+    for user in (collab.user, modeler.user, None):
+        resolver = PermissionResolver(user)
+        resolver.prefetch(sims)
+        with django_assert_num_queries(0):
+            checks = [
+                (
+                    resolver.role(sim),
+                    resolver.has_admin_access(sim),
+                    resolver.has_write_access(sim),
+                    resolver.has_read_access(sim),
+                )
+                for sim in sims
+            ]
+        assert checks == [
+            (
+                sim.role(user),
+                sim.has_admin_access(user),
+                sim.has_write_access(user),
+                sim.has_read_access(user),
+            )
+            for sim in sims
+        ]
+
+
+def test_sims_for_list(db, get_inputs, meta_param_dict):
+    modeler = User.objects.get(username="modeler").profile
+    inputs = _submit_inputs("Used-for-testing", get_inputs, meta_param_dict, modeler)
+    _, submit_sim = _submit_sim(inputs)
+    sim = submit_sim.submit()
+
+    listed = Simulation.objects.for_list().get(pk=sim.pk)
+    assert listed.outputs_version() is None
+    assert "outputs" in listed.get_deferred_fields()
+
+    sim.outputs = json.loads(read_outputs("Matchups_v1"))
+    sim.save()
+    listed = Simulation.objects.for_list().get(pk=sim.pk)
+    assert listed.outputs_version() == "v1"
+    assert listed.get_absolute_url() == sim.get_absolute_url()
+    assert "outputs" in listed.get_deferred_fields()
+
+
 def test_sim_permissions(db, get_inputs, meta_param_dict, pro_profile):
     collab = next(gen_collabs(1))
     inputs = _submit_inputs(
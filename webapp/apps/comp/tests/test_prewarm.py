@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+from webapp.apps.users.models import Cluster, Project
+
+from webapp.apps.comp import prewarm
+from webapp.apps.comp.models import Inputs, ModelConfig
+from webapp.apps.comp.prewarm import (
+    prewarm_later,
+    prewarm_model_configs,
+    prewarm_on_promote,
+    recent_meta_parameters,
+    run_prewarm,
+    year_range_meta_parameters,
+)
+from .compute import MockCompute
+
+
+META_PARAMETERS = {
+    "year": {
+        "title": "Year",
+        "description": "",
+        "type": "int",
+        "value": 2020,
+        "validators": {"range": {"min": 2019, "max": 2021}},
+    },
+    "data_source": {
+        "title": "Data Source",
+        "description": "",
+        "type": "str",
+        "value": "PUF",
+        "validators": {"choice": {"choices": ["PUF", "CPS"]}},
+    },
+}
+
+
+def test_year_range_meta_parameters():
+    values = year_range_meta_parameters(META_PARAMETERS)
+    assert values == [
+        {"year": [{"value": 2020}], "data_source": [{"value": "PUF"}]},
+        {"year": [{"value": 2019}], "data_source": [{"value": "PUF"}]},
+        {"year": [{"value": 2020}], "data_source": [{"value": "PUF"}]},
+        {"year": [{"value": 2021}], "data_source": [{"value": "PUF"}]},
+    ]
+
+    no_year = {"data_source": META_PARAMETERS["data_source"]}
+    assert year_range_meta_parameters(no_year) == [{"data_source": [{"value": "PUF"}]}]
+
+
+def test_prewarm_model_configs(db, monkeypatch):
+    monkeypatch.setattr(Cluster, "headers", lambda self: {})
+    project = Project.objects.get(title="Used-for-testing")
+    project.cluster.version = "v1"
+    project.cluster.save()
+
+    meta_parameters = {"year": [{"value": 2020}]}
+    Inputs.objects.create(project=project, meta_parameters=meta_parameters)
+    Inputs.objects.create(project=project, meta_parameters=meta_parameters)
+    assert recent_meta_parameters(project)[0] == meta_parameters
+
+    compute = MockCompute()
+    configs = prewarm_on_promote(project, compute=compute)
+    assert len(configs) == len(compute.last_posted) == 2
+    for values in [{}, meta_parameters]:
+        config = ModelConfig.objects.get(
+            project=project,
+            model_version=str(project.latest_tag),
+            meta_parameters_values=values,
+        )
+        assert config.status == "PENDING"
+        assert config.job_id
+
+    # Only new meta parameter values are submitted.
+    configs = prewarm_model_configs(
+        project, [{}, {"year": [{"value": 2021}]}], compute=compute
+    )
+    assert len(configs) == len(compute.last_posted) == 1
+
+
+def test_prewarm_later(db, django_capture_on_commit_callbacks, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(
+        prewarm,
+        "executor",
+        SimpleNamespace(submit=lambda *args: submitted.append(args)),
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        prewarm_later(prewarm_on_promote, "project")
+        assert submitted == []
+    assert submitted == [(run_prewarm, prewarm_on_promote, "project")]
@@ -0,0 +1,169 @@
+import base64
+import json
+from io import BytesIO
+from zipfile import ZipFile
+
+import cs_storage
+import pytest
+from django.test import RequestFactory
+
+from webapp.apps.comp import storage
+from webapp.apps.comp.streaming import (
+    output_stream,
+    parse_range,
+    slice_stream,
+    streaming_download,
+    zip_stream,
+)
+
+
+FILES = [("a.csv", "a,b\n1,2\n"), ("b.txt", "hello world" * 100)]
+
+
+def content(response):
+    return b"".join(response.streaming_content)
+
+
+def test_zip_stream():
+    data = b"".join(zip_stream(FILES))
+    with ZipFile(BytesIO(data)) as z:
+        assert z.namelist() == ["a.csv", "b.txt"]
+        assert z.read("b.txt").decode() == FILES[1][1]
+    # The same files always produce the same bytes.
+    assert b"".join(zip_stream(FILES)) == data
+
+
+def test_slice_stream():
+    chunks = [b"abc", b"def", b"ghi"]
+    assert b"".join(slice_stream(chunks)) == b"abcdefghi"
+    assert b"".join(slice_stream(chunks, 2, 6)) == b"cdefg"
+    assert b"".join(slice_stream(chunks, 4)) == b"efghi"
+    assert b"".join(slice_stream(chunks, 8, 8)) == b"i"
+
+
+@pytest.mark.parametrize(
+    "header,exp",
+    [
+        ("bytes=0-9", (0, 9)),
+        ("bytes=5-", (5, 99)),
+        ("bytes=-10", (90, 99)),
+        ("bytes=90-200", (90, 99)),
+        ("bytes=-200", (0, 99)),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+    ],
+)
+def test_parse_range(header, exp):
+    assert parse_range(header, 100) == exp
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=5-1", "bytes=-0"])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 100)
+
+
+def test_streaming_download():
+    data = b"".join(zip_stream(FILES))
+
+    def stream(start, end):
+        return slice_stream(zip_stream(FILES), start, end)
+
+    def download(**headers):
+        request = RequestFactory().get("/download/", **headers)
+        return streaming_download(
+            request,
+            stream,
+            '"etag"',
+            "outputs.zip",
+            size=lambda: sum(len(chunk) for chunk in zip_stream(FILES)),
+        )
+
+    resp = download()
+    assert resp.status_code == 200
+    assert resp["ETag"] == '"etag"'
+    assert resp["Accept-Ranges"] == "bytes"
+    assert content(resp) == data
+
+    resp = download(HTTP_RANGE="bytes=10-")
+    assert resp.status_code == 206
+    assert resp["Content-Range"] == f"bytes 10-{len(data) - 1}/{len(data)}"
+    assert content(resp) == data[10:]
+
+    # Ranges are ignored if the file has changed.
+    resp = download(HTTP_RANGE="bytes=10-", HTTP_IF_RANGE='"other"')
+    assert resp.status_code == 200
+    assert content(resp) == data
+
+    resp = download(HTTP_RANGE=f"bytes={len(data)}-")
+    assert resp.status_code == 416
+
+    resp = download(HTTP_IF_NONE_MATCH='"etag"')
+    assert resp.status_code == 304
+
+
+def test_local_storage(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "STORAGE_URL", f"file://{tmp_path}")
+    (tmp_path / "outputs.zip").write_bytes(b"0123456789" * 10000)
+
+    size, etag = storage.file_info("outputs.zip")
+    assert size == 100000
+    assert etag.startswith('"') and etag.endswith('"')
+    assert b"".join(storage.iter_file("outputs.zip", chunk_size=7)) == (
+        b"0123456789" * 10000
+    )
+    assert b"".join(storage.iter_file("outputs.zip", 5, 14, chunk_size=4)) == (
+        b"5678901234"
+    )
+
+
+def test_read_screenshot(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "STORAGE_URL", f"file://{tmp_path}")
+    (tmp_path / "abc.png").write_bytes(b"png bytes")
+
+    assert storage.read_screenshot("abc") == b"png bytes"
+    # Screenshots are served from memory once they have been read.
+    (tmp_path / "abc.png").unlink()
+    assert storage.read_screenshot("abc") == b"png bytes"
+
+
+@pytest.mark.parametrize(
+    "media_type,data",
+    [
+        ("bokeh", {"target_id": None, "root_id": "abc", "doc": {"roots": []}}),
+        ("table", "<table><td>\"π\" \\ 'ü'</td></table>\n" * 1000),
+        ("PNG", base64.b64encode(bytes(range(256)) * 100).decode()),
+    ],
+)
+def test_output_stream(media_type, data):
+    output = {"id": "abc", "title": "Output", "media_type": media_type}
+    serializer = cs_storage.get_serializer(media_type)
+    ser = serializer.serialize(data)
+    exp = dict(output, data=serializer.deserialize(ser, json_serializable=True))
+
+    # Chunk boundaries may split multibyte characters and base64 groups.
+    chunks = [ser[i : i + 7] for i in range(0, len(ser), 7)]
+    assert json.loads(b"".join(output_stream(output, chunks))) == exp
+
+
+def test_iter_output(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "STORAGE_URL", f"file://{tmp_path}")
+    monkeypatch.setattr(storage, "OUTPUT_CACHE_MAX_SIZE", 100)
+    with ZipFile(tmp_path / "outputs.zip", "w") as z:
+        z.writestr("small.csv", "a,b\n1,2\n")
+        z.writestr("large.csv", "a,b\n1,2\n" * 100)
+
+    assert b"".join(storage.iter_output("a", "outputs.zip", "small.csv")) == (
+        b"a,b\n1,2\n"
+    )
+    assert b"".join(
+        storage.iter_output("b", "outputs.zip", "large.csv", chunk_size=64)
+    ) == (b"a,b\n1,2\n" * 100)
+
+    # Only small outputs are cached.
+    (tmp_path / "outputs.zip").unlink()
+    assert b"".join(storage.iter_output("a", "outputs.zip", "small.csv")) == (
+        b"a,b\n1,2\n"
+    )
+    with pytest.raises(FileNotFoundError):
+        b"".join(storage.iter_output("b", "outputs.zip", "large.csv"))
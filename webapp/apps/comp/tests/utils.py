@@ -4,7 +4,8 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APIRequestFactory
 
 from webapp.apps.users.models import Project, Profile, create_profile_from_user
-from webapp.apps.comp.asyncsubmit import SubmitInputs, SubmitSim
+from webapp.apps.comp.asyncsubmit import SubmitInputs, SubmitInputsBatch, SubmitSim
+from webapp.apps.comp.compute import DeferredCompute
 from webapp.apps.comp.model_parameters import ModelParameters
 from webapp.apps.comp.ioutils import get_ioutils
 from webapp.apps.comp.models import Simulation
@@ -60,6 +61,25 @@ def _submit_inputs(
     return SubmitInputs(mockrequest, project, ioutils, compute, sim)
 
 
+def _submit_inputs_batch(title, get_inputs, profile, data):
+    class MockMP(ModelParameters):
+        def get_inputs(self, meta_parameters=None):
+            return get_inputs
+
+    project = Project.objects.get(title=title)
+    ioutils = get_ioutils(project, ModelParameters=MockMP, Parser=APIParser)
+
+    factory = APIRequestFactory()
+    mockrequest = factory.post(
+        "/modeler/Used-for-testing/api/v1/batch/", data=data, format="json"
+    )
+    mockrequest.user = profile.user
+    mockrequest.data = data
+
+    compute = DeferredCompute(MockCompute())
+    return SubmitInputsBatch(mockrequest, project, ioutils, compute)
+
+
 def _submit_sim(submit_inputs):
     compute = MockCompute()
     result = submit_inputs.submit()
@@ -9,8 +9,11 @@ from webapp.apps.comp.views import (
     OutputsView,
     InputsAPIView,
     CreateAPIView,
+    BatchCreateAPIView,
     DetailAPIView,
     RemoteDetailAPIView,
+    OutputsManifestAPIView,
+    OutputDataAPIView,
     ForkDetailAPIView,
     MyInputsAPIView,
     DetailMyInputsAPIView,
@@ -26,9 +29,12 @@ from webapp.apps.comp.views import (
 
 # API Routes:
 # api/v1/ - create sims.
+# api/v1/batch/ - create a batch of sims.
 # api/v1/inputs/ - view inputs, post meta parameters.
 # api/v1/<int:model_pk>/edit/ - view inputs from sim using model_pk.
 # api/v1/<int:model_pk>/ - get all data related to sim, including inputs and outputs.
+# api/v1/<int:model_pk>/outputs/ - list sim outputs without their data.
+# api/v1/<int:model_pk>/outputs/<str:output_id>/ - get the data for one output.
 
 urlpatterns = [
     path("embed/<str:ea_name>/", EmbedView.as_view(), name="embed"),
@@ -36,6 +42,7 @@ urlpatterns = [
     path("viz/", VizView.as_view(), name="viz"),
     path("new/", NewSimView.as_view(), name="simulation"),
     path("api/v1/", CreateAPIView.as_view(), name="create_api"),
+    path("api/v1/batch/", BatchCreateAPIView.as_view(), name="batch_create_api"),
     path("api/v1/inputs/", InputsAPIView.as_view(), name="inputs_api"),
     path("api/v1/new/", NewSimulationAPIView.as_view(), name="inputs_api"),
     path("api/v1/<int:model_pk>/", DetailAPIView.as_view(), name="detail_api"),
@@ -49,6 +56,16 @@ urlpatterns = [
         RemoteDetailAPIView.as_view(),
         name="remote_detail_api",
     ),
+    path(
+        "api/v1/<int:model_pk>/outputs/",
+        OutputsManifestAPIView.as_view(),
+        name="outputs_manifest_api",
+    ),
+    path(
+        "api/v1/<int:model_pk>/outputs/<str:output_id>/",
+        OutputDataAPIView.as_view(),
+        name="output_data_api",
+    ),
     path(
         "api/v1/<int:model_pk>/fork/",
         ForkDetailAPIView.as_view(),
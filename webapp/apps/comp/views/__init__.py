@@ -14,8 +14,11 @@ from .views import (
 from .api import (
     InputsAPIView,
     CreateAPIView,
+    BatchCreateAPIView,
     DetailAPIView,
     RemoteDetailAPIView,
+    OutputsManifestAPIView,
+    OutputDataAPIView,
     ForkDetailAPIView,
     OutputsAPIView,
     DetailMyInputsAPIView,
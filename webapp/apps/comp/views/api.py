@@ -1,9 +1,17 @@
+import binascii
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
 from django.shortcuts import get_object_or_404
 from django.core.mail import send_mail
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from django.http import Http404
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 
 from rest_framework.authentication import (
@@ -16,8 +24,10 @@ from rest_framework.views import APIView
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.fields import IntegerField
+from rest_framework.pagination import LimitOffsetPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from rest_framework import filters
 
 from oauth2_provider.contrib.rest_framework import OAuth2Authentication
@@ -34,8 +44,9 @@ from webapp.apps.users.models import (
 )
 from webapp.apps.users.permissions import RequiresActive, StrictRequiresActive
 
-from webapp.apps.comp.asyncsubmit import SubmitInputs, SubmitSim
-from webapp.apps.comp.compute import Compute, JobFailError
+from webapp.apps.comp.asyncsubmit import SubmitInputs, SubmitInputsBatch, SubmitSim
+from webapp.apps.comp import storage
+from webapp.apps.comp.compute import Compute, DeferredCompute, JobFailError
 from webapp.apps.comp.exceptions import (
     AppError,
     ValidationError,
@@ -46,6 +57,7 @@ from webapp.apps.comp.exceptions import (
     NotReady,
 )
 from webapp.apps.comp.ioutils import get_ioutils
+from webapp.apps.comp.model_parameters import invalidate_inputs_cache
 from webapp.apps.comp.models import (
     Inputs,
     Simulation,
@@ -54,6 +66,8 @@ from webapp.apps.comp.models import (
     ANON_BEFORE,
 )
 from webapp.apps.comp.parser import APIParser
+from webapp.apps.comp.permissions import PermissionResolver
+from webapp.apps.comp.prewarm import prewarm_later, prewarm_on_defaults
 from webapp.apps.comp.serializers import (
     SimulationSerializer,
     MiniSimulationSerializer,
@@ -64,6 +78,7 @@ from webapp.apps.comp.serializers import (
     SimAccessSerializer,
     PendingPermissionSerializer,
 )
+from webapp.apps.comp.streaming import output_stream
 from webapp.apps.comp.utils import is_valid
 
 from .core import (
@@ -142,6 +157,24 @@ class DetailMyInputsAPIView(APIView):
         return Response(ser.data)
 
 
+def notify_app_error(request, project, ae):
+    try:
+        send_mail(
+            f"Compute Studio AppError",
+            (
+                f"An error has occurred:\n {ae.parameters}\n causing: "
+                f"{ae.traceback}\n user:{request.user.username}\n "
+                f"project: {project.app_url}."
+            ),
+            "notifications@compute.studio",
+            ["hank@compute.studio"],
+            fail_silently=True,
+        )
+    # Http 401 exception if mail credentials are not set up.
+    except Exception:
+        pass
+
+
 def submit(request, success_status, project, sim):
     compute = Compute()
     ioutils = get_ioutils(project, Parser=APIParser)
@@ -152,22 +185,7 @@ def submit(request, success_status, project, sim):
     except BadPostException as bpe:
         return Response(bpe.errors, status=status.HTTP_400_BAD_REQUEST)
     except AppError as ae:
-        try:
-            send_mail(
-                f"Compute Studio AppError",
-                (
-                    f"An error has occurred:\n {ae.parameters}\n causing: "
-                    f"{ae.traceback}\n user:{request.user.username}\n "
-                    f"project: {project.app_url}."
-                ),
-                "notifications@compute.studio",
-                ["hank@compute.studio"],
-                fail_silently=True,
-            )
-        # Http 401 exception if mail credentials are not set up.
-        except Exception:
-            pass
-
+        notify_app_error(request, project, ae)
         return Response(ae.traceback, status=success_status)
 
     inputs = InputsSerializer(result)
@@ -175,6 +193,26 @@ def submit(request, success_status, project, sim):
     return Response(inputs.data, status=status.HTTP_201_CREATED)
 
 
+def submit_batch(request, project):
+    compute = DeferredCompute()
+    ioutils = get_ioutils(project, Parser=APIParser)
+
+    try:
+        submit_inputs = SubmitInputsBatch(request, project, ioutils, compute)
+        result = submit_inputs.submit()
+    except BadPostException as bpe:
+        return Response(bpe.errors, status=status.HTTP_400_BAD_REQUEST)
+    except PrivateSimException as e:
+        return Response({e.resource: e.todict()}, status=status.HTTP_400_BAD_REQUEST)
+    except AppError as ae:
+        notify_app_error(request, project, ae)
+        return Response(ae.traceback, status=status.HTTP_400_BAD_REQUEST)
+
+    inputs = InputsSerializer(result, many=True, context={"request": request})
+
+    return Response(inputs.data, status=status.HTTP_201_CREATED)
+
+
 class BaseCreateAPIView(APIView):
     authentication_classes = (
         SessionAuthentication,
@@ -212,6 +250,39 @@ class CreateAPIView(AbstractRouterAPIView):
     projects = Project.objects.all()
 
 
+class BaseBatchCreateAPIView(APIView):
+    authentication_classes = (
+        SessionAuthentication,
+        BasicAuthentication,
+        TokenAuthentication,
+        OAuth2Authentication,
+    )
+    queryset = Project.objects.all()
+
+    def post(self, request, *args, **kwargs):
+        project = get_project_or_404(
+            self.queryset,
+            user=request.user,
+            owner__user__username__iexact=kwargs["username"],
+            title__iexact=kwargs["title"],
+        )
+        return submit_batch(request, project)
+
+
+class RequiresLoginBatchCreateAPIView(RequiresLoginPermissions, BaseBatchCreateAPIView):
+    pass
+
+
+class RequiresPmtBatchCreateAPIView(RequiresPmtPermissions, BaseBatchCreateAPIView):
+    pass
+
+
+class BatchCreateAPIView(AbstractRouterAPIView):
+    payment_view = RequiresPmtBatchCreateAPIView
+    login_view = RequiresLoginBatchCreateAPIView
+    projects = Project.objects.all()
+
+
 class BaseDetailAPIView(GetOutputsObjectMixin, APIView):
     model = Simulation
     authentication_classes = (
@@ -266,7 +337,13 @@ class BaseDetailAPIView(GetOutputsObjectMixin, APIView):
 
     def get_sim_data(self, user, as_remote, username, title, model_pk):
         self.object = self.get_object(model_pk, username, title)
-        sim = SimulationSerializer(self.object, context={"request": self.request})
+        sim = SimulationSerializer(
+            self.object,
+            context={
+                "request": self.request,
+                "permissions": PermissionResolver(self.request.user),
+            },
+        )
         data = sim.data
         if self.object.outputs_version() == "v0":
             return Response(data, status=status.HTTP_200_OK)
@@ -321,6 +398,105 @@ class RemoteDetailAPIView(BaseDetailAPIView):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
+class OutputsManifestPagination(LimitOffsetPagination):
+    default_limit = 20
+    max_limit = 100
+
+
+class OutputsManifestAPIView(GetOutputsObjectMixin, APIView):
+    """
+    List a simulation's outputs without their data. Each output has a url
+    that is used to fetch its data from OutputDataAPIView.
+    """
+
+    model = Simulation
+    authentication_classes = (
+        SessionAuthentication,
+        BasicAuthentication,
+        TokenAuthentication,
+        OAuth2Authentication,
+    )
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object(
+            kwargs["model_pk"], kwargs["username"], kwargs["title"]
+        )
+        if self.object.outputs_version() != "v1":
+            if self.object.status in ("PENDING", "STARTED"):
+                return Response(
+                    {"status": self.object.status}, status=status.HTTP_202_ACCEPTED
+                )
+            raise Http404("This simulation does not have any outputs to list.")
+
+        category = request.query_params.get("category")
+        manifest = []
+        for cat in ("renderable", "downloadable"):
+            if category is not None and category != cat:
+                continue
+            for output in self.object.outputs["outputs"][cat]["outputs"]:
+                item = dict(
+                    output,
+                    category=cat,
+                    url=request.build_absolute_uri(f"{output['id']}/"),
+                )
+                if cat == "renderable":
+                    item["screenshot"] = request.build_absolute_uri(
+                        f"/storage/screenshots/{output['id']}.png"
+                    )
+                manifest.append(item)
+
+        paginator = OutputsManifestPagination()
+        page = paginator.paginate_queryset(manifest, request, view=self)
+        return paginator.get_paginated_response(page)
+
+
+class OutputDataAPIView(GetOutputsObjectMixin, APIView):
+    """
+    Stream a single output in the same format as the outputs returned
+    by DetailAPIView. Only the requested output is read from storage.
+    """
+
+    model = Simulation
+    authentication_classes = (
+        SessionAuthentication,
+        BasicAuthentication,
+        TokenAuthentication,
+        OAuth2Authentication,
+    )
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object(
+            kwargs["model_pk"], kwargs["username"], kwargs["title"]
+        )
+        if self.object.outputs_version() != "v1":
+            raise Http404("This simulation does not have any outputs.")
+
+        output_id = kwargs["output_id"]
+        for category in self.object.outputs["outputs"].values():
+            output = next(
+                (output for output in category["outputs"] if output["id"] == output_id),
+                None,
+            )
+            if output is not None:
+                break
+        else:
+            raise Http404(f"Unable to find output with id {output_id}.")
+
+        # Outputs never change once they are written.
+        etag = f'"{output_id}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            chunks = storage.iter_output(
+                output_id, category["ziplocation"], output["filename"]
+            )
+            response = StreamingHttpResponse(
+                output_stream(output, chunks), content_type="application/json"
+            )
+        response["ETag"] = etag
+        patch_cache_control(response, private=True)
+        return response
+
+
 class ForkDetailAPIView(RequiresLoginPermissions, GetOutputsObjectMixin, APIView):
     model = Simulation
     authentication_classes = (
@@ -415,26 +591,7 @@ class OutputsAPIView(RecordOutputsMixin, APIView):
                 return Response(status=status.HTTP_401_UNAUTHORIZED)
             if sim.status == "PENDING":
                 self.record_outputs(sim, data)
-                if sim.notify_on_completion:
-                    try:
-                        host = f"https://{request.get_host()}"
-                        sim_url = f"{host}{sim.get_absolute_url()}"
-                        send_mail(
-                            f"{sim} has finished!",
-                            (
-                                f"Here's a link to your simulation:\n\n{sim_url}."
-                                f"\n\nPlease write back if you have any questions or feedback!"
-                            ),
-                            "notifications@compute.studio",
-                            [sim.owner.user.email],
-                            fail_silently=True,
-                        )
-                    # Http 401 exception if mail credentials are not set up.
-                    except Exception:
-                        import traceback
-
-                        traceback.print_exc()
-                        pass
+                self.sim_finished(sim)
                 if sim.status == "FAIL":
                     if self.request.is_secure():
                         protocol = "https"
@@ -454,7 +611,7 @@ class OutputsAPIView(RecordOutputsMixin, APIView):
             return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class MyInputsAPIView(APIView):
+class MyInputsAPIView(RecordOutputsMixin, APIView):
     authentication_classes = (
         ClusterAuthentication,
         ClientOAuth2Authentication,
@@ -482,7 +639,10 @@ class MyInputsAPIView(APIView):
                     inputs.save()
                     if inputs.status == "SUCCESS":
                         submit_sim = SubmitSim(inputs.sim, compute=Compute())
-                        submit_sim.submit()
+                        sim = submit_sim.submit()
+                        # Cached results are not sent back by the workers.
+                        if sim.is_cached:
+                            self.sim_finished(sim)
                 # failed run, exception was caught
                 else:
                     inputs.status = "FAIL"
@@ -534,6 +694,8 @@ class ModelConfigAPIView(APIView):
                 model_config.model_parameters = data["model_parameters"]
                 model_config.status = data["status"]
                 model_config.save()
+                invalidate_inputs_cache(model_config.project)
+                prewarm_later(prewarm_on_defaults, model_config)
             return Response(status=status.HTTP_200_OK)
         else:
             print("model config put error", ser.errors)
@@ -762,6 +924,105 @@ class FilterTitle:
         return super().filter_queryset(queryset)
 
 
+class SimsKeysetPagination(PageNumberPagination):
+    """
+    Paginate sims newest first with a cursor on (creation_date, pk) instead
+    of an offset. Each page is a range scan that starts where the previous
+    page ended, so deep pages cost the same as the first one. Requests
+    with an ordering parameter fall back to page numbers.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = not request.query_params.get("ordering")
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[2]
+        if reverse:
+            queryset = queryset.order_by("creation_date", "pk")
+        else:
+            queryset = queryset.order_by("-creation_date", "-pk")
+        if cursor is not None:
+            creation_date, pk, _ = cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(creation_date__gt=creation_date)
+                    | Q(creation_date=creation_date, pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(creation_date__lt=creation_date)
+                    | Q(creation_date=creation_date, pk__lt=pk)
+                )
+
+        results = list(queryset[: page_size + 1])
+        has_more = len(results) > page_size
+        self.page = results[:page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        return self.page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            creation_date, pk, reverse = json.loads(
+                b64decode(encoded.encode()).decode()
+            )
+            creation_date = parse_datetime(creation_date)
+            if creation_date is None:
+                raise ValueError()
+            return creation_date, int(pk), bool(reverse)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, sim, reverse):
+        cursor = [sim.creation_date.isoformat(), sim.pk, reverse]
+        encoded = b64encode(json.dumps(cursor).encode()).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        # Counting every matching sim would undo the savings of the cursor.
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+
 class SimsAPIView(FilterTitle, generics.ListAPIView):
     permission_classes = (StrictRequiresActive,)
     authentication_classes = (
@@ -778,6 +1039,23 @@ class SimsAPIView(FilterTitle, generics.ListAPIView):
     queryset = Simulation.objects.all()
     serializer_class = MiniSimulationSerializer
 
+    @cached_property
+    def permissions(self):
+        return PermissionResolver(self.request.user)
+
+    def filter_queryset(self, queryset):
+        return super().filter_queryset(queryset).for_list()
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        self.permissions.prefetch(page if page is not None else queryset)
+        return page
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["permissions"] = self.permissions
+        return context
+
 
 class UserSimsAPIView(SimsAPIView):
     def get_queryset(self):
@@ -786,6 +1064,7 @@ class UserSimsAPIView(SimsAPIView):
 
 class PublicSimsAPIView(SimsAPIView):
     permission_classes = (RequiresActive,)
+    pagination_class = SimsKeysetPagination
     queryset = Simulation.objects.public_sims()
 
     def get_queryset(self):
@@ -798,6 +1077,7 @@ class PublicSimsAPIView(SimsAPIView):
 
 class ProfileSimsAPIView(SimsAPIView):
     permission_classes = (RequiresActive,)
+    pagination_class = SimsKeysetPagination
     queryset = Simulation.objects.public_sims()
 
     def get_queryset(self):
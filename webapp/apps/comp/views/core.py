@@ -1,3 +1,6 @@
+import traceback
+
+from django.core.mail import send_mail
 from django.views.generic.base import View
 from django.shortcuts import get_object_or_404
 from django.http import Http404
@@ -10,6 +13,7 @@ from webapp.apps.users.permissions import RequiresActive, RequiresPayment
 from webapp.settings import USE_STRIPE
 from webapp.apps.billing.utils import has_payment_method
 from webapp.apps.users.models import is_profile_active, get_project_or_404
+from webapp.apps.comp.models import SimulationScreenshot
 
 
 class InputsMixin:
@@ -112,6 +116,32 @@ class RecordOutputsMixin:
                 sim.traceback = sim.traceback[:8000]
             sim.save()
 
+    def sim_finished(self, sim):
+        """
+        Index the outputs of a successful simulation and notify its owner
+        if they asked to be notified. This is used for simulations that
+        were run and for simulations that were created from cached results.
+        """
+        if sim.status == "SUCCESS":
+            SimulationScreenshot.objects.index(sim)
+        if sim.notify_on_completion:
+            try:
+                host = f"https://{self.request.get_host()}"
+                sim_url = f"{host}{sim.get_absolute_url()}"
+                send_mail(
+                    f"{sim} has finished!",
+                    (
+                        f"Here's a link to your simulation:\n\n{sim_url}."
+                        f"\n\nPlease write back if you have any questions or feedback!"
+                    ),
+                    "notifications@compute.studio",
+                    [sim.owner.user.email],
+                    fail_silently=True,
+                )
+            # Http 401 exception if mail credentials are not set up.
+            except Exception:
+                traceback.print_exc()
+
 
 class RequiresLoginPermissions:
     permission_classes = (IsAuthenticatedOrReadOnly & RequiresActive,)
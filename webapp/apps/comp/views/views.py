@@ -1,8 +1,5 @@
 import itertools
-from io import BytesIO
-from zipfile import ZipFile
 import json
-import os
 import re
 
 import requests
@@ -18,15 +15,14 @@ from django.urls import reverse
 from django.core.exceptions import PermissionDenied
 from django.core.mail import send_mail
 from django.utils.safestring import mark_safe
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-import fsspec as fs
-import cs_storage
-
 from webapp.settings import DEBUG, DEFAULT_VIZ_HOST
 
 from webapp.apps.billing.utils import has_payment_method
@@ -40,21 +36,25 @@ from webapp.apps.users.models import (
 )
 
 from webapp.apps.comp.constants import WEBAPP_VERSION
-from webapp.apps.comp import exceptions
+from webapp.apps.comp import exceptions, storage
 from webapp.apps.comp.models import Inputs, Simulation, PendingPermission
 from webapp.apps.comp.compute import Compute, JobFailError
 from webapp.apps.comp.ioutils import get_ioutils
 from webapp.apps.comp.tags import TAGS
 from webapp.apps.comp.exceptions import AppError, ValidationError
 from webapp.apps.comp.serializers import OutputsSerializer
+from webapp.apps.comp.streaming import slice_stream, streaming_download, zip_stream
 
 
 from .core import InputsMixin, GetOutputsObjectMixin
 
-BUCKET = os.environ.get("BUCKET")
 
 kubernetes_name_exp = re.compile("[^0-9a-zA-Z]")
 
+# Number of seconds that browsers may reuse a screenshot without
+# revalidating it.
+SCREENSHOT_MAX_AGE = 60 * 60
+
 
 class ModelPageView(InputsMixin, View):
     projects = Project.objects.all()
@@ -326,37 +326,40 @@ class OutputsDownloadView(GetOutputsObjectMixin, View):
         # option to download the raw JSON for testing purposes.
         if request.GET.get("raw_json", False):
             return self.render_json()
-        downloadables = list(
-            itertools.chain.from_iterable(
-                output["downloadable"] for output in self.object.outputs["outputs"]
-            )
-        )
-        downloadables += list(
-            itertools.chain.from_iterable(
-                output["downloadable"] for output in self.object.outputs["aggr_outputs"]
-            )
+        outputs = self.object.outputs
+
+        def files():
+            for output in itertools.chain(outputs["outputs"], outputs["aggr_outputs"]):
+                for downloadable in output["downloadable"]:
+                    yield downloadable["filename"], downloadable["text"]
+
+        def stream(start, end):
+            return slice_stream(zip_stream(files()), start, end)
+
+        # Outputs do not change once a simulation has finished.
+        etag = f'"{self.object.project.pk}-{self.object.model_pk}-v0"'
+        return streaming_download(
+            request,
+            stream,
+            etag,
+            self.object.zip_filename(),
+            # The zip is built twice for range requests: once to count
+            # its size and once to send the requested bytes.
+            size=lambda: sum(len(chunk) for chunk in zip_stream(files())),
         )
-        s = BytesIO()
-        z = ZipFile(s, mode="w")
-        for i in downloadables:
-            z.writestr(i["filename"], i["text"])
-        z.close()
-        resp = HttpResponse(s.getvalue(), content_type="application/zip")
-        resp[
-            "Content-Disposition"
-        ] = f"attachment; filename={self.object.zip_filename()}"
-        return resp
 
     def render_v1(self, request):
         if request.GET.get("raw_json", False):
             return self.render_json()
         zip_loc = self.object.outputs["outputs"]["downloadable"]["ziplocation"]
-        with fs.open(f"gcs://{BUCKET}/{zip_loc}", "rb",) as f:
-            resp = HttpResponse(f, content_type="application/zip")
-            resp[
-                "Content-Disposition"
-            ] = f"attachment; filename={self.object.zip_filename()}"
-            return resp
+        size, etag = storage.file_info(zip_loc)
+
+        def stream(start, end):
+            return storage.iter_file(zip_loc, start, end)
+
+        return streaming_download(
+            request, stream, etag, self.object.zip_filename(), size=size
+        )
 
     def render_json(self):
         raw_json = json.dumps(
@@ -382,12 +385,27 @@ class DataView(View):
             data_id = data_id[:-4]
 
         self.object = Simulation.objects.get_object_from_screenshot(
-            data_id, http_404_on_fail=True
+            data_id, user=request.user, http_404_on_fail=True
         )
 
         if not self.object.has_read_access(request.user):
             raise PermissionDenied()
 
-        pic = cs_storage.read_screenshot(kwargs["data_id"])
-
-        return HttpResponse(pic, content_type="image/png")
+        # Screenshots never change, so the output id is a strong ETag.
+        etag = f'"{data_id}"'
+        screenshot = self.object.screenshots.filter(output_id=data_id).first()
+        last_modified = (
+            screenshot.creation_date.timestamp() if screenshot is not None else None
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            pic = storage.read_screenshot(data_id)
+            response = HttpResponse(pic, content_type="image/png")
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        # Private sims' screenshots must not be stored by shared caches.
+        patch_cache_control(response, private=True, max_age=SCREENSHOT_MAX_AGE)
+        return response
@@ -12,6 +12,7 @@ import stripe
 import paramtools as pt
 
 from django import forms
+from django.core.cache import cache
 from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from django.utils.timezone import make_aware
@@ -30,9 +31,21 @@ from webapp.apps.billing.models import (
     SubscriptionItem,
     create_pro_billing_objects,
 )
-from webapp.apps.users.models import Profile, Project, Cluster, Tag, cryptkeeper
-from webapp.apps.comp.model_parameters import ModelParameters
+from webapp.apps.users.models import (
+    Profile,
+    Project,
+    Cluster,
+    Tag,
+    cryptkeeper,
+    local_project_access,
+)
+from webapp.apps.comp.model_parameters import (
+    ModelParameters,
+    compiled_parameters,
+    local_inputs_cache,
+)
 from webapp.apps.comp.models import Inputs, Simulation
+from webapp.apps.comp.storage import screenshots
 
 
 # # stripe.api_key = os.environ.get("STRIPE_SECRET")
@@ -116,6 +129,19 @@ def django_db_setup(django_db_setup, django_db_blocker):
                 Customer.get_or_construct(stripe_customer.id, u)
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Cached objects may refer to rows that were rolled back after a test.
+    """
+    yield
+    cache.clear()
+    local_inputs_cache.clear()
+    compiled_parameters.clear()
+    screenshots.clear()
+    local_project_access.clear()
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -303,7 +329,7 @@ def test_models(db, profile):
         run_cost=1,
         inputs=inputs,
         creation_date=make_aware(datetime.datetime(2019, 2, 1)),
-        model_pk=Simulation.objects.next_model_pk(project),
+        model_pk=Simulation.objects.reserve_model_pks(project)[0],
         is_public=False,
     )
     assert obj0
@@ -318,7 +344,7 @@ def test_models(db, profile):
         run_cost=1,
         inputs=inputs,
         creation_date=make_aware(datetime.datetime(2019, 1, 1)),
-        model_pk=Simulation.objects.next_model_pk(project),
+        model_pk=Simulation.objects.reserve_model_pks(project)[0],
         is_public=False,
     )
     assert obj1
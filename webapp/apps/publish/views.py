@@ -43,6 +43,8 @@ from webapp.apps.users.models import (
     projects_with_access,
 )
 from webapp.apps.users.permissions import StrictRequiresActive, RequiresActive
+from webapp.apps.comp.model_parameters import invalidate_inputs_cache
+from webapp.apps.comp.prewarm import prewarm_later, prewarm_on_promote
 
 from webapp.apps.users.serializers import (
     BuildSerializer,
@@ -227,7 +229,9 @@ class ProjectAPIView(generics.ListAPIView):
         return User.objects.get(username="cs-api-user")
 
     def get_queryset(self):
-        return projects_with_access(self.request.user)
+        return projects_with_access(
+            self.request.user, Project.objects.select_related("model_pk_counter")
+        )
 
     def post(self, request, *args, **kwargs):
         if request.user.is_authenticated:
@@ -323,6 +327,7 @@ class TagsAPIView(GetProjectMixin, APIView):
             )
             previous_tag = project.latest_tag
             project.latest_tag = tag
+            invalidate_inputs_cache(project)
 
             if previous_tag:
                 for deployment in project.deployments.filter(
@@ -340,6 +345,9 @@ class TagsAPIView(GetProjectMixin, APIView):
 
         project.save()
 
+        if data.get("latest_tag") is not None:
+            prewarm_later(prewarm_on_promote, project)
+
         return Response(
             {
                 "staging_tag": TagSerializer(instance=project.staging_tag).data,
@@ -371,7 +379,7 @@ class ModelsAPIView(generics.ListAPIView):
         BasicAuthentication,
         TokenAuthentication,
     )
-    queryset = Project.objects.all().order_by("-pk")
+    queryset = Project.objects.select_related("model_pk_counter").order_by("-pk")
     serializer_class = ProjectWithVersionSerializer
 
     def get_queryset(self):
@@ -385,7 +393,7 @@ class ProfileModelsAPIView(generics.ListAPIView):
         BasicAuthentication,
         TokenAuthentication,
     )
-    queryset = Project.objects.all().order_by("-pk")
+    queryset = Project.objects.select_related("model_pk_counter").order_by("-pk")
     serializer_class = ProjectWithVersionSerializer
 
     def get_queryset(self):
@@ -522,6 +530,8 @@ class TagPromoteView(APIView):
 
         build.project.latest_tag = build.tag
         build.project.save()
+        invalidate_inputs_cache(build.project)
+        prewarm_later(prewarm_on_promote, build.project)
 
         return Response(BuildSerializer(instance=build).data, status=status.HTTP_200_OK)
 
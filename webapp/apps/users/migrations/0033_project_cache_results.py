@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0032_auto_20211012_1335"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="cache_results",
+            field=models.BooleanField(default=True),
+        ),
+    ]
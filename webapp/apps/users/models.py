@@ -1,6 +1,6 @@
-from collections import defaultdict
 from datetime import timedelta, datetime
 import json
+import os
 import secrets
 import uuid
 
@@ -12,6 +12,7 @@ from django.db.models.functions import TruncMonth
 from django.db.models import F, Case, When, Sum, Max, Q, Count
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import EmailMessage, send_mail
 from django.urls import reverse
 from django.utils.functional import cached_property
@@ -28,7 +29,8 @@ from guardian.shortcuts import (
 )
 
 from webapp.apps.comp import actions
-from webapp.apps.comp.compute import SyncCompute, SyncProjects
+from webapp.apps.comp.cache import LRUCache
+from webapp.apps.comp.compute import SyncCompute, SyncProjects, get_session
 from webapp.apps.comp.models import Inputs, ANON_BEFORE
 from webapp.settings import (
     DEBUG,
@@ -121,36 +123,42 @@ class Profile(models.Model):
         return private_sims
 
     def recent_models(self, limit):
-        return [
-            Project.objects.get(pk=project["project"])
+        recent = [
+            project["project"]
             for project in self.sims.values("project")
             .annotate(recent_date=Max("creation_date"))
             .order_by("-recent_date")[:limit]
             if project["project"] is not None
         ]
+        projects = Project.objects.select_related("model_pk_counter").in_bulk(recent)
+        return [projects[pk] for pk in recent]
 
     def costs_breakdown(self, projects=None):
-        if projects is None:
-            projects = Project.objects.all()
-        agg = defaultdict(float)
-        for project in projects:
-            sims = (
-                self.sims.filter(sponsor=self) | self.sims.filter(sponsor__isnull=True)
-            ).filter(project=project)
-            res = (
-                sims.values(month=TruncMonth("creation_date"))
-                .annotate(
-                    effective=Case(
+        sims = self.sims.filter(
+            Q(sponsor=self) | Q(sponsor__isnull=True),
+            project__isnull=False,
+            is_cached=False,
+        )
+        if projects is not None:
+            sims = sims.filter(project__in=projects)
+        res = (
+            sims.order_by()
+            .values(month=TruncMonth("creation_date"))
+            .annotate(
+                effective__sum=Sum(
+                    Case(
                         When(run_cost=0.0, then=0.01),
                         default=F("run_cost"),
                         output_field=models.FloatField(),
                     )
                 )
-                .annotate(Sum("effective"))
             )
-            for month in res:
-                agg[month["month"]] += float(month["effective__sum"])
-        return {k.strftime("%B %Y"): v for k, v in sorted(agg.items())}
+            .order_by("month")
+        )
+        return {
+            month["month"].strftime("%B %Y"): float(month["effective__sum"])
+            for month in res
+        }
 
     def can_run(self, project):
         if not self.is_active:
@@ -220,7 +228,7 @@ class Cluster(models.Model):
         )
         print("token is missing", missing_token, "token is expired", is_expired)
         if missing_token or is_expired:
-            resp = requests.post(
+            resp = self.session.post(
                 f"{self.url}/api/v1/login/access-token",
                 data={
                     "username": str(self.service_account),
@@ -237,6 +245,11 @@ class Cluster(models.Model):
             self.save()
             self.refresh_from_db()
 
+    @property
+    def session(self):
+        """Pooled, keep-alive session shared by all requests to this cluster."""
+        return get_session(self.url)
+
     def headers(self):
         if self.version == "v0":
             jwt_token = jwt.encode(
@@ -296,12 +309,7 @@ def get_project_or_404(queryset, user=None, raise_http404=True, **kwargs):
         if user is None:
             return queryset.objects.get(is_public=True, **kwargs)
 
-        user_has_perms = get_objects_for_user(
-            user,
-            perms=["read_project", "write_project", "admin_project"],
-            klass=queryset,
-            any_perm=True,
-        )
+        user_has_perms = project_ids_with_perms(user)
 
         return queryset.get(Q(is_public=True) | Q(pk__in=user_has_perms), **kwargs)
 
@@ -323,12 +331,68 @@ def projects_with_perms(user, queryset=None):
     )
 
 
+# Number of users whose project ids are kept in each process.
+PROJECT_ACCESS_CACHE_SIZE = int(os.environ.get("PROJECT_ACCESS_CACHE_SIZE", 1024))
+PROJECT_ACCESS_CACHE_TIMEOUT = 60 * 60
+
+local_project_access = LRUCache(PROJECT_ACCESS_CACHE_SIZE)
+
+
+def project_access_generation(user):
+    """
+    Token that is part of the key of the user's cached project ids.
+    Changing it invalidates the entries in both tiers, including the local
+    tiers of other processes.
+    """
+    key = f"project-access-generation:{user.pk}"
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_project_access(user):
+    """
+    Invalidate the cached project ids for a user. This must be called
+    whenever the user's permissions on a project change.
+    """
+    cache.set(f"project-access-generation:{user.pk}", uuid.uuid4().hex, None)
+
+
+def project_ids_with_perms(user):
+    """
+    Ids of the projects that the user has a role on. These are cached in
+    process and in the shared cache, since they are needed by almost every
+    request and rarely change. Public projects are not included, because
+    everyone can access them regardless of their roles.
+
+    The ids are not cached if the cache is local to the process, since
+    revoking a role would not invalidate them in the other processes.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    if not settings.SHARED_CACHE:
+        return frozenset(projects_with_perms(user).values_list("pk", flat=True))
+
+    key = f"project-access:{user.pk}:{project_access_generation(user)}"
+    project_ids = local_project_access.get(key)
+    if project_ids is None:
+        project_ids = cache.get(key)
+        if project_ids is None:
+            project_ids = frozenset(
+                projects_with_perms(user).values_list("pk", flat=True)
+            )
+            cache.set(key, project_ids, PROJECT_ACCESS_CACHE_TIMEOUT)
+        local_project_access.set(key, project_ids)
+    return project_ids
+
+
 def projects_with_access(user, queryset=None):
     if queryset is None:
         queryset = Project.objects.all()
-    return queryset.filter(
-        Q(is_public=True) | Q(pk__in=projects_with_perms(user, queryset))
-    )
+    return queryset.filter(Q(is_public=True) | Q(pk__in=project_ids_with_perms(user)))
 
 
 class ProjectManager(models.Manager):
@@ -414,6 +478,10 @@ class Project(models.Model):
 
     listed = models.BooleanField(default=True)
 
+    # Reuse the outputs of finished sims with the same tag and inputs.
+    # Projects whose models are not deterministic should turn this off.
+    cache_results = models.BooleanField(default=True)
+
     cluster_type = models.CharField(default="single-core", max_length=32)
 
     latest_tag = models.ForeignKey(
@@ -529,10 +597,12 @@ class Project(models.Model):
         return mark_safe(markdown.markdown(self.description, extensions=["tables"]))
 
     def sim_count(self):
-        return self.sims.count()
+        counter = getattr(self, "model_pk_counter", None)
+        return counter.sim_count if counter is not None else 0
 
     def user_count(self):
-        return self.sims.distinct("owner__user").count()
+        counter = getattr(self, "model_pk_counter", None)
+        return counter.user_count if counter is not None else 0
 
     @cached_property
     def version(self):
@@ -612,28 +682,31 @@ class Project(models.Model):
         if self.is_public:
             return True
 
-        if not user or not user.is_authenticated:
-            return False
-        return user.has_perm(Project.READ[0], self) or self.has_write_access(user)
+        # Users with any role on the project have read access to it.
+        return self.pk in project_ids_with_perms(user)
 
     def remove_permissions(self, user):
         for permission in get_perms(user, self):
             remove_perm(permission, user, self)
+        invalidate_project_access(user)
 
     def grant_admin_permissions(self, user):
         self.remove_permissions(user)
         self.add_collaborator_test()
         assign_perm(Project.ADMIN[0], user, self)
+        invalidate_project_access(user)
 
     def grant_write_permissions(self, user):
         self.remove_permissions(user)
         self.add_collaborator_test()
         assign_perm(Project.WRITE[0], user, self)
+        invalidate_project_access(user)
 
     def grant_read_permissions(self, user):
         self.remove_permissions(user)
         self.add_collaborator_test()
         assign_perm(Project.READ[0], user, self)
+        invalidate_project_access(user)
 
     @transaction.atomic
     def assign_role(self, role, user):
@@ -656,6 +729,9 @@ class Project(models.Model):
             raise ValueError(
                 f"Received invalid role: {role}. Choices are read, write, or admin."
             )
+        # Requests that ran before this transaction commits may have cached
+        # the old project ids again.
+        transaction.on_commit(lambda: invalidate_project_access(user))
 
     def role(self, user):
         if not user or not user.is_authenticated:
@@ -720,7 +796,7 @@ class Build(models.Model):
 
     def start(self):
         cluster: Cluster = self.project.cluster
-        resp = requests.post(
+        resp = cluster.session.post(
             f"{cluster.url}{cluster.path_prefix}/builds/{self.project}/",
             json={},
             headers=cluster.headers(),
@@ -739,7 +815,7 @@ class Build(models.Model):
         cluster: Cluster = self.project.cluster
         if not force_reload and self.status in ("success", "failure"):
             return
-        resp = requests.get(
+        resp = cluster.session.get(
             f"{cluster.url}{cluster.path_prefix}/builds/{self.cluster_build_id}/",
             json={},
             headers=cluster.headers(),
@@ -892,7 +968,7 @@ class Deployment(models.Model):
             self.save()
 
         cluster: Cluster = self.project.cluster
-        resp = requests.post(
+        resp = cluster.session.post(
             f"{cluster.url}{cluster.path_prefix}/deployments/{self.project}/",
             json={"deployment_name": self.public_name, "tag": str(self.tag)},
             headers=cluster.headers(),
@@ -909,7 +985,7 @@ class Deployment(models.Model):
 
     def get_deployment(self):
         cluster: Cluster = self.project.cluster
-        resp = requests.get(
+        resp = cluster.session.get(
             f"{cluster.url}{cluster.path_prefix}/deployments/{self.project}/{self.public_name}/",
             headers=cluster.headers(),
         )
@@ -918,7 +994,7 @@ class Deployment(models.Model):
 
     def delete_deployment(self):
         cluster: Cluster = self.project.cluster
-        resp = requests.delete(
+        resp = cluster.session.delete(
             f"{cluster.url}{cluster.path_prefix}/deployments/{self.project}/{self.public_name}/",
             headers=cluster.headers(),
         )
@@ -41,6 +41,7 @@ class ProjectSerializer(serializers.ModelSerializer):
     social_image_link = serializers.URLField(required=False)
     embed_background_color = serializers.CharField(required=False)
     use_iframe_resizer = serializers.BooleanField(required=False)
+    cache_results = serializers.BooleanField(required=False)
 
     # see to_representation
     # has_write_access = serializers.BooleanField(source="has_write_access")
@@ -93,6 +94,7 @@ class ProjectSerializer(serializers.ModelSerializer):
             "social_image_link",
             "embed_background_color",
             "use_iframe_resizer",
+            "cache_results",
         )
         read_only = (
             "sim_count",
@@ -112,6 +114,7 @@ class ProjectWithVersionSerializer(serializers.ModelSerializer):
     social_image_link = serializers.URLField(required=False)
     embed_background_color = serializers.CharField(required=False)
     use_iframe_resizer = serializers.BooleanField(required=False)
+    cache_results = serializers.BooleanField(required=False)
 
     # see to_representation
     # has_write_access = serializers.BooleanField(source="has_write_access")
@@ -155,6 +158,7 @@ class ProjectWithVersionSerializer(serializers.ModelSerializer):
             "social_image_link",
             "embed_background_color",
             "use_iframe_resizer",
+            "cache_results",
         )
         read_only = ("sim_count", "status", "user_count", "version", "latest_tag")
 
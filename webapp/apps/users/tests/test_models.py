@@ -3,10 +3,13 @@ import datetime
 import pytest
 
 from django.contrib.auth import get_user_model
+from django.core.cache.backends.locmem import LocMemCache
 from guardian.shortcuts import assign_perm, remove_perm, get_perms, get_users_with_perms
 
 
 from webapp.apps.billing.models import Customer
+from webapp.apps.comp.cache import LRUCache
+from webapp.apps.users import models as users_models
 from webapp.apps.users.models import (
     Profile,
     Project,
@@ -14,6 +17,9 @@ from webapp.apps.users.models import (
     Deployment,
     DeploymentException,
     EmbedApproval,
+    local_project_access,
+    project_ids_with_perms,
+    projects_with_access,
 )
 from webapp.apps.users.exceptions import PrivateAppException
 from webapp.apps.users.tests.utils import gen_collabs, replace_owner
@@ -235,6 +241,69 @@ class TestProjectPermissionse:
             project.assign_role("dne", collab.user)
 
 
+def test_project_ids_with_perms(
+    db, project, pro_profile, django_assert_num_queries, settings
+):
+    settings.SHARED_CACHE = True
+    collab = next(gen_collabs(1))
+    project.is_public = False
+    project.save()
+    replace_owner(project, pro_profile)
+
+    assert project_ids_with_perms(None) == frozenset()
+    assert project.pk in project_ids_with_perms(pro_profile.user)
+    assert project.pk not in project_ids_with_perms(collab.user)
+    # Cached ids are read without querying the database.
+    with django_assert_num_queries(0):
+        assert not project.has_read_access(collab.user)
+        assert project.pk in project_ids_with_perms(pro_profile.user)
+
+    project.assign_role("read", collab.user)
+    assert project.pk in project_ids_with_perms(collab.user)
+    assert project in projects_with_access(collab.user)
+
+    # Other processes see the change through the shared cache.
+    local_project_access.clear()
+    project.assign_role(None, collab.user)
+    assert project.pk not in project_ids_with_perms(collab.user)
+    assert project not in projects_with_access(collab.user)
+
+
+@pytest.mark.parametrize("shared", [True, False])
+def test_project_access_revoked_in_other_process(
+    db, project, pro_profile, settings, monkeypatch, shared
+):
+    """
+    Revoking a role in one process takes effect in the others. Each process
+    has its own local tier, and its own cache unless the cache is shared.
+    """
+    settings.SHARED_CACHE = shared
+    processes = [
+        (LocMemCache("shared" if shared else name, {}), LRUCache(10))
+        for name in ["a", "b"]
+    ]
+
+    def use(process):
+        cache, local = process
+        monkeypatch.setattr(users_models, "cache", cache)
+        monkeypatch.setattr(users_models, "local_project_access", local)
+
+    collab = next(gen_collabs(1))
+    project.is_public = False
+    project.save()
+    replace_owner(project, pro_profile)
+    project.assign_role("read", collab.user)
+
+    for process in processes:
+        use(process)
+        assert project.pk in project_ids_with_perms(collab.user)
+
+    use(processes[1])
+    project.assign_role(None, collab.user)
+    use(processes[0])
+    assert project.pk not in project_ids_with_perms(collab.user)
+
+
 class TestDeployments:
     def test_create_deployment_with_ea(self, db, profile, mock_post_to_cluster):
         project = Project.objects.get(title="Test-Viz")
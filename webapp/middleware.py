@@ -0,0 +1,14 @@
+from django.middleware.gzip import GZipMiddleware as BaseGZipMiddleware
+
+
+class GZipMiddleware(BaseGZipMiddleware):
+    """
+    GZipMiddleware that does not compress responses that support byte
+    ranges. The ranges refer to the uncompressed content, so compressing
+    them would break resumed downloads.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header("Accept-Ranges"):
+            return response
+        return super().process_response(request, response)
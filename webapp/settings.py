@@ -112,7 +112,7 @@ OAUTH2_PROVIDER = {
 MIDDLEWARE = [
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.middleware.gzip.GZipMiddleware",
+    "webapp.middleware.GZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -164,12 +164,27 @@ def default_db_url():
         "PORT": "5432",
     }
 
+
 DATABASES = {
     "default": default_db_url(),
     # override database name for tests.
     "TEST": dict(default_db_url(), **{"NAME": "testdb",}),
 }
 
+# Shared cache for model configs and other expensive lookups. The local
+# memory cache is used if Redis is not configured. Values that must be
+# invalidated across processes are only cached if the cache is shared.
+REDIS_URL = os.environ.get("REDIS_URL")
+SHARED_CACHE = bool(REDIS_URL)
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": REDIS_URL,
+            "OPTIONS": {"CLIENT_CLASS": "django_redis.client.DefaultClient"},
+        }
+    }
+
 AUTHENTICATION_BACKENDS = (
     "django.contrib.auth.backends.ModelBackend",  # default
     "guardian.backends.ObjectPermissionBackend",
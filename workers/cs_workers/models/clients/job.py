@@ -15,6 +15,10 @@ redis_conn = dict(
     **redis_conn_from_env(),
 )
 
+# Jobs upload their outputs directly to this storage url, e.g. gcs://bucket,
+# if it is set. Otherwise, outputs are sent through the callback url.
+STORAGE_URL = os.environ.get("STORAGE_URL")
+
 
 class Job:
     def __init__(
@@ -58,6 +62,8 @@ class Job:
             kclient.V1EnvVar("TITLE", title),
             kclient.V1EnvVar("EXP_TASK_TIME", str(config["exp_task_time"])),
         ]
+        if STORAGE_URL:
+            envs.append(kclient.V1EnvVar("STORAGE_URL", STORAGE_URL))
         # for sec in [
         #     "BUCKET",
         #     "REDIS_HOST",
@@ -0,0 +1,263 @@
+import hashlib
+import os
+import sys
+import time
+
+import redis
+import yaml
+from rq import Queue
+
+from kubernetes import client as kclient, config as kconfig
+
+from cs_workers.utils import clean
+from cs_workers.models.secrets import ModelSecrets
+
+# Short tasks that are run by a project's worker pool instead of a Job.
+POOL_ROUTES = ("version", "defaults", "parse")
+# Pools that have not received a task for this many seconds are scaled to zero.
+POOL_IDLE_TIMEOUT = int(os.environ.get("POOL_IDLE_TIMEOUT", 15 * 60))
+# Max number of seconds that a pool task may run.
+POOL_TASK_TIMEOUT = int(os.environ.get("POOL_TASK_TIMEOUT", 10 * 60))
+# Extra seconds before rq's own timeout so that a task that times out can
+# report its failure. rq's timeout cannot stop the task's thread.
+POOL_TASK_TIMEOUT_GRACE = 180
+# Number of seconds that a pool is assumed to be running after it is checked.
+POOL_WARM_TTL = 60
+
+POOL_LABEL = "cs-pool"
+
+
+def pool_name(owner, title, tag):
+    """
+    Name of the deployment and queue for a project's tag. Tags are hashed
+    since they may contain characters that are not allowed in k8s names.
+    """
+    digest = hashlib.sha1(str(tag).encode()).hexdigest()[:8]
+    return f"{clean(owner)}-{clean(title)}"[:40] + f"-pool-{digest}"
+
+
+def warm_key(name):
+    return f"pool-warm:{name}"
+
+
+def last_used_key(name):
+    return f"pool-last-used:{name}"
+
+
+def redis_from_env():
+    return redis.Redis(
+        host=os.environ.get("REDIS_HOST"),
+        port=os.environ.get("REDIS_PORT"),
+        password=os.environ.get("REDIS_PASSWORD"),
+    )
+
+
+class Pool:
+    """
+    Long-lived workers for a project's tag that pull short tasks from an
+    RQ queue. The deployment is created on the first task and is scaled
+    back up after scale_idle_pools scales it to zero.
+    """
+
+    def __init__(
+        self,
+        project,
+        owner,
+        title,
+        tag,
+        model_config,
+        redis_host,
+        redis_port,
+        cr="gcr.io",
+        incluster=True,
+        rclient=None,
+        quiet=True,
+        namespace="default",
+    ):
+        self.project = project
+        self.owner = owner
+        self.title = title
+        self.tag = tag
+        self.model_config = model_config
+        self.redis_host = redis_host
+        self.redis_port = redis_port
+        self.cr = cr
+        self.quiet = quiet
+        self.namespace = namespace
+        self.name = pool_name(owner, title, tag)
+
+        self.incluster = incluster
+        if rclient is None:
+            self.rclient = redis_from_env()
+        else:
+            self.rclient = rclient
+        if self.incluster:
+            kconfig.load_incluster_config()
+        else:
+            kconfig.load_kube_config()
+        self.deployment_api_client = kclient.AppsV1Api()
+        self.queue = Queue(self.name, connection=self.rclient)
+
+    def env(self, owner, title, config):
+        safeowner = clean(owner)
+        safetitle = clean(title)
+        envs = [
+            kclient.V1EnvVar("OWNER", owner),
+            kclient.V1EnvVar("TITLE", title),
+            kclient.V1EnvVar("EXP_TASK_TIME", str(config["exp_task_time"])),
+            kclient.V1EnvVar("REDIS_HOST", self.redis_host),
+            kclient.V1EnvVar("REDIS_PORT", str(self.redis_port)),
+            kclient.V1EnvVar(
+                name="REDIS_PASSWORD",
+                value_from=kclient.V1EnvVarSource(
+                    secret_key_ref=(
+                        kclient.V1SecretKeySelector(
+                            key="PASSWORD", name="workers-redis-secret"
+                        )
+                    )
+                ),
+            ),
+        ]
+
+        for secret in ModelSecrets(
+            owner=owner, title=title, project=self.project
+        ).list():
+            envs.append(
+                kclient.V1EnvVar(
+                    name=secret,
+                    value_from=kclient.V1EnvVarSource(
+                        secret_key_ref=(
+                            kclient.V1SecretKeySelector(
+                                key=secret, name=f"{safeowner}-{safetitle}-secret"
+                            )
+                        )
+                    ),
+                )
+            )
+        return envs
+
+    def configure(self):
+        config = self.model_config
+        safeowner = clean(self.owner)
+        safetitle = clean(self.title)
+        labels = {"app": self.name, POOL_LABEL: "true"}
+
+        container = kclient.V1Container(
+            name=self.name,
+            image=f"{self.cr}/{self.project}/{safeowner}_{safetitle}_tasks:{self.tag}",
+            command=["cs-jobs", "serve", "--queue", self.name],
+            env=self.env(self.owner, self.title, config),
+            resources=kclient.V1ResourceRequirements(**config["resources"]),
+        )
+        template = kclient.V1PodTemplateSpec(
+            metadata=kclient.V1ObjectMeta(labels=labels),
+            spec=kclient.V1PodSpec(
+                restart_policy="Always",
+                containers=[container],
+                node_selector={"component": "model"},
+            ),
+        )
+        spec = kclient.V1DeploymentSpec(
+            template=template,
+            selector=kclient.V1LabelSelector(match_labels={"app": self.name}),
+            replicas=1,
+        )
+        deployment = kclient.V1Deployment(
+            api_version="apps/v1",
+            kind="Deployment",
+            metadata=kclient.V1ObjectMeta(name=self.name, labels=labels),
+            spec=spec,
+        )
+
+        if not self.quiet:
+            sys.stdout.write(yaml.dump(deployment.to_dict()))
+
+        return deployment
+
+    def deployment_from_cluster(self):
+        try:
+            return self.deployment_api_client.read_namespaced_deployment(
+                self.name, self.namespace
+            )
+        except kclient.rest.ApiException as e:
+            if e.reason != "Not Found":
+                raise e
+        return None
+
+    def ensure_running(self):
+        """
+        Create the pool's deployment or scale it back up. The check is
+        skipped while the pool is known to be running so that the k8s
+        api is not hit for every task.
+        """
+        if self.rclient.get(warm_key(self.name)):
+            return
+        deployment = self.deployment_from_cluster()
+        if deployment is None:
+            print("creating pool", self.name)
+            self.deployment_api_client.create_namespaced_deployment(
+                namespace=self.namespace, body=self.configure()
+            )
+        elif not deployment.spec.replicas:
+            print("scaling up pool", self.name)
+            scale(self.deployment_api_client, self.name, self.namespace, 1)
+        self.rclient.set(warm_key(self.name), 1, ex=POOL_WARM_TTL)
+
+    def enqueue(self, job_id, callback_url, route_name):
+        self.ensure_running()
+        self.queue.enqueue(
+            "cs_jobs.job.run_task",
+            callback_url,
+            route_name,
+            task_timeout=POOL_TASK_TIMEOUT,
+            job_id=str(job_id),
+            job_timeout=POOL_TASK_TIMEOUT + POOL_TASK_TIMEOUT_GRACE,
+            result_ttl=0,
+        )
+        self.rclient.set(last_used_key(self.name), time.time())
+
+
+def scale(deployment_api_client, name, namespace, replicas):
+    return deployment_api_client.patch_namespaced_deployment_scale(
+        name, namespace, {"spec": {"replicas": replicas}}
+    )
+
+
+def scale_idle_pools(
+    namespace, idle_timeout=POOL_IDLE_TIMEOUT, rclient=None, incluster=True
+):
+    """
+    Scale pools that have not received a task within idle_timeout seconds
+    to zero. Pools that were scaled to zero with tasks still in their queue
+    are scaled back up.
+    """
+    if rclient is None:
+        rclient = redis_from_env()
+    if incluster:
+        kconfig.load_incluster_config()
+    else:
+        kconfig.load_kube_config()
+    deployment_api_client = kclient.AppsV1Api()
+
+    now = time.time()
+    deployments = deployment_api_client.list_namespaced_deployment(
+        namespace, label_selector=f"{POOL_LABEL}=true"
+    )
+    scaled = []
+    for deployment in deployments.items:
+        name = deployment.metadata.name
+        replicas = deployment.spec.replicas or 0
+        # New tasks check the deployment again once the warm key is gone.
+        if replicas > 0:
+            rclient.delete(warm_key(name))
+
+        pending = len(Queue(name, connection=rclient))
+        last_used = float(rclient.get(last_used_key(name)) or 0)
+        if replicas == 0 and pending:
+            print("scaling up pool with pending tasks", name)
+            scale(deployment_api_client, name, namespace, 1)
+        elif replicas > 0 and not pending and now - last_used > idle_timeout:
+            print("scaling down idle pool", name)
+            scale(deployment_api_client, name, namespace, 0)
+            scaled.append(name)
+    return scaled
@@ -52,9 +52,13 @@ class Job(Base):
     name = Column(String)
     created_at = Column(DateTime)
     finished_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
     status = Column(String)
     inputs = Column(JSON)
-    outputs = Column(JSON)
+    # Outputs that are dropped are stored as NULL rather than as JSON null
+    # so that compaction can tell which jobs still have outputs.
+    outputs = Column(JSON(none_as_null=True))
+    manifest = Column(JSON)
     tag = Column(String)
 
     user = relationship("User", back_populates="jobs")
@@ -1,11 +1,12 @@
 from datetime import datetime
 import os
+from typing import List
 
 import httpx
-from fastapi import APIRouter, Depends, Body, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Body, HTTPException
 from sqlalchemy.orm import Session
 
-from cs_workers.models.clients import job
+from cs_workers.models.clients import job, pool
 from .. import utils, models, schemas, dependencies as deps, security, settings
 
 incluster = os.environ.get("KUBERNETES_SERVICE_HOST", False) is not False
@@ -42,6 +43,29 @@ def job_callback(
     return instance
 
 
+@router.post("/callback/{job_id}/heartbeat/", status_code=200)
+def job_heartbeat(
+    job_id: str,
+    heartbeat: schemas.TaskHeartbeat = Body(...),
+    db: Session = Depends(deps.get_db),
+):
+    instance = db.query(models.Job).filter(models.Job.id == job_id).one_or_none()
+    if instance is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    if instance.finished_at:
+        raise HTTPException(status_code=400, detail="Job already marked as complete.")
+
+    print("heartbeat", job_id, heartbeat.task_name, heartbeat.elapsed)
+    instance.heartbeat_at = datetime.utcnow()
+    if instance.status == "CREATED":
+        instance.status = "RUNNING"
+    db.add(instance)
+    db.commit()
+
+    return {"status": instance.status}
+
+
 @router.post("/callback/{job_id}/", status_code=201, response_model=schemas.Job)
 async def finish_job(
     job_id: str,
@@ -56,7 +80,16 @@ async def finish_job(
     if instance.finished_at:
         raise HTTPException(status_code=400, detail="Job already marked as complete.")
 
-    instance.outputs = task.outputs
+    instance.manifest = utils.outputs_manifest(
+        job_id,
+        task.task_name,
+        task.status,
+        task.outputs,
+        manifest=task.manifest,
+        bucket=settings.settings.BUCKET,
+    )
+    if settings.settings.JOB_OUTPUTS_RETENTION == "full":
+        instance.outputs = task.outputs
     instance.status = task.status
     instance.finished_at = datetime.utcnow()
 
@@ -81,16 +114,7 @@ async def finish_job(
     return instance
 
 
-@router.post("/{owner}/{title}/", response_model=schemas.Job, status_code=201)
-def create_job(
-    owner: str,
-    title: str,
-    task: schemas.Task = Body(...),
-    db: Session = Depends(deps.get_db),
-    user: schemas.User = Depends(deps.get_current_active_user),
-):
-    print(owner, title)
-    print(task.task_kwargs)
+def get_project(db: Session, owner: str, title: str, user: schemas.User):
     project = (
         db.query(models.Project)
         .filter(
@@ -104,27 +128,24 @@ def create_job(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
 
-    task_name, _, task_kwargs, tag = (
-        task.task_name,
-        task.task_id,
-        task.task_kwargs,
-        task.tag,
-    )
+    return project
+
 
-    instance = models.Job(
+def new_job(task: schemas.Task, user: schemas.User):
+    return models.Job(
         user_id=user.id,
-        name=task_name,
+        name=task.task_name,
         created_at=datetime.utcnow(),
         finished_at=None,
-        inputs=task_kwargs,
-        tag=tag,
+        inputs=task.task_kwargs,
+        tag=task.tag,
         status="CREATED",
     )
-    db.add(instance)
-    db.commit()
-    db.refresh(instance)
 
-    project_data = schemas.Project.from_orm(project).dict()
+
+def launch_job(project_data: dict, owner: str, title: str, instance: models.Job):
+    project_data = dict(project_data)
+    task_name = instance.name
 
     # Use lower memory target for these tasks.
     if task_name in ("version", "defaults", "parse",):
@@ -141,15 +162,34 @@ def create_job(
         url = f"http://api.{settings.settings.NAMESPACE}.svc.cluster.local"
 
     url += settings.settings.API_PREFIX_STR
+    callback_url = f"{url}/jobs/callback/{instance.id}/"
+
+    if settings.settings.WORKER_POOLS and task_name in pool.POOL_ROUTES:
+        client = pool.Pool(
+            PROJECT,
+            owner,
+            title,
+            tag=instance.tag,
+            model_config=project_data,
+            redis_host=(
+                f"{settings.settings.REDIS_HOST}."
+                f"{settings.settings.NAMESPACE}.svc.cluster.local"
+            ),
+            redis_port=settings.settings.REDIS_PORT,
+            incluster=incluster,
+            namespace=settings.settings.PROJECT_NAMESPACE,
+        )
+        client.enqueue(instance.id, callback_url, task_name)
+        return
 
     client = job.Job(
         PROJECT,
         owner,
         title,
-        tag=tag,
+        tag=instance.tag,
         model_config=project_data,
         job_id=instance.id,
-        callback_url=f"{url}/jobs/callback/{instance.id}/",
+        callback_url=callback_url,
         route_name=task_name,
         incluster=incluster,
         namespace=settings.settings.PROJECT_NAMESPACE,
@@ -157,4 +197,57 @@ def create_job(
 
     client.create()
 
+
+@router.post("/{owner}/{title}/", response_model=schemas.Job, status_code=201)
+def create_job(
+    owner: str,
+    title: str,
+    task: schemas.Task = Body(...),
+    db: Session = Depends(deps.get_db),
+    user: schemas.User = Depends(deps.get_current_active_user),
+):
+    print(owner, title)
+    print(task.task_kwargs)
+    project = get_project(db, owner, title, user)
+
+    instance = new_job(task, user)
+    db.add(instance)
+    db.commit()
+    db.refresh(instance)
+
+    project_data = schemas.Project.from_orm(project).dict()
+    launch_job(project_data, owner, title, instance)
+
     return instance
+
+
+@router.post(
+    "/{owner}/{title}/batch/", response_model=List[schemas.Job], status_code=201
+)
+def create_jobs(
+    owner: str,
+    title: str,
+    background_tasks: BackgroundTasks,
+    tasks: List[schemas.Task] = Body(...),
+    db: Session = Depends(deps.get_db),
+    user: schemas.User = Depends(deps.get_current_active_user),
+):
+    """
+    Create a batch of jobs with a single request. The jobs are saved in
+    one transaction and launched after the response is sent so that the
+    caller does not time out (and retry) while the k8s jobs are created.
+    """
+    print(owner, title, f"batch of {len(tasks)}")
+    project = get_project(db, owner, title, user)
+
+    instances = [new_job(task, user) for task in tasks]
+    db.add_all(instances)
+    db.commit()
+    for instance in instances:
+        db.refresh(instance)
+
+    project_data = schemas.Project.from_orm(project).dict()
+    for instance in instances:
+        background_tasks.add_task(launch_job, project_data, owner, title, instance)
+
+    return instances
@@ -18,9 +18,11 @@ class JobBase(BaseModel):
     name: str
     created_at: datetime
     finished_at: Optional[datetime]
+    heartbeat_at: Optional[datetime]
     status: str
     inputs: Optional[Dict]
     outputs: Optional[Dict]
+    manifest: Optional[Dict]
     traceback: Optional[str]
     tag: str
 
@@ -39,6 +41,8 @@ class Job(JobBase):
 class TaskComplete(BaseModel):
     model_version: Optional[str]
     outputs: Optional[Dict]
+    # Location, size, and checksum of outputs that were uploaded by the job.
+    manifest: Optional[Dict]
     traceback: Optional[str]
     version: Optional[str]
     meta: Dict  # Dict[str, str]
@@ -46,6 +50,11 @@ class TaskComplete(BaseModel):
     task_name: str
 
 
+class TaskHeartbeat(BaseModel):
+    task_name: str
+    elapsed: float
+
+
 class Task(BaseModel):
     task_id: Optional[str]
     task_name: str
@@ -0,0 +1,64 @@
+import argparse
+from datetime import datetime, timedelta
+
+from cs_workers.services.api.database import SessionLocal
+from cs_workers.services.api.models import Job
+from cs_workers.services.api.settings import settings
+from cs_workers.services.api.utils import outputs_manifest
+
+
+def compact_job_outputs(db, finished_before, batch_size=100):
+    """
+    Replace the outputs of jobs that finished before finished_before with
+    their manifest. Jobs are loaded and committed in batches so that only
+    a batch of outputs is held in memory.
+    """
+    compacted = 0
+    while True:
+        jobs = (
+            db.query(Job)
+            .filter(Job.finished_at < finished_before, Job.outputs.isnot(None))
+            .order_by(Job.finished_at)
+            .limit(batch_size)
+            .all()
+        )
+        if not jobs:
+            return compacted
+        for job in jobs:
+            job.manifest = outputs_manifest(
+                job.id,
+                job.name,
+                job.status,
+                job.outputs,
+                manifest=job.manifest,
+                bucket=settings.BUCKET,
+            )
+            job.outputs = None
+        db.commit()
+        compacted += len(jobs)
+        print(f"Compacted {compacted} jobs.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replace the outputs of old jobs with their manifest."
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=7,
+        help="Compact jobs that finished more than this many days ago.",
+    )
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        compacted = compact_job_outputs(
+            session,
+            datetime.utcnow() - timedelta(days=args.days),
+            batch_size=args.batch_size,
+        )
+    finally:
+        session.close()
+    print(f"Compacted outputs of {compacted} jobs.")
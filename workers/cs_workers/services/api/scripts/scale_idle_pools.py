@@ -0,0 +1,16 @@
+import argparse
+
+from cs_workers.models.clients.pool import POOL_IDLE_TIMEOUT, scale_idle_pools
+from cs_workers.services.api.settings import settings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Scale worker pools that have not been used recently to zero."
+    )
+    parser.add_argument("--idle-timeout", type=int, default=POOL_IDLE_TIMEOUT)
+    args = parser.parse_args()
+
+    scaled = scale_idle_pools(
+        settings.PROJECT_NAMESPACE, idle_timeout=args.idle_timeout
+    )
+    print(f"Scaled {len(scaled)} idle pools to zero.")
@@ -49,6 +49,22 @@ class Settings(BaseSettings):
         else:
             return "workers"
 
+    # Run short tasks on warm per-project worker pools instead of Jobs.
+    WORKER_POOLS: bool = False
+    REDIS_HOST: str = "redis-master"
+    REDIS_PORT: str = "6379"
+
+    # "full" keeps job outputs in the jobs table. "manifest" only keeps a
+    # pointer to them with their size and checksum.
+    JOB_OUTPUTS_RETENTION: str = "full"
+    BUCKET: Optional[str]
+
+    @validator("JOB_OUTPUTS_RETENTION")
+    def check_job_outputs_retention(cls, v: str) -> str:
+        if v not in ("full", "manifest"):
+            raise ValueError(f"Unknown retention mode: {v}")
+        return v
+
     PROJECT_NAME: str = "C/S Cluster Api"
     SENTRY_DSN: Optional[HttpUrl] = None
 
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import math
 
 
@@ -9,3 +11,26 @@ def set_resource_requirements(project_data):
             "requests": {"memory": f"{mem}G", "cpu": cpu},
             "limits": {"memory": f"{math.ceil(mem * 1.2)}G", "cpu": cpu,},
         }
+
+
+def outputs_manifest(job_id, task_name, status, outputs, manifest=None, bucket=None):
+    """
+    Pointer to a job's outputs that is stored instead of the outputs. Jobs
+    that uploaded their outputs send their own manifest. Otherwise, the
+    size and checksum of the outputs are recorded along with the location
+    that the outputs processor writes sim outputs to.
+    """
+    if manifest is not None:
+        return manifest
+    data = json.dumps(outputs, sort_keys=True).encode()
+    manifest = {
+        "size": len(data),
+        "checksum": f"sha256:{hashlib.sha256(data).hexdigest()}",
+    }
+    if task_name == "sim" and status == "SUCCESS" and bucket:
+        manifest["storage_url"] = f"gcs://{bucket}"
+        manifest["files"] = [
+            {"location": f"{job_id}_{category}.zip"}
+            for category in ("renderable", "downloadable")
+        ]
+    return manifest
@@ -44,12 +44,34 @@ def write(task_id, outputs):
     return res
 
 
+def write_screenshots(rem_result, manifest):
+    """
+    Take screenshots of the renderable outputs that were uploaded by the job.
+    Failures are logged like in cs_storage.write_pic so that the outputs are
+    still sent to the webapp.
+    """
+    if not cs_storage.SCREENSHOT_ENABLED:
+        return
+    # cs_storage.read only reads from the default bucket.
+    if manifest["storage_url"].rstrip("/") != f"gcs://{cs_storage.BUCKET}":
+        print("skipping screenshots for outputs in", manifest["storage_url"])
+        return
+    try:
+        outputs = cs_storage.read({"renderable": rem_result["renderable"]})
+        for output in outputs["renderable"]:
+            cs_storage.write_pic(cs_storage.fs, output)
+    except Exception as e:
+        print("failed to create screenshots:", e)
+
+
 def push(job_id: str, result: Result):
     resp = None
     if result.task.task_name == "sim":
         print(f"posting data to {result.url}/outputs/api/")
-        if result.task.status == "SUCCESS":
+        if result.task.status == "SUCCESS" and result.task.manifest is None:
             result.task.outputs = write(job_id, result.task.outputs)
+        elif result.task.status == "SUCCESS":
+            write_screenshots(result.task.outputs, result.task.manifest)
         resp = httpx.put(
             f"{result.url}/outputs/api/",
             json=dict(job_id=job_id, **result.task.dict()),
@@ -0,0 +1,87 @@
+import cs_storage
+import pytest
+
+from cs_workers.services import outputs_processor
+from cs_workers.services.api.schemas import TaskComplete
+
+
+class MockResponse:
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def puts(monkeypatch):
+    puts = []
+
+    def put(url, json, headers):
+        puts.append((url, json))
+        return MockResponse()
+
+    monkeypatch.setattr(outputs_processor.httpx, "put", put)
+    return puts
+
+
+def sim_result(manifest):
+    rem_result = {
+        "renderable": {"ziplocation": "abc_renderable.zip", "outputs": []},
+        "downloadable": {"ziplocation": "abc_downloadable.zip", "outputs": []},
+    }
+    return outputs_processor.Result(
+        url="http://webapp",
+        headers={},
+        task=TaskComplete(
+            model_version="1.0.0",
+            outputs=rem_result,
+            manifest=manifest,
+            version="v1",
+            meta={"task_times": [1]},
+            status="SUCCESS",
+            task_name="sim",
+        ),
+    )
+
+
+def test_push_manifest(monkeypatch, puts):
+    def write(*args, **kwargs):
+        raise AssertionError("Outputs in a manifest are already uploaded.")
+
+    def read(*args, **kwargs):
+        raise Exception("Not found.")
+
+    monkeypatch.setattr(outputs_processor, "write", write)
+    monkeypatch.setattr(cs_storage, "SCREENSHOT_ENABLED", True)
+    monkeypatch.setattr(cs_storage, "BUCKET", "cs-outputs")
+    monkeypatch.setattr(cs_storage, "read", read)
+    manifest = {
+        "storage_url": "gcs://cs-outputs",
+        "files": [
+            {"location": "abc_renderable.zip", "size": 1, "checksum": "sha256:a"},
+            {"location": "abc_downloadable.zip", "size": 1, "checksum": "sha256:b"},
+        ],
+    }
+    result = sim_result(manifest)
+
+    # Screenshot failures do not keep the outputs from being sent.
+    outputs_processor.push("abc", result)
+
+    assert len(puts) == 1
+    url, data = puts[0]
+    assert url == "http://webapp/outputs/api/"
+    assert data["job_id"] == "abc"
+    assert data["outputs"] == result.task.outputs
+    assert data["manifest"] == manifest
+
+
+def test_write_screenshots_other_storage(monkeypatch):
+    def read(*args, **kwargs):
+        raise AssertionError("cs_storage.read only reads the default bucket.")
+
+    monkeypatch.setattr(cs_storage, "SCREENSHOT_ENABLED", True)
+    monkeypatch.setattr(cs_storage, "BUCKET", "cs-outputs")
+    monkeypatch.setattr(cs_storage, "read", read)
+    result = sim_result({"storage_url": "file:///tmp/cs-storage", "files": []})
+
+    outputs_processor.write_screenshots(result.task.outputs, result.task.manifest)
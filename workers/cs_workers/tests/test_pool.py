@@ -0,0 +1,134 @@
+import time
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from kubernetes import client as kclient
+from rq import Queue
+
+from cs_workers.models.clients import pool as pool_module
+from cs_workers.models.clients.pool import (
+    Pool,
+    last_used_key,
+    pool_name,
+    scale_idle_pools,
+    warm_key,
+)
+
+
+def deployment(name, replicas):
+    return SimpleNamespace(
+        metadata=SimpleNamespace(name=name), spec=SimpleNamespace(replicas=replicas)
+    )
+
+
+class FakeAppsV1Api:
+    def __init__(self):
+        self.deployments = {}
+        self.created = []
+        self.scaled = []
+
+    def read_namespaced_deployment(self, name, namespace):
+        if name not in self.deployments:
+            raise kclient.rest.ApiException(status=404, reason="Not Found")
+        return self.deployments[name]
+
+    def create_namespaced_deployment(self, namespace, body):
+        self.created.append(body.metadata.name)
+        self.deployments[body.metadata.name] = deployment(
+            body.metadata.name, body.spec.replicas
+        )
+
+    def list_namespaced_deployment(self, namespace, label_selector):
+        return SimpleNamespace(items=list(self.deployments.values()))
+
+    def patch_namespaced_deployment_scale(self, name, namespace, body):
+        replicas = body["spec"]["replicas"]
+        self.scaled.append((name, replicas))
+        self.deployments[name].spec.replicas = replicas
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = FakeAppsV1Api()
+    monkeypatch.setattr(pool_module.kconfig, "load_kube_config", lambda: None)
+    monkeypatch.setattr(pool_module.kclient, "AppsV1Api", lambda: api)
+    monkeypatch.setattr(pool_module.ModelSecrets, "list", lambda self: {})
+    return api
+
+
+@pytest.fixture
+def rclient():
+    return fakeredis.FakeStrictRedis()
+
+
+@pytest.fixture
+def pool(api, rclient):
+    return Pool(
+        project="cs-workers-dev",
+        owner="hdoupe",
+        title="Matchups",
+        tag="abc123",
+        model_config={
+            "exp_task_time": 10,
+            "resources": {"requests": {"memory": "1G", "cpu": 1}},
+        },
+        redis_host="redis-master",
+        redis_port=6379,
+        rclient=rclient,
+        incluster=False,
+    )
+
+
+def test_pool_name():
+    name = pool_name("hdoupe", "Matchups", "abc123")
+    assert name.startswith("hdoupe-matchups-pool-")
+    assert name != pool_name("hdoupe", "Matchups", "def456")
+
+
+def test_ensure_running_creates_deployment(pool, api, rclient):
+    pool.ensure_running()
+    assert api.created == [pool.name]
+    assert rclient.get(warm_key(pool.name))
+
+    # The deployment is not checked again while the pool is warm.
+    api.deployments.clear()
+    pool.ensure_running()
+    assert api.created == [pool.name]
+
+
+def test_ensure_running_scales_up(pool, api, rclient):
+    api.deployments[pool.name] = deployment(pool.name, 0)
+    pool.ensure_running()
+    assert api.created == []
+    assert api.scaled == [(pool.name, 1)]
+
+    rclient.delete(warm_key(pool.name))
+    pool.ensure_running()
+    assert api.scaled == [(pool.name, 1)]
+
+
+def test_scale_idle_pools(api, rclient):
+    now = time.time()
+    api.deployments = {
+        "idle": deployment("idle", 1),
+        "busy": deployment("busy", 1),
+        "pending": deployment("pending", 1),
+        "stopped": deployment("stopped", 0),
+        "stopped-pending": deployment("stopped-pending", 0),
+    }
+    rclient.set(last_used_key("idle"), now - 1000)
+    rclient.set(last_used_key("busy"), now - 10)
+    rclient.set(last_used_key("pending"), now - 1000)
+    rclient.set(last_used_key("stopped-pending"), now - 1000)
+    rclient.set(warm_key("idle"), 1)
+    for name in ["pending", "stopped-pending"]:
+        Queue(name, connection=rclient).enqueue("cs_jobs.job.run_task", "url", "parse")
+
+    scaled = scale_idle_pools(
+        "default", idle_timeout=900, rclient=rclient, incluster=False
+    )
+
+    assert scaled == ["idle"]
+    assert sorted(api.scaled) == [("idle", 0), ("stopped-pending", 1)]
+    assert rclient.get(warm_key("idle")) is None